@@ -0,0 +1,333 @@
+"""In-process caches shared by the services of an application instance.
+
+`TTLCache` is a small thread-safe LRU map whose entries expire after a
+fixed time-to-live. It counts hits and misses so its effectiveness can
+be monitored. Caches are per process: with several workers each keeps
+its own copy, so the TTL bounds how long another worker may serve an
+entry that was invalidated elsewhere.
+
+`RevocationFilter` holds the revoked token keys checked on every
+authenticated request: a `BloomFilter` answers most lookups negatively
+without touching the exact set.
+
+`TinyLFUCache` is the read-through entity cache of the repositories: an
+LRU whose admission is decided by access frequencies estimated with a
+`CountMinSketch`, so a burst of one-off reads cannot flush the hot
+entries. It also stores negative entries (`None`) for missing ids.
+Readers take its `generation` before reading from Cassandra and pass
+it to `set`, which drops the value if an invalidation happened in the
+meantime: a read racing a write cannot cache the row the write replaced.
+`EntityCaches` holds one such cache per table for a database.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+from .config.settings import app_settings
+
+# Returned by `TinyLFUCache.get` for keys without a (valid) entry, since
+# `None` is a cached value (negative entry)
+NOT_CACHED = object()
+
+
+class TTLCache:
+    """Bounded LRU cache with per-entry expiry and hit/miss counters.
+
+    Attributes:
+    - `maxsize` (int): maximum number of entries; the least recently
+        used entry is evicted when a new key does not fit.
+    - `ttl` (float): seconds an entry stays valid after being set.
+    - `hits` / `misses` (int): lookup counters, expired entries count
+        as misses.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the value cached for `key`, or `None` when absent or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Cache `value` under `key` for `ttl` seconds."""
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop the entry cached for `key`, if any."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry; counters are kept."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the hit/miss counters and the current number of entries."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings.
+
+    Sized for `capacity` keys at the given false-positive `error_rate`;
+    positions are derived from one blake2b digest by double hashing.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = capacity = max(1, capacity)
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class RevocationFilter:
+    """Revoked keys as a bloom filter in front of an exact set.
+
+    `replace` swaps in a freshly loaded key set and `add` records a
+    local revocation immediately. Lookups read a single immutable
+    snapshot and take no lock.
+    """
+
+    min_capacity = 1024
+
+    def __init__(self, error_rate: float = 0.01):
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self._snapshot = self._build(())
+
+    def _build(self, keys: Iterable[str]):
+        keys = frozenset(keys)
+        bloom = BloomFilter(max(self.min_capacity, 2 * len(keys)), self.error_rate)
+        for key in keys:
+            bloom.add(key)
+        return bloom, keys
+
+    def replace(self, keys: Iterable[str]) -> None:
+        """Replace the revoked keys with `keys`."""
+        snapshot = self._build(keys)
+        with self._lock:
+            self._snapshot = snapshot
+
+    def add(self, key: str) -> None:
+        """Mark `key` as revoked."""
+        with self._lock:
+            bloom, keys = self._snapshot
+            if len(keys) >= bloom.capacity:
+                self._snapshot = self._build(keys | {key})
+                return
+            bloom.add(key)
+            self._snapshot = (bloom, keys | {key})
+
+    def __contains__(self, key: str) -> bool:
+        bloom, keys = self._snapshot
+        return key in bloom and key in keys
+
+    def __len__(self) -> int:
+        return len(self._snapshot[1])
+
+
+class CountMinSketch:
+    """Approximate access counts over a few rows of 4-bit saturating counters.
+
+    Every `sample_size` increments all counters are halved, so that
+    estimates follow recent popularity rather than all-time counts.
+    """
+
+    seeds = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+    max_count = 15
+    _halve = bytes(i >> 1 for i in range(256))
+
+    def __init__(self, capacity: int):
+        self.bits = max(4, (max(1, capacity) - 1).bit_length() + 1)
+        self.sample_size = 10 * max(1, capacity)
+        self.additions = 0
+        self._rows = [bytearray(1 << self.bits) for _ in self.seeds]
+
+    def _indexes(self, key: Hashable) -> List[int]:
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        return [(((h ^ seed) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> (64 - self.bits) for seed in self.seeds]
+
+    def increment(self, key: Hashable) -> None:
+        for row, index in zip(self._rows, self._indexes(key)):
+            if row[index] < self.max_count:
+                row[index] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            for row in self._rows:
+                row[:] = row.translate(self._halve)
+            self.additions //= 2
+
+    def estimate(self, key: Hashable) -> int:
+        return min(row[index] for row, index in zip(self._rows, self._indexes(key)))
+
+
+class TinyLFUCache:
+    """Bounded LRU cache with TinyLFU admission, TTL and negative entries.
+
+    Every lookup is recorded in a `CountMinSketch`. When the cache is
+    full, a new key is only admitted if it has been requested more
+    often than the least recently used entry it would evict; otherwise
+    it is rejected and the entry stays. Entries expire after `ttl`
+    seconds, negative entries (value `None`) after `negative_ttl`.
+
+    Attributes:
+    - `hits` / `misses` (int): lookup counters.
+    - `evictions` (int): entries evicted to admit another key.
+    - `rejections` (int): keys refused by the admission policy.
+    - `generation` (int): bumped by every `invalidate` and `clear`.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, negative_ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejections = 0
+        self.generation = 0
+        self._clock = clock
+        self._sketch = CountMinSketch(maxsize)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        """Return the value cached for `key` (possibly `None`), or `NOT_CACHED`."""
+        with self._lock:
+            self._sketch.increment(key)
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return NOT_CACHED
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        """Cache `value` (`None` for a missing entity) if admitted.
+
+        `generation` is the `generation` read before `value` was fetched;
+        the value is dropped if the cache was invalidated since, as it
+        may predate the write that caused the invalidation.
+        """
+        ttl = self.negative_ttl if value is None else self.ttl
+        if self.maxsize <= 0 or ttl <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            now = self._clock()
+            if key not in self._data and len(self._data) >= self.maxsize:
+                victim = next(iter(self._data))
+                victim_expired = self._data[victim][0] <= now
+                if not victim_expired and self._sketch.estimate(key) <= self._sketch.estimate(victim):
+                    self.rejections += 1
+                    return
+                del self._data[victim]
+                if not victim_expired:
+                    self.evictions += 1
+            self._data[key] = (now + ttl, value)
+            self._data.move_to_end(key)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop the entry cached for `key`, if any, and start a new generation."""
+        with self._lock:
+            self._data.pop(key, None)
+            self.generation += 1
+
+    def clear(self) -> None:
+        """Drop every entry and start a new generation; counters are kept."""
+        with self._lock:
+            self._data.clear()
+            self.generation += 1
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, float]:
+        """Return the counters, the hit ratio and the current number of entries."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "size": len(self._data),
+                "evictions": self.evictions,
+                "rejections": self.rejections,
+            }
+
+
+class EntityCaches:
+    """One `TinyLFUCache` per table, shared by the repositories of a database.
+
+    Sync and async repositories of the same table are distinct
+    instances; getting their cache from the app-scoped `EntityCaches`
+    makes an invalidation by one visible to the other.
+    """
+
+    def __init__(self, db: Any = None):
+        self._caches: Dict[str, TinyLFUCache] = {}
+        self._lock = threading.Lock()
+
+    def for_table(self, table: str) -> TinyLFUCache:
+        """Return the cache of `table`, creating it from `app_settings` on first use."""
+        with self._lock:
+            cache = self._caches.get(table)
+            if cache is None:
+                cache = TinyLFUCache(app_settings.entity_cache_size, app_settings.entity_cache_ttl_seconds, app_settings.entity_cache_negative_ttl_seconds)
+                self._caches[table] = cache
+            return cache
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Return the stats of every table cache."""
+        with self._lock:
+            caches = dict(self._caches)
+        return {table: cache.stats() for table, cache in caches.items()}
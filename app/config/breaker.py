@@ -0,0 +1,84 @@
+"""Circuit breaker guarding the Cassandra session of `Database`.
+
+The breaker has the usual three states:
+
+- `CLOSED`: the session is usable and requests go through.
+- `OPEN`: the session was lost (or every host is down); requests are
+  refused at once instead of waiting on the database, until
+  `retry_interval` seconds have passed.
+- `HALF_OPEN`: a single reconnection attempt is in progress; it closes
+  the breaker on success and opens it again on failure.
+
+Requests never attempt the reconnection themselves: `Database` runs it
+in a background thread, so an outage costs them a fast
+`DatabaseUnavailableError` rather than a blocked worker thread.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Union
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Thread-safe closed/open/half-open state machine with counters."""
+
+    def __init__(self, retry_interval: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.retry_interval = retry_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self.opens = 0
+        self.rejections = 0
+        self.failures = 0
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Return True when the breaker is closed; count a rejection otherwise."""
+        if self._state == CLOSED:
+            return True
+        with self._lock:
+            self.rejections += 1
+        return False
+
+    def trip(self) -> None:
+        """Open the breaker (no-op when it is already open)."""
+        with self._lock:
+            if self._state != OPEN:
+                self._state = OPEN
+                self._opened_at = self._clock()
+                self.opens += 1
+
+    def retry_in(self) -> float:
+        """Return the seconds left before a reconnection may be attempted."""
+        if self._state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.retry_interval - self._clock())
+
+    def half_open(self) -> None:
+        """Mark a reconnection attempt as in progress."""
+        with self._lock:
+            self._state = HALF_OPEN
+
+    def record_success(self) -> None:
+        """Close the breaker after a successful reconnection."""
+        with self._lock:
+            self._state = CLOSED
+
+    def record_failure(self) -> None:
+        """Count a failed reconnection and open the breaker again."""
+        with self._lock:
+            self.failures += 1
+            self._state = OPEN
+            self._opened_at = self._clock()
+
+    def stats(self) -> Dict[str, Union[str, int]]:
+        """Return the current state and counters for monitoring."""
+        return {"state": self._state, "opens": self.opens, "rejections": self.rejections, "failures": self.failures}
@@ -0,0 +1,185 @@
+"""Cassandra connection settings and execution profiles.
+
+`ClusterSettings` follows `AppSettings`: values are read from
+environment variables (and `.env`) once at import time. Besides the
+contact points and keyspace it describes the driver execution profiles
+repositories pick per query:
+
+- `PROFILE_READ`: point reads (single partition). Low consistency
+  (`LOCAL_ONE`), short timeout and speculative execution, which sends
+  the query to another replica when the first one is slow to answer.
+  The driver only speculates on idempotent statements;
+  `StatementRegistry` marks prepared `SELECT`s as such.
+- `PROFILE_WRITE`: writes, batches and lightweight transactions
+  (`LOCAL_QUORUM`, `LOCAL_SERIAL`).
+- `PROFILE_SCAN`: listings, counts and full-table scans. Longer
+  timeout, no speculative execution (a duplicate of a multi-partition
+  query is expensive) and a larger page size for scans.
+
+Every profile routes token-aware over a DC-aware round robin, so a
+bound statement goes straight to a replica of its partition in the
+local datacenter, and builds rows with `cached_named_tuple_factory`.
+"""
+
+import os
+from collections import namedtuple
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from cassandra import ConsistencyLevel
+from cassandra.cluster import EXEC_PROFILE_DEFAULT, ExecutionProfile
+from cassandra.policies import ConstantSpeculativeExecutionPolicy, DCAwareRoundRobinPolicy, TokenAwarePolicy
+from cassandra.query import _clean_column_name, named_tuple_factory
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROFILE_READ = "read"
+PROFILE_WRITE = "write"
+PROFILE_SCAN = "scan"
+
+
+# Row classes by column names; a handful of entries, one per distinct
+# select list, so the bound only guards against unexpected growth
+_ROW_CLASSES: Dict[Tuple[str, ...], type] = {}
+_MAX_ROW_CLASSES = 1024
+
+
+def cached_named_tuple_factory(colnames: Sequence[str], rows: List[tuple]) -> list:
+    """Row factory returning the same namedtuple rows as the driver default.
+
+    The driver's `named_tuple_factory` builds a new namedtuple class
+    for every result page, which costs more than mapping the rows of a
+    typical page. The class is built once per list of column names
+    here. Column names that are not valid identifiers after cleaning
+    are left to the driver factory.
+    """
+    key = tuple(colnames)
+    row_class = _ROW_CLASSES.get(key)
+    if row_class is None:
+        try:
+            row_class = namedtuple("Row", [_clean_column_name(name) for name in colnames])
+        except ValueError:
+            return named_tuple_factory(colnames, rows)
+        if len(_ROW_CLASSES) < _MAX_ROW_CLASSES:
+            _ROW_CLASSES[key] = row_class
+    return [row_class(*row) for row in rows]
+
+
+def _consistency(var: str, default: str) -> int:
+    """Read a consistency level name (e.g. `LOCAL_QUORUM`) from `var`."""
+    value = os.getenv(var, default).strip().upper()
+    return ConsistencyLevel.name_to_value.get(value, ConsistencyLevel.name_to_value[default])
+
+
+class ClusterSettings:
+    """Cassandra connection settings read from the environment."""
+
+    def __init__(self) -> None:
+        self.contact_points: List[str] = [h.strip() for h in os.getenv("CASSANDRA_CONTACT_POINTS", "cassandra").split(",") if h.strip()]
+        self.keyspace: str = os.getenv("CASSANDRA_KEYSPACE", "dawan")
+        try:
+            self.port: int = int(os.getenv("CASSANDRA_PORT", "9042"))
+        except ValueError:
+            self.port = 9042
+        # Apply pending schema migrations at startup; when false the app
+        # refuses to start on an outdated schema (run
+        # `python -m app.migrations upgrade` from a release job instead)
+        self.schema_auto_migrate: bool = os.getenv("SCHEMA_AUTO_MIGRATE", "true").strip().lower() in ("1", "true", "yes")
+        # Driver metrics (request timer, connection errors, retries...)
+        # exported on `/metrics`
+        self.metrics_enabled: bool = os.getenv("CASSANDRA_METRICS_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+        # Local datacenter for DC-aware routing; unset uses the
+        # datacenter of the first contact point
+        self.local_dc: Optional[str] = os.getenv("CASSANDRA_LOCAL_DC") or None
+        self.read_consistency: int = _consistency("CASSANDRA_READ_CONSISTENCY", "LOCAL_ONE")
+        self.write_consistency: int = _consistency("CASSANDRA_WRITE_CONSISTENCY", "LOCAL_QUORUM")
+        self.scan_consistency: int = _consistency("CASSANDRA_SCAN_CONSISTENCY", "LOCAL_ONE")
+        try:
+            self.read_timeout_seconds: float = float(os.getenv("CASSANDRA_READ_TIMEOUT_SECONDS", "2"))
+        except ValueError:
+            self.read_timeout_seconds = 2.0
+        try:
+            self.write_timeout_seconds: float = float(os.getenv("CASSANDRA_WRITE_TIMEOUT_SECONDS", "5"))
+        except ValueError:
+            self.write_timeout_seconds = 5.0
+        try:
+            self.scan_timeout_seconds: float = float(os.getenv("CASSANDRA_SCAN_TIMEOUT_SECONDS", "30"))
+        except ValueError:
+            self.scan_timeout_seconds = 30.0
+        # Rows per page of full-table scans (backfills, revocation loads)
+        try:
+            self.scan_fetch_size: int = int(os.getenv("CASSANDRA_SCAN_FETCH_SIZE", "5000"))
+        except ValueError:
+            self.scan_fetch_size = 5000
+        # Delay between background reconnection attempts after the
+        # session is lost; requests fail fast in the meantime
+        try:
+            self.reconnect_interval_seconds: float = float(os.getenv("CASSANDRA_RECONNECT_INTERVAL_SECONDS", "2"))
+        except ValueError:
+            self.reconnect_interval_seconds = 2.0
+        # Point reads still unanswered after this delay are sent to
+        # another replica, up to `max_attempts` extra times (0 disables)
+        try:
+            self.speculative_delay_ms: float = float(os.getenv("CASSANDRA_SPECULATIVE_DELAY_MS", "50"))
+        except ValueError:
+            self.speculative_delay_ms = 50.0
+        try:
+            self.speculative_max_attempts: int = int(os.getenv("CASSANDRA_SPECULATIVE_MAX_ATTEMPTS", "2"))
+        except ValueError:
+            self.speculative_max_attempts = 2
+        # Statements slower than this are logged (0 disables), and the
+        # fraction of statements traced server-side (see `app.query_log`)
+        try:
+            self.slow_query_ms: float = float(os.getenv("CASSANDRA_SLOW_QUERY_MS", "500"))
+        except ValueError:
+            self.slow_query_ms = 500.0
+        try:
+            self.trace_sample_rate: float = float(os.getenv("CASSANDRA_TRACE_SAMPLE_RATE", "0"))
+        except ValueError:
+            self.trace_sample_rate = 0.0
+
+    def _routing(self) -> TokenAwarePolicy:
+        # One policy instance per profile: the driver populates each
+        # profile's policy with the cluster hosts separately
+        return TokenAwarePolicy(DCAwareRoundRobinPolicy(local_dc=self.local_dc))
+
+    def execution_profiles(self) -> Dict[object, ExecutionProfile]:
+        """Return the execution profiles to pass to `Cluster`.
+
+        The default profile (schema statements and anything run without
+        a profile) uses the write consistency and the scan timeout.
+        """
+        speculation = None
+        if self.speculative_delay_ms > 0 and self.speculative_max_attempts > 0:
+            speculation = ConstantSpeculativeExecutionPolicy(self.speculative_delay_ms / 1000, self.speculative_max_attempts)
+        return {
+            EXEC_PROFILE_DEFAULT: ExecutionProfile(
+                load_balancing_policy=self._routing(),
+                consistency_level=self.write_consistency,
+                request_timeout=self.scan_timeout_seconds,
+                row_factory=cached_named_tuple_factory,
+            ),
+            PROFILE_READ: ExecutionProfile(
+                load_balancing_policy=self._routing(),
+                consistency_level=self.read_consistency,
+                request_timeout=self.read_timeout_seconds,
+                speculative_execution_policy=speculation,
+                row_factory=cached_named_tuple_factory,
+            ),
+            PROFILE_WRITE: ExecutionProfile(
+                load_balancing_policy=self._routing(),
+                consistency_level=self.write_consistency,
+                serial_consistency_level=ConsistencyLevel.LOCAL_SERIAL,
+                request_timeout=self.write_timeout_seconds,
+                row_factory=cached_named_tuple_factory,
+            ),
+            PROFILE_SCAN: ExecutionProfile(
+                load_balancing_policy=self._routing(),
+                consistency_level=self.scan_consistency,
+                request_timeout=self.scan_timeout_seconds,
+                row_factory=cached_named_tuple_factory,
+            ),
+        }
+
+
+cluster_settings = ClusterSettings()
@@ -1,9 +1,20 @@
 """Database wrapper for Cassandra cluster and schema management.
 
 This class is a thin helper used by the application to:
-- create/connect to a Cassandra cluster and session,
-- ensure the required keyspace and tables exist,
-- provide a `get_session()` method used by repositories.
+- create/connect to a Cassandra cluster and session, configured by a
+  `ClusterSettings` object (contact points, keyspace and the execution
+  profiles repositories pick per query),
+- check the schema version at startup and apply the migrations of
+  `app.migrations` only when it is behind,
+- provide a `get_session()` method used by repositories, guarded by a
+  circuit breaker: a lost session is re-created by a background thread
+  while requests fail fast with `DatabaseUnavailableError`,
+- own the `StatementRegistry` holding the prepared statements used by
+  repositories (re-prepared on every (re)connect),
+- detect whether name searches can use Storage-Attached Indexes
+  (`name_search`),
+- warm the connection pools before a worker reports ready
+  (`warm_up`) and reconnect when used from a forked process.
 
 The implementation is intentionally simple and synchronous; it is
 suitable for development and testing but would need improvements for
@@ -11,145 +22,265 @@ production use (robust configuration, async support, connection
 pooling, and better error handling).
 """
 
+from cassandra import InvalidRequest
 from cassandra.cluster import Cluster
-import time
+from cassandra.policies import HostStateListener
+from cassandra.protocol import ConfigurationException
+import os
+import threading
+from typing import Optional
+
+from .breaker import CLOSED, CircuitBreaker
+from .cluster import ClusterSettings, cluster_settings
+from ..exceptions import DatabaseUnavailableError
+from .statements import StatementRegistry
+from ..migrations import LATEST_VERSION, current_version, migrate
+
+# Name columns searched by `q`, indexed with SAI when the server supports it
+NAME_SEARCH_COLUMNS = (("students", "s_name", "students_name_idx"), ("projects", "p_name", "projects_p_name_idx"))
+
+# Values of `Database.name_search`
+NAME_SEARCH_LIKE = "like"    # SAI indexes answering `LIKE 'x%'` / `LIKE '%x%'`
+NAME_SEARCH_EXACT = "exact"  # SAI indexes answering equality only
+
+
+class _HostAvailability(HostStateListener):
+    """Open the breaker of `db` when every host of `cluster` is down.
+
+    The driver keeps reconnecting to down hosts by itself; the breaker
+    closes again as soon as one of them is back up.
+    """
+
+    def __init__(self, db: "Database", cluster: Cluster) -> None:
+        self.db = db
+        self.cluster = cluster
+
+    def _current(self) -> bool:
+        return self.db.cluster is self.cluster and self.db.session is not None
+
+    def on_up(self, host):
+        if self._current():
+            self.db.breaker.record_success()
+
+    def on_down(self, host):
+        if self._current() and not any(h.is_up for h in self.cluster.metadata.all_hosts()):
+            print("WARNING: No Cassandra host is up, failing requests fast until one is back")
+            self.db.breaker.trip()
+
+    def on_add(self, host):
+        pass
+
+    def on_remove(self, host):
+        self.on_down(host)
+
 
 class Database:
-    """Manage Cassandra cluster connection and schema creation."""
+    """Manage Cassandra cluster connection and schema creation.
 
-    def __init__(self, contact_points, keyspace):
-        self.contact_points = contact_points
-        self.keyspace = keyspace
+    `name_search` records how the name columns can be searched:
+    `NAME_SEARCH_LIKE`, `NAME_SEARCH_EXACT` or `None` when the server has
+    no Storage-Attached Index support and name searches keep using the
+    legacy secondary indexes with `ALLOW FILTERING`.
+
+    `breaker` is the `CircuitBreaker` of the session; its `stats()` are
+    meant for monitoring.
+    """
+
+    def __init__(self, config: Optional[ClusterSettings] = None, check_schema: bool = True):
+        self.config = config or cluster_settings
+        self.check_schema = check_schema
+        self.contact_points = self.config.contact_points
+        self.keyspace = self.config.keyspace
         self.cluster = None
         self.session = None
+        self.name_search = None
+        self.pid = None
+        self.statements = StatementRegistry()
+        self.breaker = CircuitBreaker(self.config.reconnect_interval_seconds)
+        self._closing = threading.Event()
+        self._reconnect_lock = threading.Lock()
+        self._reconnector: Optional[threading.Thread] = None
         self.connect()
 
+    def _new_cluster(self) -> Cluster:
+        """Build a `Cluster` with the configured port, execution profiles and driver metrics."""
+        return Cluster(self.contact_points, port=self.config.port, execution_profiles=self.config.execution_profiles(), metrics_enabled=self.config.metrics_enabled)
+
     def connect(self):
-        """Connect to the Cassandra cluster and ensure keyspace/tables exist."""
-        self.cluster = Cluster(self.contact_points)
+        """Connect to the Cassandra cluster and check the schema version.
+
+        With `check_schema` (the default) the schema is brought to
+        `LATEST_VERSION` first, see `ensure_schema`. The statement
+        registry is bound once the session uses the keyspace.
+        """
+        self.cluster = self._new_cluster()
         self.session = self.cluster.connect()
-        self.create_keyspace()
+        self.pid = os.getpid()
+        self.cluster.register_listener(_HostAvailability(self, self.cluster))
+        if self.check_schema:
+            self.ensure_schema()
+        elif self.keyspace in self.cluster.metadata.keyspaces:
+            self.session.set_keyspace(self.keyspace)
+        if self.session.keyspace:
+            self.detect_name_search()
+        self.statements.bind(self.session)
         print("Connected to Cassandra")
 
     def close(self):
         """Shutdown session and cluster connections."""
+        self._closing.set()
         if self.session:
             self.session.shutdown()
         if self.cluster:
             self.cluster.shutdown()
         print("Connection closed")
 
-    def create_keyspace(self):
-        """Create the application keyspace and call `create_tables`."""
-        query = f"""
-        CREATE KEYSPACE IF NOT EXISTS {self.keyspace}
-        WITH REPLICATION = {{ 'class' : 'SimpleStrategy', 'replication_factor' : 1 }};
+    def warm_up(self, timeout: float = 10.0) -> int:
+        """Run a trivial query on every live host and wait for the answers.
+
+        Connection pools are opened by `connect`, but the first request
+        on each of them still pays for the connection setup finishing
+        and the driver's lazy initialization. Returns the number of
+        hosts that answered within `timeout` seconds; failures are
+        logged, not raised.
         """
-        if self.cluster is None:
-            self.cluster = Cluster(self.contact_points)
-        if self.session is None:
-            self.session = self.cluster.connect()
-        self.session.execute(query)
-        self.session.set_keyspace(self.keyspace)
-        self.create_tables()
-        print(f"Keyspace {self.keyspace} created or already exists")
-
-    def create_tables(self):
-        """Create application tables and secondary indexes if missing."""
         session = self.get_session()
-        
-        # Create users table
-        user_table_query = """
-        CREATE TABLE IF NOT EXISTS users (
-            id text PRIMARY KEY,
-            username text,
-            email text,
-            hashed_password text,
-            is_active boolean
-        );
-        """
-        session.execute(user_table_query)
+        futures = [
+            session.execute_async("SELECT release_version FROM system.local", timeout=timeout, host=host)
+            for host in self.cluster.metadata.all_hosts() if host.is_up
+        ]
+        warmed = 0
+        for future in futures:
+            try:
+                future.result()
+                warmed += 1
+            except Exception as e:
+                print(f"WARNING: warmup query failed: {e}")
+        return warmed
 
-        # Create index on username for faster lookups
-        username_index_query = """
-        CREATE INDEX IF NOT EXISTS users_username_idx ON users (username);
-        """
-        session.execute(username_index_query)
+    def is_available(self) -> bool:
+        """Return True when the breaker is closed and at least one host is up."""
+        if self.breaker.state != CLOSED or self.session is None or self.cluster is None or self.pid != os.getpid():
+            return False
+        return any(host.is_up for host in self.cluster.metadata.all_hosts())
 
-        # Create index on email
-        email_index_query = """
-        CREATE INDEX IF NOT EXISTS users_email_idx ON users (email);
-        """
-        session.execute(email_index_query)
-        
-        # Create projects table
-        project_table_query = """
-        CREATE TABLE IF NOT EXISTS projects (
-            p_id text PRIMARY KEY,
-            p_name text,
-            p_head text
-        );
-        """
-        session.execute(project_table_query)
+    def ensure_schema(self):
+        """Skip DDL when the schema is current, migrate or fail otherwise.
 
-        # Create index on project name for faster lookups
-        project_name_index_query = """
-        CREATE INDEX IF NOT EXISTS projects_p_name_idx ON projects (p_name);
-        """
-        session.execute(project_name_index_query)
-        # Create students table
-        student_table_query = """
-        CREATE TABLE IF NOT EXISTS students (
-            s_id text PRIMARY KEY,
-            s_name text,
-            s_course text,
-            s_branch text,
-            s_project_id text
-        );
+        A single read of `schema_version` decides. When the schema is
+        behind, migrations are applied if `SCHEMA_AUTO_MIGRATE` is set;
+        otherwise a `RuntimeError` asks for `python -m app.migrations
+        upgrade` to be run first.
         """
-        session.execute(student_table_query)
+        version = current_version(self)
+        if version >= LATEST_VERSION:
+            self.session.set_keyspace(self.keyspace)
+            return
+        if not self.config.schema_auto_migrate:
+            raise RuntimeError(f"Schema version {version} is behind {LATEST_VERSION}; run `python -m app.migrations upgrade`")
+        migrate(self)
 
-        # Index on student name
-        student_name_index = """
-        CREATE INDEX IF NOT EXISTS students_name_idx ON students (s_name);
-        """
-        session.execute(student_name_index)
+    def create_search_indexes(self):
+        """Index the name columns with SAI when the server supports it.
 
-        # Index on student project id for fast lookup of students by project
-        student_project_index = """
-        CREATE INDEX IF NOT EXISTS students_project_idx ON students (s_project_id);
+        SAI indexes are created case-insensitive and normalized so that
+        typeahead searches match regardless of case. Once a column has an
+        SAI index its legacy secondary index is dropped. On servers
+        without SAI (or where creating it is refused) legacy secondary
+        indexes are created instead. Run as a schema migration;
+        `detect_name_search` reads the outcome at startup.
         """
-        session.execute(student_project_index)
+        session = self.get_session()
+        try:
+            for table, column, _ in NAME_SEARCH_COLUMNS:
+                session.execute(f"""
+                CREATE CUSTOM INDEX IF NOT EXISTS {table}_{column}_sai ON {table} ({column})
+                USING 'StorageAttachedIndex'
+                WITH OPTIONS = {{ 'case_sensitive': 'false', 'normalize': 'true' }};
+                """)
+        except (InvalidRequest, ConfigurationException) as e:
+            print(f"WARNING: SAI indexes unavailable ({e}); name search falls back to exact ALLOW FILTERING matches")
+            for table, column, legacy_index in NAME_SEARCH_COLUMNS:
+                session.execute(f"CREATE INDEX IF NOT EXISTS {legacy_index} ON {table} ({column});")
+            return
+
+        for table, column, legacy_index in NAME_SEARCH_COLUMNS:
+            session.execute(f"DROP INDEX IF EXISTS {legacy_index};")
+
+    def detect_name_search(self):
+        """Set `name_search` from the indexes present in the keyspace.
 
-        print("Tables created")
+        Reads the driver schema metadata (no query) to see whether every
+        name column has its SAI index; `LIKE` support is then probed by
+        preparing a `LIKE` query, which Cassandra validates against the
+        available indexes.
+        """
+        self.name_search = None
+        keyspace = self.cluster.metadata.keyspaces.get(self.keyspace)
+        if keyspace is None or any(f"{table}_{column}_sai" not in keyspace.indexes for table, column, _ in NAME_SEARCH_COLUMNS):
+            return
+        self.name_search = NAME_SEARCH_EXACT
+        try:
+            for table, column, _ in NAME_SEARCH_COLUMNS:
+                self.session.prepare(f"SELECT {column} FROM {table} WHERE {column} LIKE ?")
+            self.name_search = NAME_SEARCH_LIKE
+        except InvalidRequest as e:
+            print(f"WARNING: SAI indexes do not support LIKE ({e}); prefix and contains searches fall back to exact matches")
 
     def get_session(self):
-        """Return an active session, attempting reconnection if necessary.
+        """Return the active session or raise `DatabaseUnavailableError` at once.
 
-        The method will try to reconnect up to a few times if the session
-        is not available, raising a `RuntimeError` on persistent failure.
+        Never blocks: while the breaker is open (session lost, every
+        host down, or a reconnection in progress) requests are refused
+        immediately. A missing session starts the background
+        reconnection. A session inherited through `fork()` is unusable
+        (the driver's IO threads stay in the parent), so it is dropped
+        without shutting it down and the child process connects again.
         """
+        if self.session is not None and self.pid != os.getpid():
+            print("WARNING: Session was created in another process, reconnecting...")
+            self.session = None
+            self.cluster = None
+            self._reconnector = None
+        if not self.breaker.allow_request():
+            raise DatabaseUnavailableError("Database is unavailable, retry later")
         if self.session is None:
-            print("WARNING: Session is None, attempting to reconnect...")
-            max_retries = 5
-            retry_delay = 10
-            
-            for attempt in range(max_retries):
-                try:
-                    print(f"Reconnection attempt {attempt + 1}/{max_retries}")
-                    self.connect()
-                    if self.session is not None:
-                        print("Successfully reconnected to Cassandra")
-                        return self.session
-                except Exception as e:
-                    print(f"Reconnection attempt {attempt + 1} failed: {e}")
-                    if attempt < max_retries - 1:
-                        print(f"Waiting {retry_delay} seconds before next attempt...")
-                        time.sleep(retry_delay)
-                    else:
-                        print("All reconnection attempts failed")
-                        raise RuntimeError(f"Failed to reconnect to Cassandra after {max_retries} attempts")
-            
-            raise RuntimeError(f"Failed to obtain Cassandra session after {max_retries} attempts")
-        
-        return self.session
\ No newline at end of file
+            self.breaker.trip()
+            self._start_reconnect()
+            raise DatabaseUnavailableError("Database session was lost, reconnecting")
+        return self.session
+
+    def _start_reconnect(self) -> None:
+        """Start the background reconnection thread unless it is running."""
+        with self._reconnect_lock:
+            if self._reconnector is not None and self._reconnector.is_alive():
+                return
+            self._reconnector = threading.Thread(target=self._reconnect_loop, name="cassandra-reconnect", daemon=True)
+            self._reconnector.start()
+
+    def _reconnect_loop(self) -> None:
+        """Reconnect every `reconnect_interval_seconds` until it succeeds or `close()`."""
+        attempt = 0
+        while not self._closing.is_set():
+            attempt += 1
+            self.breaker.half_open()
+            try:
+                self.connect()
+            except Exception as e:
+                print(f"Reconnection attempt {attempt} failed: {e}")
+                self._discard()
+                self.breaker.record_failure()
+                self._closing.wait(self.breaker.retry_in())
+                continue
+            self.breaker.record_success()
+            print(f"Reconnected to Cassandra after {attempt} attempt(s)")
+            return
+
+    def _discard(self) -> None:
+        """Shut down a half-built cluster left by a failed `connect()`."""
+        cluster, self.cluster, self.session = self.cluster, None, None
+        if cluster is not None:
+            try:
+                cluster.shutdown()
+            except Exception:
+                pass
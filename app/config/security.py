@@ -1,18 +1,25 @@
 """Security-related settings and simple middleware helpers.
 
 This module exposes `settings` with basic JWT settings loaded from the
-environment, a helper `is_default_secret()` used to warn when the
+environment (including the auth mode, see `AUTH_MODE_LOOKUP` and
+`AUTH_MODE_CLAIMS`), a helper `is_default_secret()` used to warn when the
 SECRET_KEY is insecure, and `SecurityHeadersMiddleware` which adds a few
 HTTP headers to responses.
 """
 
 from dotenv import load_dotenv
 import os
+from typing import Optional
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
 
 load_dotenv()
 
+# `AuthService.get_current_user` loads the user from Cassandra (cached)
+AUTH_MODE_LOOKUP = "lookup"
+# `AuthService.get_current_user` builds the user from the token claims
+AUTH_MODE_CLAIMS = "claims"
+
 class SecuritySettings:
     """Lightweight settings loader that reads from environment variables.
 
@@ -28,6 +35,55 @@ class SecuritySettings:
         except ValueError:
             self.access_token_expire_minutes = 60
         self.allowed_origins: list[str] = [o.strip() for o in os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",") if o.strip()]
+        # Authenticated users cached by `AuthService.get_current_user`;
+        # a size or TTL of 0 disables the cache
+        try:
+            self.principal_cache_size: int = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+        except ValueError:
+            self.principal_cache_size = 10000
+        try:
+            self.principal_cache_ttl_seconds: float = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+        except ValueError:
+            self.principal_cache_ttl_seconds = 30.0
+        # Password hashing process pool (0 workers hashes inline) and the
+        # number of jobs allowed to wait for a worker before returning 503
+        try:
+            self.password_hash_workers: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+        except ValueError:
+            self.password_hash_workers = min(4, os.cpu_count() or 1)
+        try:
+            self.password_hash_queue_depth: int = int(os.getenv("PASSWORD_HASH_QUEUE_DEPTH", "32"))
+        except ValueError:
+            self.password_hash_queue_depth = 32
+        # argon2 costs: pinned by ARGON2_TIME_COST/ARGON2_MEMORY_COST
+        # (KiB), as printed by `python -m app.services.password_hasher`;
+        # otherwise calibrated by each process at startup so one hash
+        # takes about PASSWORD_HASH_TARGET_MS (0 keeps passlib's defaults)
+        try:
+            self.password_hash_target_ms: float = float(os.getenv("PASSWORD_HASH_TARGET_MS", "50"))
+        except ValueError:
+            self.password_hash_target_ms = 50.0
+        try:
+            self.argon2_max_memory_kib: int = int(os.getenv("ARGON2_MAX_MEMORY_KIB", "65536"))
+        except ValueError:
+            self.argon2_max_memory_kib = 65536
+        try:
+            self.argon2_time_cost: Optional[int] = int(os.environ["ARGON2_TIME_COST"]) if os.getenv("ARGON2_TIME_COST") else None
+        except ValueError:
+            self.argon2_time_cost = None
+        try:
+            self.argon2_memory_cost: Optional[int] = int(os.environ["ARGON2_MEMORY_COST"]) if os.getenv("ARGON2_MEMORY_COST") else None
+        except ValueError:
+            self.argon2_memory_cost = None
+        self.auth_mode: str = os.getenv("AUTH_MODE", AUTH_MODE_LOOKUP)
+        if self.auth_mode not in (AUTH_MODE_LOOKUP, AUTH_MODE_CLAIMS):
+            self.auth_mode = AUTH_MODE_LOOKUP
+        # How often the in-memory revocation filter is reloaded from
+        # the `revoked_tokens` table
+        try:
+            self.revocation_refresh_seconds: float = float(os.getenv("REVOCATION_REFRESH_SECONDS", "30"))
+        except ValueError:
+            self.revocation_refresh_seconds = 30.0
 
 
 settings = SecuritySettings()
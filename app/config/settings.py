@@ -0,0 +1,81 @@
+"""Application settings that are not security related.
+
+`AppSettings` follows `SecuritySettings`: values are read from
+environment variables (and `.env`) once at import time, with defaults
+suitable for development.
+"""
+
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+
+class AppSettings:
+    """Lightweight settings loader for tuning knobs read from the environment."""
+
+    def __init__(self) -> None:
+        # Bulk import: rows validated and written per chunk, writes kept
+        # in flight by `BaseRepository._bulk_write`, and per-row errors
+        # reported
+        try:
+            self.bulk_chunk_size: int = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+        except ValueError:
+            self.bulk_chunk_size = 1000
+        try:
+            self.bulk_concurrency: int = int(os.getenv("BULK_CONCURRENCY", "64"))
+        except ValueError:
+            self.bulk_concurrency = 64
+        try:
+            self.bulk_max_errors: int = int(os.getenv("BULK_MAX_ERRORS", "1000"))
+        except ValueError:
+            self.bulk_max_errors = 1000
+        # Read-through entity cache of `get_student`/`get_project`:
+        # entries per table, TTL of found and of missing ids (0 disables)
+        try:
+            self.entity_cache_size: int = int(os.getenv("ENTITY_CACHE_SIZE", "10000"))
+        except ValueError:
+            self.entity_cache_size = 10000
+        try:
+            self.entity_cache_ttl_seconds: float = float(os.getenv("ENTITY_CACHE_TTL_SECONDS", "30"))
+        except ValueError:
+            self.entity_cache_ttl_seconds = 30.0
+        try:
+            self.entity_cache_negative_ttl_seconds: float = float(os.getenv("ENTITY_CACHE_NEGATIVE_TTL_SECONDS", "5"))
+        except ValueError:
+            self.entity_cache_negative_ttl_seconds = 5.0
+        # Multi-get (`get_students`/`get_projects`): point reads of the
+        # ids missing from the entity cache in flight at once, per call
+        # for the async repositories and per process for the sync ones
+        # (threads of `read_pool`)
+        try:
+            self.lookup_concurrency: int = int(os.getenv("LOOKUP_CONCURRENCY", "32"))
+        except ValueError:
+            self.lookup_concurrency = 32
+        # Serialize list responses directly with pydantic-core instead
+        # of revalidating them against `response_model` (app.responses)
+        self.fast_json_responses: bool = os.getenv("FAST_JSON_RESPONSES", "false").strip().lower() in ("1", "true", "yes")
+        # Server launcher (`python -m app.server`): bind address, worker
+        # processes, event loop and HTTP parser implementations ("auto"
+        # picks uvloop/httptools when installed) and dev auto-reload
+        self.server_host: str = os.getenv("SERVER_HOST", "0.0.0.0")
+        try:
+            self.server_port: int = int(os.getenv("SERVER_PORT", "8000"))
+        except ValueError:
+            self.server_port = 8000
+        try:
+            self.server_workers: int = int(os.getenv("SERVER_WORKERS", "1"))
+        except ValueError:
+            self.server_workers = 1
+        self.server_loop: str = os.getenv("SERVER_LOOP", "auto").strip().lower()
+        self.server_http: str = os.getenv("SERVER_HTTP", "auto").strip().lower()
+        self.server_reload: bool = os.getenv("SERVER_RELOAD", "false").strip().lower() in ("1", "true", "yes")
+        # Upper bound on the connection warmup run before a worker
+        # reports ready
+        try:
+            self.warmup_timeout_seconds: float = float(os.getenv("WARMUP_TIMEOUT_SECONDS", "10"))
+        except ValueError:
+            self.warmup_timeout_seconds = 10.0
+
+
+app_settings = AppSettings()
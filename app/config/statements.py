@@ -0,0 +1,103 @@
+"""Registry of prepared CQL statements owned by `Database`.
+
+Repositories refer to statements by a stable name (e.g.
+`students.get`) instead of building a `SimpleStatement` per call. The
+registry prepares each statement once against the current session,
+lazily on first use or eagerly through `prepare_all()`, and prepares
+everything again when `Database` hands it a new session after a
+reconnect.
+
+Prepared `SELECT` statements are marked idempotent: the driver only
+applies speculative execution and retries to idempotent statements.
+"""
+
+import threading
+from typing import Dict, Optional
+
+
+class StatementRegistry:
+    """Keep CQL text and its prepared counterpart keyed by name."""
+
+    def __init__(self) -> None:
+        self._cql: Dict[str, str] = {}
+        self._prepared: Dict[str, object] = {}
+        self._session = None
+        self._lock = threading.RLock()
+
+    def register(self, name: str, cql: str) -> None:
+        """Record `cql` under `name`.
+
+        Registering the same text twice is a no-op; registering a
+        different text under an existing name raises `ValueError` as it
+        almost certainly is a naming mistake.
+        """
+        cql = " ".join(cql.split())
+        with self._lock:
+            existing = self._cql.get(name)
+            if existing is None:
+                self._cql[name] = cql
+            elif existing != cql:
+                raise ValueError(f"Statement {name!r} is already registered with a different CQL text")
+
+    def get(self, name: str, cql: Optional[str] = None):
+        """Return the prepared statement for `name`, preparing it if needed.
+
+        When `cql` is given it is registered first, which lets callers
+        build statements whose text depends on runtime values (e.g.
+        filter columns) while still preparing each variant only once.
+        """
+        prepared = self._prepared.get(name)
+        if prepared is not None:
+            return prepared
+        if cql is not None:
+            self.register(name, cql)
+        with self._lock:
+            prepared = self._prepared.get(name)
+            if prepared is None:
+                if name not in self._cql:
+                    raise KeyError(f"Unknown statement {name!r}")
+                if self._session is None:
+                    raise RuntimeError("StatementRegistry is not bound to a session")
+                prepared = self._prepare(self._cql[name])
+                self._prepared[name] = prepared
+            return prepared
+
+    def _prepare(self, cql: str):
+        prepared = self._session.prepare(cql)
+        if self._is_select(cql):
+            prepared.is_idempotent = True
+        return prepared
+
+    @staticmethod
+    def _is_select(cql: str) -> bool:
+        return cql[:7].upper() == "SELECT "
+
+    def is_read(self, name: str) -> bool:
+        """Return True if the statement registered as `name` is a `SELECT`."""
+        return self._is_select(self._cql.get(name, ""))
+
+    def bind(self, session) -> None:
+        """Attach a (new) session and re-prepare every known statement.
+
+        Called by `Database.connect` so statements survive reconnects
+        without each repository having to track session changes.
+        """
+        with self._lock:
+            self._session = session
+            self._prepared = {}
+        self.prepare_all()
+
+    def prepare_all(self) -> None:
+        """Prepare every registered statement that is not prepared yet."""
+        with self._lock:
+            if self._session is None:
+                return
+            for name in list(self._cql):
+                if name not in self._prepared:
+                    self._prepared[name] = self._prepare(self._cql[name])
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._cql
+
+    def __len__(self) -> int:
+        return len(self._cql)
@@ -1,25 +1,33 @@
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from ..entities.user import UserCreate, Token, User, UserResponse
-from ..services.auth_service import AuthService
-from ..dependencies import get_db
+from ..services.auth_service import AsyncAuthService, AuthService
+from ..dependencies import get_db, app_scoped
 from ..config.security import settings
+from ..exceptions import ConflictError, ServiceUnavailableError
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-def get_auth_service(db=Depends(get_db)) -> AuthService:
-    return AuthService(db)
+async def get_auth_service(db=Depends(get_db)) -> AuthService:
+    return app_scoped(db, AuthService)
 
-def get_current_user(token: str = Depends(oauth2_scheme), auth_service: AuthService = Depends(get_auth_service)) -> User:
-    return auth_service.get_current_user(token)
+async def get_async_auth_service(db=Depends(get_db)) -> AsyncAuthService:
+    return app_scoped(db, AsyncAuthService)
+
+async def get_current_user(token: str = Depends(oauth2_scheme), auth_service: AsyncAuthService = Depends(get_async_auth_service)) -> User:
+    return await auth_service.get_current_user(token)
 
 @router.post("/register", response_model=dict)
 def register(user: UserCreate, auth_service: AuthService = Depends(get_auth_service)):
-    """Register a new user."""
+    """Register a new user. Returns 409 when the username or email is taken."""
     try:
         auth_service.register_user(user)
         return {"message": "User registered successfully"}
+    except ConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ServiceUnavailableError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -43,4 +51,21 @@ def read_users_me(current_user: User = Depends(get_current_user)):
         username=current_user.username,
         email=current_user.email,
         is_active=current_user.is_active
-    )
\ No newline at end of file
+    )
+
+@router.post("/logout")
+def logout(token: str = Depends(oauth2_scheme), current_user: User = Depends(get_current_user), auth_service: AuthService = Depends(get_auth_service)):
+    """Revoke the bearer token of the request."""
+    auth_service.revoke_token(token)
+    return {"message": "Token revoked"}
+
+@router.post("/me/deactivate", response_model=UserResponse)
+def deactivate_me(current_user: User = Depends(get_current_user), auth_service: AuthService = Depends(get_auth_service)):
+    """Deactivate the current user; its tokens are rejected from then on."""
+    user = auth_service.deactivate_user(current_user.username)
+    return UserResponse(
+        id=user.id,
+        username=user.username,
+        email=user.email,
+        is_active=user.is_active
+    )
@@ -1,82 +1,198 @@
 """API routes for project management and related student queries.
 
-All endpoints require authentication. This module exposes CRUD
-endpoints for projects and an endpoint to list students assigned to a
-project.
+All endpoints require authentication. This module exposes CRUD,
+multi-get and bulk import endpoints for projects and an endpoint to
+list students assigned to a project. Endpoints are coroutines backed by
+the async services.
+
+Reads return an `ETag` and answer a matching `If-None-Match` with 304;
+updates and deletes honour `If-Match` (412 when the project changed).
+List endpoints are rendered by `render` (see `app.responses`).
 """
 
-from fastapi import APIRouter, Depends, Query
-from ..services.project_service import ProjectService
-from ..dependencies import get_db
-from ..entities.project import ProjectCreate, ProjectUpdate, ProjectResponse, ProjectListResponse
+import functools
+
+from fastapi import APIRouter, Depends, Query, Request, Response
+from ..services.project_service import AsyncProjectService
+from ..dependencies import get_db, app_scoped, lookup_ids
+from ..config.settings import app_settings
+from ..etag import entity_etag, if_match_versions, list_etag, not_modified, with_list_etag
+from ..responses import render
+from ..entities.bulk import BulkImportResponse
+from ..services.bulk_import import bulk_format, import_stream
+from ..entities.lookup import LookupRequest
+from ..entities.project import ProjectCreate, ProjectUpdate, ProjectResponse, ProjectListResponse, ProjectLookupResponse
 from ..controllers.auth_controller import get_current_user
-from typing import Optional
-from ..services.student_service import StudentService
+from typing import List, Literal, Optional, Set
+from ..services.student_service import AsyncStudentService
+from ..services.loaders import ProjectLoader, embed_projects
+from .student_controller import cached_listing, get_project_loader, list_etag_for
 from ..entities.student import StudentListResponse
 
 router = APIRouter(dependencies=[Depends(get_current_user)])
 
 
-def get_project_service(db=Depends(get_db)) -> ProjectService:
-    """Return a `ProjectService` instance for dependency injection."""
-    return ProjectService(db)
+async def get_project_service(db=Depends(get_db)) -> AsyncProjectService:
+    """Return the app-scoped `AsyncProjectService` for dependency injection."""
+    return app_scoped(db, AsyncProjectService)
 
 
-def get_student_service(db=Depends(get_db)) -> StudentService:
-    """Return a `StudentService` instance for dependency injection."""
-    return StudentService(db)
+async def get_student_service(db=Depends(get_db)) -> AsyncStudentService:
+    """Return the app-scoped `AsyncStudentService` for dependency injection."""
+    return app_scoped(db, AsyncStudentService)
 
 
 @router.get("/", response_model=ProjectListResponse)
-def list_projects(
+async def list_projects(
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=100),
     q: Optional[str] = Query(None, description="Optional search query (p_id or p_name)"),
-    service: ProjectService = Depends(get_project_service),
+    cursor: Optional[str] = Query(None, description="Opaque cursor returned as `next_cursor` by the previous page"),
+    estimate_total: bool = Query(False, description="Return an estimated `total` for unfiltered listings instead of the maintained count"),
+    match: Literal["exact", "prefix", "contains"] = Query("exact", description="How a non-id `q` matches names; prefix/contains fall back to exact without SAI support"),
+    service: AsyncProjectService = Depends(get_project_service),
 ):
-    """Return a paginated list of projects. Supports `q` search by id or name."""
-    items, total = service.list_projects(page=page, size=size, q=q)
-    return ProjectListResponse(
-        items=items,
-        total=total,
+    """Return a paginated list of projects. Supports `q` search by id or name
+    (exact, prefix or contains match as selected by `match`) and `cursor`
+    based paging. The weak `ETag` changes with every write to the
+    projects table."""
+    async def read_etag() -> str:
+        return list_etag("projects", await service.list_version(), request)
+
+    etag = None
+    if "if-none-match" in request.headers:
+        etag = await read_etag()
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+    listing = service.list_projects(page=page, size=size, q=q, cursor=cursor, estimate_total=estimate_total, match=match)
+    result, response.headers["ETag"] = await with_list_etag(etag, read_etag, listing)
+    body = ProjectListResponse(
+        items=result.items,
+        total=result.total,
         page=page,
         size=size,
+        next_cursor=result.next_cursor,
+        total_exact=result.total_exact,
     )
+    return render(body, response)
 
 
 @router.post("/", response_model=ProjectResponse)
-def create_project(project: ProjectCreate, service: ProjectService = Depends(get_project_service)):
+async def create_project(project: ProjectCreate, service: AsyncProjectService = Depends(get_project_service)):
     """Create a new project and return it."""
-    return service.create_project(project)
+    return await service.create_project(project)
+
+
+@router.get("/lookup", response_model=ProjectLookupResponse)
+async def lookup_projects_by_query(
+    request: Request,
+    response: Response,
+    ids: List[str] = Depends(lookup_ids),
+    service: AsyncProjectService = Depends(get_project_service),
+):
+    """Return the projects listed in `ids` like `POST /projects/lookup`,
+    with the list `ETag` of the projects table."""
+    async def read_etag() -> str:
+        return list_etag("projects", await service.list_version(), request)
+
+    etag = None
+    if "if-none-match" in request.headers:
+        etag = await read_etag()
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+    (items, missing), response.headers["ETag"] = await with_list_etag(etag, read_etag, service.lookup_projects(ids))
+    return render(ProjectLookupResponse(items=items, missing=missing), response)
+
+
+@router.post("/lookup", response_model=ProjectLookupResponse)
+async def lookup_projects(lookup: LookupRequest, service: AsyncProjectService = Depends(get_project_service)):
+    """Return the projects with the given ids in one call, in the order of `ids`.
+
+    Unknown ids are listed in `missing`.
+    """
+    items, missing = await service.lookup_projects(lookup.ids)
+    return ProjectLookupResponse(items=items, missing=missing)
+
+
+@router.post("/bulk", response_model=BulkImportResponse)
+async def bulk_create_projects(request: Request, service: AsyncProjectService = Depends(get_project_service)):
+    """Create projects from a streamed NDJSON (`application/x-ndjson`) or CSV (`text/csv`) body.
+
+    Each line holds one `ProjectCreate` record (CSV bodies start with a
+    header row). Rows are validated and written in chunks of
+    `BULK_CHUNK_SIZE` while the body is still being received; the
+    response reports how many rows were created and why the others
+    were rejected.
+    """
+    fmt = bulk_format(request.headers.get("content-type"))
+    return await import_stream(request.stream(), fmt, ProjectCreate, service.bulk_create_projects, app_settings.bulk_chunk_size, app_settings.bulk_max_errors)
+
+
+@router.get("/{p_id}", response_model=ProjectResponse)
+async def get_project(p_id: str, request: Request, response: Response, service: AsyncProjectService = Depends(get_project_service)):
+    """Return the project `p_id` with its `ETag`; a matching `If-None-Match` gets a 304."""
+    project, version = await service.get_project_with_version(p_id)
+    etag = entity_etag(version)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    if etag is not None:
+        response.headers["ETag"] = etag
+    return project
 
 
 @router.put("/{p_id}", response_model=ProjectResponse)
-def update_project(p_id: str, project: ProjectUpdate, service: ProjectService = Depends(get_project_service)):
-    """Update a project identified by `p_id` and return the updated resource."""
-    updated = service.update_project(p_id, project)
+async def update_project(p_id: str, project: ProjectUpdate, if_match: Optional[Set[int]] = Depends(if_match_versions), service: AsyncProjectService = Depends(get_project_service)):
+    """Update a project identified by `p_id` and return the updated resource.
+
+    With `If-Match`, the update is only applied if the project still
+    has one of the listed ETags.
+    """
+    updated = await service.update_project(p_id, project, if_match=if_match)
     return updated
 
 
 @router.delete("/{p_id}")
-def delete_project(p_id: str, service: ProjectService = Depends(get_project_service)):
+async def delete_project(p_id: str, if_match: Optional[Set[int]] = Depends(if_match_versions), service: AsyncProjectService = Depends(get_project_service)):
     """Delete the project with id `p_id` and return a confirmation message."""
-    service.delete_project(p_id)
+    await service.delete_project(p_id, if_match=if_match)
     return {"message": "Project deleted"}
 
 
 @router.get("/{p_id}/students", response_model=StudentListResponse)
-def list_project_students(
+async def list_project_students(
     p_id: str,
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=100),
     q: Optional[str] = Query(None, description="Optional search query (s_id or s_name)"),
-    service: StudentService = Depends(get_student_service)
+    cursor: Optional[str] = Query(None, description="Opaque cursor returned as `next_cursor` by the previous page"),
+    expand: Optional[Literal["project"]] = Query(None, description="Embed the project in each student as `project`"),
+    service: AsyncStudentService = Depends(get_student_service),
+    loader: ProjectLoader = Depends(get_project_loader),
 ):
-    """List students assigned to the given project id with pagination."""
-    items, total = service.list_students(page=page, size=size, q=q, project_id=p_id)
-    return StudentListResponse(
+    """List students assigned to the given project id with pagination.
+
+    The weak `ETag` follows the students table version (and the
+    projects table version with `expand=project`).
+    """
+    etag, cached = await cached_listing(request, service, loader, expand)
+    if cached is not None:
+        return cached
+    listing = service.list_students(page=page, size=size, q=q, project_id=p_id, cursor=cursor)
+    result, response.headers["ETag"] = await with_list_etag(etag, functools.partial(list_etag_for, request, service, loader, expand), listing)
+    items = await embed_projects(result.items, loader) if expand == "project" else result.items
+    body = StudentListResponse(
         items=items,
-        total=total,
+        total=result.total,
         page=page,
         size=size,
+        next_cursor=result.next_cursor,
+        total_exact=result.total_exact,
     )
+    return render(body, response)
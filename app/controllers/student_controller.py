@@ -1,64 +1,199 @@
 """API routes for student management.
 
 All endpoints in this router require an authenticated user. The router
-provides list, create, update and delete operations for `Student`
-resources. The endpoints delegate business logic to
-`StudentService`.
+provides list, multi-get, get, create, bulk import, update and delete
+operations for `Student` resources. The endpoints are coroutines and
+delegate business logic to `AsyncStudentService`, so requests waiting
+on Cassandra do not hold a threadpool thread.
+
+Reads return an `ETag` and answer a matching `If-None-Match` with 304;
+updates and deletes honour `If-Match` (412 when the student changed).
+The list endpoint is rendered by `render`, which skips the
+`response_model` round trip when `FAST_JSON_RESPONSES` is enabled.
 """
 
-from fastapi import APIRouter, Depends, Query
-from ..services.student_service import StudentService
-from ..dependencies import get_db
-from ..entities.student import StudentCreate, StudentUpdate, StudentResponse, StudentListResponse
+import functools
+
+from fastapi import APIRouter, Depends, Query, Request, Response
+from ..services.student_service import AsyncStudentService
+from ..services.loaders import ProjectLoader, embed_projects
+from ..repositories.project_repository import AsyncProjectRepository
+from ..dependencies import get_db, app_scoped, lookup_ids
+from ..config.settings import app_settings
+from ..etag import entity_etag, if_match_versions, list_etag, not_modified, with_list_etag
+from ..responses import render
+from ..entities.bulk import BulkImportResponse
+from ..services.bulk_import import bulk_format, import_stream
+from ..entities.lookup import LookupRequest
+from ..entities.student import StudentCreate, StudentUpdate, StudentResponse, StudentListResponse, StudentLookupResponse
 from ..controllers.auth_controller import get_current_user
-from typing import Optional
+from typing import List, Literal, Optional, Set, Tuple
 
 router = APIRouter(dependencies=[Depends(get_current_user)])
 
 
-def get_student_service(db=Depends(get_db)) -> StudentService:
-    """Dependency provider returning a `StudentService` instance."""
-    return StudentService(db)
+async def get_student_service(db=Depends(get_db)) -> AsyncStudentService:
+    """Dependency provider returning the app-scoped `AsyncStudentService`."""
+    return app_scoped(db, AsyncStudentService)
+
+
+async def get_project_loader(db=Depends(get_db)) -> ProjectLoader:
+    """Dependency provider returning a `ProjectLoader` scoped to the current request."""
+    return ProjectLoader(app_scoped(db, AsyncProjectRepository))
+
+
+async def list_etag_for(request: Request, service: AsyncStudentService, loader: ProjectLoader, expand: Optional[str]) -> str:
+    """Return the ETag of a student listing, following the projects table too when they are embedded.
+
+    The students version is read first (see `with_list_etag`).
+    """
+    version = await service.list_version()
+    embedded = await loader.repo.table_version() if expand == "project" else None
+    return list_etag("students", version, request, embedded)
+
+
+async def cached_listing(request: Request, service: AsyncStudentService, loader: ProjectLoader, expand: Optional[str]) -> Tuple[Optional[str], Optional[Response]]:
+    """Answer `If-None-Match` for a student listing.
+
+    Returns the ETag read for the header and the 304 response when it
+    matches; `(None, None)` without the header, in which case the ETag
+    is read alongside the listing.
+    """
+    if "if-none-match" not in request.headers:
+        return None, None
+    etag = await list_etag_for(request, service, loader, expand)
+    return etag, not_modified(request, etag)
 
 
 @router.get("/", response_model=StudentListResponse)
-def list_students(
+async def list_students(
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=100),
     q: Optional[str] = Query(None, description="Optional search query (s_id or s_name)"),
-    service: StudentService = Depends(get_student_service),
+    cursor: Optional[str] = Query(None, description="Opaque cursor returned as `next_cursor` by the previous page"),
+    estimate_total: bool = Query(False, description="Return an estimated `total` for unfiltered listings instead of the maintained count"),
+    match: Literal["exact", "prefix", "contains"] = Query("exact", description="How a non-id `q` matches names; prefix/contains fall back to exact without SAI support"),
+    expand: Optional[Literal["project"]] = Query(None, description="Embed each student's project as `project`"),
+    service: AsyncStudentService = Depends(get_student_service),
+    loader: ProjectLoader = Depends(get_project_loader),
 ):
     """Return a paginated list of students.
 
     Query param `q` may be a UUID to search by id or a string to search
-    by name. Results are returned in a `StudentListResponse` object.
+    by name; `match=prefix` or `match=contains` turns the name search
+    into a typeahead match when the server has SAI indexes. Pass the
+    `next_cursor` of a response as `cursor` to fetch the following
+    page. Results are returned in a `StudentListResponse` object. The
+    weak `ETag` changes with every write to the students table; a
+    matching `If-None-Match` is answered before the listing is read.
+    `expand=project` embeds each student's project, loaded for the
+    whole page in one batch.
     """
-    items, total = service.list_students(page=page, size=size, q=q)
-    return StudentListResponse(
+    etag, cached = await cached_listing(request, service, loader, expand)
+    if cached is not None:
+        return cached
+    read_etag = functools.partial(list_etag_for, request, service, loader, expand)
+    listing = service.list_students(page=page, size=size, q=q, cursor=cursor, estimate_total=estimate_total, match=match)
+    result, response.headers["ETag"] = await with_list_etag(etag, read_etag, listing)
+    items = await embed_projects(result.items, loader) if expand == "project" else result.items
+    body = StudentListResponse(
         items=items,
-        total=total,
+        total=result.total,
         page=page,
         size=size,
+        next_cursor=result.next_cursor,
+        total_exact=result.total_exact,
     )
+    return render(body, response)
 
 
 @router.post("/", response_model=StudentResponse)
-def create_student(student: StudentCreate, service: StudentService = Depends(get_student_service)):
+async def create_student(student: StudentCreate, service: AsyncStudentService = Depends(get_student_service)):
     """Create and return a new student. Requires authentication."""
-    return service.create_student(student)
+    return await service.create_student(student)
+
+
+@router.get("/lookup", response_model=StudentLookupResponse)
+async def lookup_students_by_query(
+    request: Request,
+    response: Response,
+    ids: List[str] = Depends(lookup_ids),
+    expand: Optional[Literal["project"]] = Query(None, description="Embed each student's project as `project`"),
+    service: AsyncStudentService = Depends(get_student_service),
+    loader: ProjectLoader = Depends(get_project_loader),
+):
+    """Return the students listed in `ids` like `POST /students/lookup`.
+
+    The response carries the list `ETag` of the students table, so
+    rosters can be revalidated with `If-None-Match`.
+    """
+    etag, cached = await cached_listing(request, service, loader, expand)
+    if cached is not None:
+        return cached
+    read_etag = functools.partial(list_etag_for, request, service, loader, expand)
+    (items, missing), response.headers["ETag"] = await with_list_etag(etag, read_etag, service.lookup_students(ids))
+    if expand == "project":
+        items = await embed_projects(items, loader)
+    return render(StudentLookupResponse(items=items, missing=missing), response)
+
+
+@router.post("/lookup", response_model=StudentLookupResponse)
+async def lookup_students(lookup: LookupRequest, service: AsyncStudentService = Depends(get_student_service)):
+    """Return the students with the given ids in one call.
+
+    Students are returned in the order of `ids` and unknown ids are
+    listed in `missing`. The ids are read concurrently, up to
+    `LOOKUP_CONCURRENCY` at a time, so the call costs a few Cassandra
+    round trips at most instead of one per id.
+    """
+    items, missing = await service.lookup_students(lookup.ids)
+    return StudentLookupResponse(items=items, missing=missing)
+
+
+@router.post("/bulk", response_model=BulkImportResponse)
+async def bulk_create_students(request: Request, service: AsyncStudentService = Depends(get_student_service)):
+    """Create students from a streamed NDJSON (`application/x-ndjson`) or CSV (`text/csv`) body.
+
+    Each line holds one `StudentCreate` record (CSV bodies start with a
+    header row). Rows are validated and written in chunks of
+    `BULK_CHUNK_SIZE` while the body is still being received; the
+    response reports how many rows were created and why the others
+    were rejected.
+    """
+    fmt = bulk_format(request.headers.get("content-type"))
+    return await import_stream(request.stream(), fmt, StudentCreate, service.bulk_create_students, app_settings.bulk_chunk_size, app_settings.bulk_max_errors)
+
+
+@router.get("/{s_id}", response_model=StudentResponse)
+async def get_student(s_id: str, request: Request, response: Response, service: AsyncStudentService = Depends(get_student_service)):
+    """Return the student `s_id` with its `ETag`; a matching `If-None-Match` gets a 304."""
+    student, version = await service.get_student_with_version(s_id)
+    etag = entity_etag(version)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    if etag is not None:
+        response.headers["ETag"] = etag
+    return student
 
 
 @router.put("/{s_id}", response_model=StudentResponse)
-def update_student(s_id: str, student: StudentUpdate, service: StudentService = Depends(get_student_service)):
-    """Update an existing student identified by `s_id`. Returns the updated student."""
-    updated = service.update_student(s_id, student)
+async def update_student(s_id: str, student: StudentUpdate, if_match: Optional[Set[int]] = Depends(if_match_versions), service: AsyncStudentService = Depends(get_student_service)):
+    """Update an existing student identified by `s_id`. Returns the updated student.
+
+    With `If-Match`, the update is only applied if the student still
+    has one of the listed ETags.
+    """
+    updated = await service.update_student(s_id, student, if_match=if_match)
     return updated
 
 
 @router.delete("/{s_id}")
-def delete_student(s_id: str, service: StudentService = Depends(get_student_service)):
+async def delete_student(s_id: str, if_match: Optional[Set[int]] = Depends(if_match_versions), service: AsyncStudentService = Depends(get_student_service)):
     """Delete the student with the given `s_id` and return a confirmation message."""
-    service.delete_student(s_id)
+    await service.delete_student(s_id, if_match=if_match)
     return {"message": "Student deleted"}
 
 
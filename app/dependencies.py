@@ -1,6 +1,52 @@
-from typing import Generator
+import threading
+import weakref
+from typing import Any, AsyncGenerator, Callable, List, Optional, TypeVar
+from fastapi import HTTPException, Query
 from .config.security import settings
+from .entities.lookup import MAX_LOOKUP_IDS
 
-def get_db() -> Generator:
+T = TypeVar("T")
+
+_scoped: "weakref.WeakKeyDictionary[Any, dict]" = weakref.WeakKeyDictionary()
+_scoped_lock = threading.RLock()
+
+
+async def get_db() -> AsyncGenerator:
+    """Yield the application `Database` without a threadpool round trip."""
     from .main import db
     yield db
+
+
+def app_scoped(db: Any, factory: Callable[[Any], T]) -> T:
+    """Return the single `factory(db)` instance for `db`, building it on first use.
+
+    Services and repositories are stateless apart from their `db`
+    reference, so one instance per database wrapper is shared by every
+    request instead of being rebuilt by each dependency call. Instances
+    are dropped together with the `db` they were built for.
+    """
+    with _scoped_lock:
+        instances = _scoped.setdefault(db, {})
+        instance = instances.get(factory)
+        if instance is None:
+            instance = factory(db)
+            instances[factory] = instance
+        return instance
+
+
+def scoped_instance(db: Any, factory: Callable[[Any], T]) -> Optional[T]:
+    """Return the `factory(db)` instance of `db` if it was built, without building it."""
+    with _scoped_lock:
+        return _scoped.get(db, {}).get(factory)
+
+
+def lookup_ids(ids: List[str] = Query(..., description=f"Ids to fetch, comma-separated or repeated (at most {MAX_LOOKUP_IDS})")) -> List[str]:
+    """Return the ids of a multi-get given as `?ids=a,b` or `?ids=a&ids=b`.
+
+    Answers 422 when more than `MAX_LOOKUP_IDS` ids are given or all
+    of them are empty.
+    """
+    values = [value.strip() for item in ids for value in item.split(",") if value.strip()]
+    if not values or len(values) > MAX_LOOKUP_IDS:
+        raise HTTPException(status_code=422, detail=f"ids must list between 1 and {MAX_LOOKUP_IDS} ids")
+    return values
@@ -0,0 +1,28 @@
+"""Pydantic models for bulk import reports."""
+
+from pydantic import BaseModel
+from typing import List
+
+
+class BulkRowError(BaseModel):
+    """A row of a bulk import that was not created.
+
+    `line` is the 1-based line of the row in the uploaded body.
+    """
+
+    line: int
+    error: str
+
+
+class BulkImportResponse(BaseModel):
+    """Outcome of a bulk import.
+
+    `errors` lists rejected rows in input order; it is capped and
+    `errors_truncated` tells whether more rows failed than are listed.
+    """
+
+    received: int
+    created: int
+    failed: int
+    errors: List[BulkRowError]
+    errors_truncated: bool = False
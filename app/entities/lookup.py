@@ -0,0 +1,13 @@
+"""Pydantic models shared by the multi-get (lookup) endpoints."""
+
+from pydantic import BaseModel, Field
+from typing import List
+
+# Most ids a single lookup may ask for, like the page size limit of listings
+MAX_LOOKUP_IDS = 100
+
+
+class LookupRequest(BaseModel):
+    """Body of `POST /<resource>/lookup`: the ids to fetch, in the order wanted."""
+
+    ids: List[str] = Field(min_length=1, max_length=MAX_LOOKUP_IDS)
@@ -4,17 +4,29 @@ These models validate and structure project data exchanged by the API
 and stored in Cassandra.
 """
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 
-class Project(BaseModel):
-    """Full representation of a project stored in the database."""
+
+class ProjectResponse(BaseModel):
+    """Response model for project data."""
 
     p_id: Optional[str] = None
     p_name: str
     p_head: str
 
 
+class Project(ProjectResponse):
+    """Full representation of a project stored in the database.
+
+    `version` is the latest write time of the row in microseconds, when
+    read from the database; it is used for ETags and never serialized.
+    A `Project` is a `ProjectResponse`, so services return it as is.
+    """
+
+    version: Optional[int] = Field(default=None, exclude=True)
+
+
 class ProjectCreate(BaseModel):
     """Payload model for creating a new project."""
 
@@ -29,18 +41,27 @@ class ProjectUpdate(BaseModel):
     p_head: Optional[str] = None
 
 
-class ProjectResponse(BaseModel):
-    """Response model for project data."""
-
-    p_id: Optional[str] = None
-    p_name: str
-    p_head: str
-
-
 class ProjectListResponse(BaseModel):
-    """Paginated list response for projects."""
+    """Paginated list response for projects.
+
+    `total_exact` is False when `total` is a size estimate.
+    """
 
     items: List[ProjectResponse]
     total: int
     page: int
     size: int
+    next_cursor: Optional[str] = None
+    total_exact: bool = True
+
+
+class ProjectLookupResponse(BaseModel):
+    """Result of a multi-get of projects.
+
+    `items` holds the projects found, in the order their ids were
+    requested (duplicates removed); `missing` lists the requested ids
+    that do not exist, in the same order.
+    """
+
+    items: List[ProjectResponse]
+    missing: List[str]
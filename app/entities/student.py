@@ -5,10 +5,28 @@ layer. Field names use a simple `s_` prefix to match the underlying
 storage schema.
 """
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 
-class Student(BaseModel):
+from .project import ProjectResponse
+
+
+class StudentResponse(BaseModel):
+    """Model used in responses when returning student data.
+
+    `project` embeds the student's project when a listing is requested
+    with `expand=project`; it is left out of the output otherwise.
+    """
+
+    s_id: Optional[str] = None
+    s_name: str
+    s_course: str
+    s_branch: str
+    s_project_id: Optional[str] = None
+    project: Optional[ProjectResponse] = Field(default=None, exclude_if=lambda project: project is None)
+
+
+class Student(StudentResponse):
     """Complete representation of a student as stored in the database.
 
     Fields:
@@ -17,13 +35,14 @@ class Student(BaseModel):
     - `s_course`: course name or code.
     - `s_branch`: student's branch or specialization.
     - `s_project_id`: optional id of the associated project.
+    - `version`: latest write time of the row in microseconds, when
+      read from the database; used for ETags and never serialized.
+
+    A `Student` is a `StudentResponse`, so services return it as is
+    instead of copying it into a new response model.
     """
 
-    s_id: Optional[str] = None
-    s_name: str
-    s_course: str
-    s_branch: str
-    s_project_id: Optional[str] = None
+    version: Optional[int] = Field(default=None, exclude=True)
 
 
 class StudentCreate(BaseModel):
@@ -50,20 +69,27 @@ class StudentUpdate(BaseModel):
     s_project_id: Optional[str] = None
 
 
-class StudentResponse(BaseModel):
-    """Model used in responses when returning student data."""
-
-    s_id: Optional[str] = None
-    s_name: str
-    s_course: str
-    s_branch: str
-    s_project_id: Optional[str] = None
-
-
 class StudentListResponse(BaseModel):
-    """Paginated list response for students."""
+    """Paginated list response for students.
+
+    `total_exact` is False when `total` is a size estimate.
+    """
 
     items: List[StudentResponse]
     total: int
     page: int
     size: int
+    next_cursor: Optional[str] = None
+    total_exact: bool = True
+
+
+class StudentLookupResponse(BaseModel):
+    """Result of a multi-get of students.
+
+    `items` holds the students found, in the order their ids were
+    requested (duplicates removed); `missing` lists the requested ids
+    that do not exist, in the same order.
+    """
+
+    items: List[StudentResponse]
+    missing: List[str]
@@ -0,0 +1,99 @@
+"""HTTP validators (ETags) for entity and list responses.
+
+An entity's ETag is strong and built from its version, the latest
+`WRITETIME` of its columns in microseconds. A list page's ETag is weak
+and built from the table version (`BaseRepository.table_version`, a
+counter bumped by every write to the table) and the query string, so
+it changes whenever any row of the table may have changed.
+
+`not_modified` answers a matching `If-None-Match` with a bodiless 304
+before the response model is serialized. List routes only read the
+table version up front when the request carries `If-None-Match`;
+otherwise `with_list_etag` reads it alongside the listing.
+`if_match_versions` is a dependency parsing `If-Match` into the entity
+versions a write is conditional on.
+"""
+
+import asyncio
+import hashlib
+from typing import Awaitable, Callable, Optional, Set, Tuple, TypeVar
+
+from fastapi import Request, Response
+
+
+def entity_etag(version: Optional[int]) -> Optional[str]:
+    """Return the ETag of an entity `version`, or `None` when it is unknown."""
+    if version is None:
+        return None
+    return f'"{version:x}"'
+
+
+def list_etag(table: str, version: int, request: Request, embedded: Optional[int] = None) -> str:
+    """Return the weak ETag of a list page of `table` at `version`.
+
+    `embedded` is the version of a second table whose rows are embedded
+    in the page (e.g. projects with `expand=project`), so the ETag also
+    changes when those rows do.
+    """
+    digest = hashlib.blake2b(request.url.query.encode(), digest_size=8).hexdigest()
+    if embedded is not None:
+        return f'W/"{table}-{version:x}.{embedded:x}-{digest}"'
+    return f'W/"{table}-{version:x}-{digest}"'
+
+
+T = TypeVar("T")
+
+
+async def with_list_etag(etag: Optional[str], read_etag: Callable[[], Awaitable[str]], listing: Awaitable[T]) -> Tuple[T, str]:
+    """Await `listing` and return it with the ETag of the list page.
+
+    `etag` is the ETag already read to answer `If-None-Match`, if any.
+    Otherwise `read_etag()` runs concurrently with the listing: its
+    table version read is sent first, so a write racing the listing
+    can only leave an older ETag, which costs the client a refetch.
+    """
+    if etag is not None:
+        return await listing, etag
+    etag, result = await asyncio.gather(read_etag(), listing)
+    return result, etag
+
+
+def _opaque(tag: str) -> str:
+    """Return `tag` without its weakness indicator, for weak comparison."""
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def not_modified(request: Request, etag: Optional[str]) -> Optional[Response]:
+    """Return a 304 response when `If-None-Match` matches `etag`, else `None`."""
+    header = request.headers.get("if-none-match")
+    if etag is None or header is None:
+        return None
+    opaque = _opaque(etag)
+    for tag in header.split(","):
+        if tag.strip() == "*" or _opaque(tag) == opaque:
+            return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
+def if_match_versions(request: Request) -> Optional[Set[int]]:
+    """Return the entity versions listed by `If-Match`.
+
+    `None` when the header is absent or `*` (any existing entity).
+    `If-Match` uses strong comparison, so weak and unparseable tags
+    match no version; a header listing only such tags always fails.
+    """
+    header = request.headers.get("if-match")
+    if header is None:
+        return None
+    versions: Set[int] = set()
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return None
+        if len(tag) > 2 and tag[0] == tag[-1] == '"':
+            try:
+                versions.add(int(tag[1:-1], 16))
+            except ValueError:
+                pass
+    return versions
@@ -16,3 +16,28 @@ class ConflictError(AppError):
 class DatabaseError(AppError):
     """Raised for database-related errors (connection, session, etc.)."""
     pass
+
+
+class DatabaseUnavailableError(DatabaseError):
+    """Raised without waiting while the database circuit breaker is open."""
+    pass
+
+
+class ServiceUnavailableError(AppError):
+    """Raised when a bounded resource is saturated and the request should be retried."""
+    pass
+
+
+class PreconditionFailedError(AppError):
+    """Raised when a conditional write does not match the current version of an entity."""
+    pass
+
+
+class TokenNotRevocableError(AppError):
+    """Raised when a token without a `jti` claim (issued before they were added) is revoked."""
+    pass
+
+
+class InvalidCursorError(AppError):
+    """Raised when a pagination cursor cannot be decoded or resumed."""
+    pass
@@ -2,46 +2,79 @@
 
 This module configures the FastAPI application, exception handlers,
 middlewares and registers routers. A lifecycle context manager is used
-to initialize a `Database` wrapper during startup and close it on
-shutdown.
+to initialize a `Database` wrapper during startup, prepare the
+repository statements, warm the connection pools, run the token
+revocation refresher and close it on shutdown. `/ready` reports
+whether this worker finished warming up and still reaches Cassandra;
+`/metrics` exposes Prometheus metrics (see `app.metrics`).
+
+The lifespan runs in every worker process (see `app.server`), so each
+worker owns its own `Database`.
 """
 
 from typing import Union
 from contextlib import asynccontextmanager
+import asyncio
+import math
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 import os
 
+from .config.cluster import cluster_settings
+from .config.settings import app_settings
 from .config.database import Database
+from .dependencies import app_scoped
+from .repositories.project_repository import ProjectRepository
+from .repositories.student_repository import StudentRepository
+from .repositories.user_repository import UserRepository
+from .repositories.revoked_token_repository import RevokedTokenRepository
+from .repositories.base import read_pool
+from .services.auth_service import password_hasher, revocation_refresher
 from .controllers.auth_controller import router as auth_router
 from .controllers.project_controller import router as project_router
 from .controllers.student_controller import router as student_router
 from .config.security import settings, is_default_secret, SecurityHeadersMiddleware
-from fastapi import Request
+from fastapi import Request, Response
 from fastapi.responses import JSONResponse
-from .exceptions import AppError, NotFoundError, ConflictError, DatabaseError
+from prometheus_client import REGISTRY, multiprocess
+from .metrics import MetricsMiddleware, StatsCollector, latest
+from .query_log import query_log
+from .exceptions import AppError, NotFoundError, ConflictError, DatabaseError, DatabaseUnavailableError, PreconditionFailedError, ServiceUnavailableError
 
 db = None
+ready = False
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup/shutdown lifecycle: initialize `db` and close on exit.
 
-    The database contact points and keyspace are hard-coded here; in a
-    production setup these would come from configuration or environment
-    variables.
+    The database contact points, keyspace and execution profiles come
+    from `cluster_settings` (`CASSANDRA_*` environment variables).
     """
-    global db
-
-    contact_points = ['cassandra']
-    keyspace = 'dawan'
-    db = Database(contact_points, keyspace)
+    global db, ready
+
+    db = Database(cluster_settings)
+    for repository in (StudentRepository, ProjectRepository, UserRepository, RevokedTokenRepository):
+        app_scoped(db, repository).register_statements()
+    db.statements.prepare_all()
+    warmed = await asyncio.to_thread(db.warm_up, app_settings.warmup_timeout_seconds)
+    logger.info("Warmed connections to %d Cassandra host(s)", warmed)
+    await asyncio.to_thread(app_scoped(db, password_hasher).calibrate, settings.password_hash_target_ms / 1000, settings.argon2_max_memory_kib)
+    refresher = asyncio.create_task(revocation_refresher(db))
+    ready = True
     yield
+    ready = False
+    refresher.cancel()
+    app_scoped(db, password_hasher).shutdown()
+    app_scoped(db, query_log).shutdown()
+    app_scoped(db, read_pool).shutdown(wait=False, cancel_futures=True)
     if db:
         db.close()
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(os.getpid())
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 logger = logging.getLogger("app")
@@ -61,6 +94,13 @@ async def app_error_handler(request: Request, exc: AppError):
         return JSONResponse(status_code=404, content={"detail": str(exc) or "Not found"})
     if isinstance(exc, ConflictError):
         return JSONResponse(status_code=409, content={"detail": str(exc) or "Conflict"})
+    if isinstance(exc, PreconditionFailedError):
+        return JSONResponse(status_code=412, content={"detail": str(exc) or "Precondition failed"})
+    if isinstance(exc, ServiceUnavailableError):
+        return JSONResponse(status_code=503, content={"detail": str(exc) or "Service unavailable"}, headers={"Retry-After": "1"})
+    if isinstance(exc, DatabaseUnavailableError):
+        retry_after = max(1, math.ceil(cluster_settings.reconnect_interval_seconds))
+        return JSONResponse(status_code=503, content={"detail": str(exc) or "Database unavailable"}, headers={"Retry-After": str(retry_after)})
     if isinstance(exc, DatabaseError):
         return JSONResponse(status_code=500, content={"detail": str(exc) or "Database error"})
     return JSONResponse(status_code=400, content={"detail": str(exc) or "Application error"})
@@ -87,6 +127,8 @@ app.add_middleware(
 
 
 app.add_middleware(SecurityHeadersMiddleware)
+app.add_middleware(MetricsMiddleware)
+REGISTRY.register(StatsCollector(lambda: db))
 
 
 @app.get("/", summary="Root endpoint", description="Returns a simple hello world message", tags=["Default"])
@@ -94,6 +136,19 @@ def read_root():
     return {"Hello": "World"}
 
 
+@app.get("/ready", summary="Readiness probe", description="200 once this worker is warmed up and reaches Cassandra, 503 otherwise", tags=["Default"])
+async def read_ready():
+    if not ready or db is None or not db.is_available():
+        return JSONResponse(status_code=503, content={"status": "unavailable"}, headers={"Retry-After": "1"})
+    return {"status": "ready"}
+
+
+@app.get("/metrics", summary="Prometheus metrics", description="Request, repository, cache and driver metrics in the Prometheus text format", tags=["Default"])
+def read_metrics():
+    content, content_type = latest(lambda: db)
+    return Response(content=content, media_type=content_type)
+
+
 if is_default_secret():
     logger.warning("SECRET_KEY is set to default value — please set a secure SECRET_KEY in .env")
 
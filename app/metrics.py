@@ -0,0 +1,251 @@
+"""Prometheus metrics served on `GET /metrics`.
+
+Three sources end up in the exposition:
+
+- `MetricsMiddleware` times every HTTP request into
+  `http_request_duration_seconds` and tracks `http_requests_in_flight`,
+  both labelled with the route template (e.g. `/students/{s_id}`)
+  rather than the raw path, so ids do not create new series.
+- Public methods of the repositories are wrapped by `timed` (see
+  `BaseRepository.__init_subclass__`): `repository_method_duration_seconds`
+  and `repository_rows_total` are labelled with the concrete class and
+  method, e.g. `StudentRepository.list_students`. Rows are counted by
+  the outermost timed method of the call, from the first page of every
+  read it sends (see `count_rows`).
+- `StatsCollector` turns the counters the app already keeps (circuit
+  breaker, read coalescing, entity and principal caches, password
+  hasher, revocation filter, query log) and the driver metrics of the
+  cluster (`CASSANDRA_METRICS_ENABLED`) into metric families at scrape
+  time.
+
+Every worker process keeps its own metrics. With `SERVER_WORKERS` > 1
+set `PROMETHEUS_MULTIPROC_DIR` to an empty directory shared by the
+workers: request and repository metrics are then aggregated across
+workers, while the collected stats are those of the worker answering
+the scrape.
+"""
+
+import functools
+import inspect
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+from fastapi import Request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric, StateSetMetricFamily, SummaryMetricFamily
+from prometheus_client.registry import Collector
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.routing import Match
+
+from .config.breaker import CLOSED, HALF_OPEN, OPEN
+
+# Repository calls are mostly sub-millisecond cache hits or point reads,
+# so the buckets start lower than the HTTP ones
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency by route template", ["method", "route", "status"])
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served by route template", ["method", "route"], multiprocess_mode="livesum")
+QUERY_LATENCY = Histogram("repository_method_duration_seconds", "Latency of repository methods", ["method"], buckets=QUERY_BUCKETS)
+QUERY_ROWS = Counter("repository_rows", "Rows read from Cassandra by repository method", ["method"])
+
+# Label of the outermost timed repository method of the current call
+_current_method: ContextVar[Optional[str]] = ContextVar("repository_method", default=None)
+
+
+def timed(fn: Callable) -> Callable:
+    """Wrap the repository method `fn` to record its latency.
+
+    The label is `<class of self>.<method name>`, so methods inherited
+    from `BaseRepository` are reported under the concrete repository.
+    """
+    name = fn.__name__
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def timed_async(self, *args, **kwargs):
+            label = f"{type(self).__name__}.{name}"
+            token = _current_method.set(label) if _current_method.get() is None else None
+            start = time.perf_counter()
+            try:
+                return await fn(self, *args, **kwargs)
+            finally:
+                QUERY_LATENCY.labels(label).observe(time.perf_counter() - start)
+                if token is not None:
+                    _current_method.reset(token)
+
+        return timed_async
+
+    @functools.wraps(fn)
+    def timed_sync(self, *args, **kwargs):
+        label = f"{type(self).__name__}.{name}"
+        token = _current_method.set(label) if _current_method.get() is None else None
+        start = time.perf_counter()
+        try:
+            return fn(self, *args, **kwargs)
+        finally:
+            QUERY_LATENCY.labels(label).observe(time.perf_counter() - start)
+            if token is not None:
+                _current_method.reset(token)
+
+    return timed_sync
+
+
+def count_rows(rows: int) -> None:
+    """Add `rows` to the row count of the repository method being timed, if any."""
+    method = _current_method.get()
+    if method is not None and rows:
+        QUERY_ROWS.labels(method).inc(rows)
+
+
+def route_template(request: Request) -> str:
+    """Return the path template of the route matching `request`, or `unmatched`."""
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        method = request.method
+        route = route_template(request)
+        in_flight = REQUESTS_IN_FLIGHT.labels(method, route)
+        in_flight.inc()
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            REQUEST_LATENCY.labels(method, route, str(status)).observe(time.perf_counter() - start)
+            in_flight.dec()
+
+
+# Counters and gauges of the driver's `cluster.metrics` (scales stats)
+DRIVER_COUNTERS = ("connection_errors", "write_timeouts", "read_timeouts", "unavailables", "other_errors", "retries", "ignores")
+DRIVER_GAUGES = ("known_hosts", "connected_to", "open_connections")
+DRIVER_QUANTILES = (("0.5", "median"), ("0.75", "75percentile"), ("0.95", "95percentile"), ("0.98", "98percentile"), ("0.99", "99percentile"), ("0.999", "999percentile"))
+
+
+def _counter(name: str, documentation: str, value: float) -> CounterMetricFamily:
+    return CounterMetricFamily(name, documentation, value=value)
+
+
+def _gauge(name: str, documentation: str, value: float) -> GaugeMetricFamily:
+    return GaugeMetricFamily(name, documentation, value=value)
+
+
+class StatsCollector(Collector):
+    """Expose the stats of the app-scoped objects of the current database.
+
+    `get_db` returns the `Database` of this worker, or `None` before
+    startup, in which case nothing is collected. Objects not built yet
+    are skipped rather than created by a scrape.
+    """
+
+    def __init__(self, get_db: Callable[[], Any]) -> None:
+        self.get_db = get_db
+
+    def describe(self) -> Iterator[Metric]:
+        return iter(())
+
+    def collect(self) -> Iterator[Metric]:
+        # Imported here: the services import the repositories, which
+        # import this module
+        from .cache import EntityCaches
+        from .dependencies import scoped_instance
+        from .query_log import query_log
+        from .services.auth_service import password_hasher, principal_cache, revocation_filter
+        from .singleflight import read_flights
+
+        db = self.get_db()
+        if db is None:
+            return
+
+        breaker = db.breaker.stats()
+        yield StateSetMetricFamily("cassandra_breaker_state", "Circuit breaker state of the Cassandra session", {state: breaker["state"] == state for state in (CLOSED, OPEN, HALF_OPEN)})
+        yield _counter("cassandra_breaker_opens", "Times the circuit breaker opened", breaker["opens"])
+        yield _counter("cassandra_breaker_rejections", "Requests rejected while the circuit breaker was open", breaker["rejections"])
+        yield _counter("cassandra_breaker_failures", "Failed reconnection attempts", breaker["failures"])
+
+        flights = scoped_instance(db, read_flights)
+        if flights is not None:
+            stats = flights.stats()
+            yield _counter("read_flights_executed", "Reads sent to Cassandra by the read coalescer", stats["executed"])
+            yield _counter("read_flights_coalesced", "Reads that shared the result of an identical read in flight", stats["coalesced"])
+            yield _gauge("read_flights_in_flight", "Distinct reads in flight", stats["in_flight"])
+
+        caches = scoped_instance(db, EntityCaches)
+        if caches is not None:
+            yield from self._entity_caches(caches.stats())
+
+        principals = scoped_instance(db, principal_cache)
+        if principals is not None:
+            stats = principals.stats()
+            yield _counter("principal_cache_hits", "Principal cache hits", stats["hits"])
+            yield _counter("principal_cache_misses", "Principal cache misses", stats["misses"])
+            yield _gauge("principal_cache_size", "Principals cached", stats["size"])
+
+        hasher = scoped_instance(db, password_hasher)
+        if hasher is not None:
+            stats = hasher.stats()
+            for key, name, documentation in (("queue_wait", "password_hash_queue_wait_seconds", "Time password jobs waited for a worker"), ("hash_time", "password_hash_duration_seconds", "Time spent hashing or verifying passwords")):
+                yield SummaryMetricFamily(name, documentation, count_value=stats[key]["count"], sum_value=stats[key]["total"])
+            yield _counter("password_hash_rejected", "Password jobs rejected because the queue was full", stats["rejected"])
+
+        queries = scoped_instance(db, query_log)
+        if queries is not None:
+            yield _counter("query_traces_dropped", "Sampled statement traces dropped because the trace queue was full", queries.dropped_traces)
+
+        revocations = scoped_instance(db, revocation_filter)
+        if revocations is not None:
+            yield _gauge("revoked_tokens", "Revoked tokens held by the revocation filter", len(revocations))
+
+        cluster_metrics = getattr(getattr(db, "cluster", None), "metrics", None)
+        if cluster_metrics is not None:
+            yield from self._driver(cluster_metrics.get_stats())
+
+    @staticmethod
+    def _entity_caches(stats) -> Iterator[Metric]:
+        families = {
+            "hits": CounterMetricFamily("entity_cache_hits", "Entity cache hits", labels=["table"]),
+            "misses": CounterMetricFamily("entity_cache_misses", "Entity cache misses", labels=["table"]),
+            "evictions": CounterMetricFamily("entity_cache_evictions", "Entity cache evictions", labels=["table"]),
+            "rejections": CounterMetricFamily("entity_cache_rejections", "Entries refused admission by TinyLFU", labels=["table"]),
+            "size": GaugeMetricFamily("entity_cache_size", "Entities cached", labels=["table"]),
+        }
+        for table, table_stats in stats.items():
+            for key, family in families.items():
+                family.add_metric([table], table_stats[key])
+        return iter(families.values())
+
+    @staticmethod
+    def _driver(stats) -> Iterator[Metric]:
+        for name in DRIVER_COUNTERS:
+            yield _counter(f"cassandra_driver_{name}", f"Driver {name.replace('_', ' ')}", stats[name])
+        for name in DRIVER_GAUGES:
+            # Gauges of the driver stats are callables evaluated on read
+            value = stats[name]
+            yield _gauge(f"cassandra_driver_{name}", f"Driver {name.replace('_', ' ')}", value() if callable(value) else value)
+        timer = stats["request_timer"]
+        yield _counter("cassandra_driver_requests", "Requests timed by the driver", timer["count"])
+        # Quantiles of the driver's sampled request latencies, which it
+        # refreshes at most every 20 seconds
+        latency = GaugeMetricFamily("cassandra_driver_request_latency_seconds", "Driver request latency quantiles", labels=["quantile"])
+        for quantile, key in DRIVER_QUANTILES:
+            latency.add_metric([quantile], timer.get(key, 0.0))
+        yield latency
+
+
+def latest(get_db: Callable[[], Any]) -> Tuple[bytes, str]:
+    """Return the exposition of every metric and its content type."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(StatsCollector(get_db))
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
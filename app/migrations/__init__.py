@@ -0,0 +1,242 @@
+"""Versioned schema migrations.
+
+The schema is built by the ordered steps of `MIGRATIONS`. Each applied
+step is recorded in the `schema_version` table (one row per version in
+a single partition, newest first), so finding the current version is a
+single-partition read. `Database` reads it once at startup and only
+runs DDL when the schema is behind `LATEST_VERSION`.
+
+Derived data that may drift (the `row_counts` counters) is rebuilt
+with `python -m app.migrations recount`, run by hand from a single
+process. It is not a migration step: counter corrections are not
+idempotent, and every worker runs `migrate` at startup when
+`SCHEMA_AUTO_MIGRATE` is set, so concurrent recounts would apply the
+same correction several times.
+
+Steps must be idempotent (`IF NOT EXISTS` / `IF EXISTS`, re-runnable
+backfills): a deployment that predates this table starts at version 0
+and replays every step over its existing tables, and two processes
+migrating at the same time only repeat work.
+
+Apply migrations from a single place, ideally a release job, with the
+CLI::
+
+    python -m app.migrations status
+    python -m app.migrations upgrade [--to VERSION]
+    python -m app.migrations recount
+"""
+
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from cassandra import InvalidRequest
+
+SCHEMA_SCOPE = "app"
+
+
+class Migration(NamedTuple):
+    """One schema step: `apply(db)` runs against the application keyspace."""
+
+    version: int
+    description: str
+    apply: Callable[[Any], None]
+
+
+def _base_tables(db) -> None:
+    session = db.session
+    session.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        id text PRIMARY KEY,
+        username text,
+        email text,
+        hashed_password text,
+        is_active boolean
+    );
+    """)
+    session.execute("""
+    CREATE TABLE IF NOT EXISTS projects (
+        p_id text PRIMARY KEY,
+        p_name text,
+        p_head text
+    );
+    """)
+    session.execute("""
+    CREATE TABLE IF NOT EXISTS students (
+        s_id text PRIMARY KEY,
+        s_name text,
+        s_course text,
+        s_branch text,
+        s_project_id text
+    );
+    """)
+    # Maintained row counts: one partition per table, one counter per
+    # scope ('' for the whole table, '<column>=<value>' for filters)
+    session.execute("""
+    CREATE TABLE IF NOT EXISTS row_counts (
+        table_name text,
+        scope text,
+        row_count counter,
+        PRIMARY KEY (table_name, scope)
+    );
+    """)
+
+
+def _user_lookup_tables(db) -> None:
+    """Lookup tables keyed by username and email, replacing their secondary indexes.
+
+    Written with IF NOT EXISTS by UserRepository so both values are
+    unique; users_by_username holds a full copy for authentication.
+    """
+    from ..repositories.user_repository import UserRepository
+
+    session = db.session
+    session.execute("""
+    CREATE TABLE IF NOT EXISTS users_by_username (
+        username text PRIMARY KEY,
+        id text,
+        email text,
+        hashed_password text,
+        is_active boolean
+    );
+    """)
+    session.execute("""
+    CREATE TABLE IF NOT EXISTS users_by_email (
+        email text PRIMARY KEY,
+        username text,
+        id text
+    );
+    """)
+    # Secondary index reads fan out to every node of the cluster
+    session.execute("DROP INDEX IF EXISTS users_username_idx;")
+    session.execute("DROP INDEX IF EXISTS users_email_idx;")
+    UserRepository(db).backfill_lookup_tables()
+
+
+def _students_by_project(db) -> None:
+    """Query table listing the students of a project from a single partition."""
+    from ..repositories.student_repository import StudentRepository
+
+    session = db.session
+    session.execute("""
+    CREATE TABLE IF NOT EXISTS students_by_project (
+        s_project_id text,
+        s_id text,
+        s_name text,
+        s_course text,
+        s_branch text,
+        PRIMARY KEY (s_project_id, s_id)
+    );
+    """)
+    session.execute("DROP INDEX IF EXISTS students_project_idx;")
+    StudentRepository(db).backfill_students_by_project()
+
+
+def _revoked_tokens(db) -> None:
+    # Revoked token keys ('jti:<id>' or 'sub:<username>'), written
+    # with a TTL matching the remaining token lifetime
+    db.session.execute("""
+    CREATE TABLE IF NOT EXISTS revoked_tokens (
+        key text PRIMARY KEY
+    );
+    """)
+
+
+def _name_search_indexes(db) -> None:
+    db.create_search_indexes()
+
+
+def _table_versions(db) -> None:
+    # Change counter per table, bumped after every write; list
+    # endpoints derive their ETags from it
+    db.session.execute("""
+    CREATE TABLE IF NOT EXISTS table_versions (
+        table_name text PRIMARY KEY,
+        version counter
+    );
+    """)
+
+
+def recount_rows(db) -> Dict[str, Dict[str, int]]:
+    """Recount `row_counts` of every counted table; return the corrections by table.
+
+    `row_counts` starts empty on tables that already hold rows, and
+    counters drift when a counter batch is retried or times out. Two
+    recounts running at the same time both apply their corrections, so
+    run it from one process only (see the module docstring).
+    """
+    from ..repositories.project_repository import ProjectRepository
+    from ..repositories.student_repository import StudentRepository
+
+    return {repository.table: repository(db).recount_rows() for repository in (StudentRepository, ProjectRepository)}
+
+
+def _recount_moved(db) -> None:
+    # Version 7 used to recount `row_counts`, which is not idempotent;
+    # it is kept as a no-op so that the schemas that already recorded
+    # it and the new ones agree on what version 7 means
+    pass
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "users, projects, students and row_counts tables", _base_tables),
+    Migration(2, "users_by_username/users_by_email lookup tables", _user_lookup_tables),
+    Migration(3, "students_by_project query table", _students_by_project),
+    Migration(4, "revoked_tokens table", _revoked_tokens),
+    Migration(5, "name search indexes (SAI or legacy)", _name_search_indexes),
+    Migration(6, "table_versions counters", _table_versions),
+    Migration(7, "no-op (row_counts recount moved to `python -m app.migrations recount`)", _recount_moved),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(db) -> int:
+    """Return the schema version of `db.keyspace`, 0 when none was recorded.
+
+    A missing keyspace or `schema_version` table also reads as 0.
+    """
+    try:
+        row = db.session.execute(
+            f"SELECT version FROM {db.keyspace}.schema_version WHERE scope = %s LIMIT 1", (SCHEMA_SCOPE,)
+        ).one()
+    except InvalidRequest:
+        return 0
+    return row.version if row else 0
+
+
+def migrate(db, target: Optional[int] = None) -> List[Migration]:
+    """Apply the migrations above the current version, up to `target`.
+
+    Creates the keyspace and the `schema_version` table when missing.
+    Returns the migrations that were applied, in order.
+    """
+    target = LATEST_VERSION if target is None else target
+    session = db.session
+    session.execute(f"""
+    CREATE KEYSPACE IF NOT EXISTS {db.keyspace}
+    WITH REPLICATION = {{ 'class' : 'SimpleStrategy', 'replication_factor' : 1 }};
+    """)
+    session.set_keyspace(db.keyspace)
+    # Backfill steps go through repositories, whose prepared statements
+    # name tables relative to the keyspace
+    db.statements.bind(session)
+    session.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        scope text,
+        version int,
+        description text,
+        applied_at timestamp,
+        PRIMARY KEY (scope, version)
+    ) WITH CLUSTERING ORDER BY (version DESC);
+    """)
+    current = current_version(db)
+    applied = []
+    for migration in MIGRATIONS:
+        if current < migration.version <= target:
+            print(f"Applying schema migration {migration.version}: {migration.description}")
+            migration.apply(db)
+            session.execute(
+                "INSERT INTO schema_version (scope, version, description, applied_at) VALUES (%s, %s, %s, toTimestamp(now()))",
+                (SCHEMA_SCOPE, migration.version, migration.description),
+            )
+            applied.append(migration)
+    return applied
@@ -0,0 +1,45 @@
+"""Command line entry point: `python -m app.migrations {status,upgrade,recount}`.
+
+Connects with the `CASSANDRA_*` settings without running the boot-time
+schema check, so it also works against an outdated schema.
+"""
+
+import argparse
+import sys
+
+from ..config.cluster import cluster_settings
+from ..config.database import Database
+from . import LATEST_VERSION, MIGRATIONS, current_version, migrate, recount_rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.migrations", description="Manage the Cassandra schema version.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="print the current and latest schema versions")
+    upgrade = commands.add_parser("upgrade", help="apply pending migrations")
+    upgrade.add_argument("--to", type=int, default=None, help="stop at this version (default: latest)")
+    commands.add_parser("recount", help="recount the rows of every table and repair row_counts")
+    args = parser.parse_args(argv)
+
+    db = Database(cluster_settings, check_schema=False)
+    try:
+        current = current_version(db)
+        if args.command == "status":
+            print(f"Schema version {current}, latest {LATEST_VERSION}")
+            for migration in MIGRATIONS:
+                state = "applied" if migration.version <= current else "pending"
+                print(f"  {migration.version:>3}  {state:<8} {migration.description}")
+            return 0 if current >= LATEST_VERSION else 1
+        if args.command == "recount":
+            for table, deltas in recount_rows(db).items():
+                print(f"{table}: {len(deltas)} scope(s) corrected" + "".join(f"\n  {scope or '(table)'}: {delta:+d}" for scope, delta in sorted(deltas.items())))
+            return 0
+        applied = migrate(db, args.to)
+        print(f"Applied {len(applied)} migration(s); schema version {current_version(db)}")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""Slow-query log and sampled request tracing of repository statements.
+
+Every statement sent by a repository (see `BaseRepository._send`, and
+`_send_concurrent` for bulk writes) is reported to the app-scoped
+`QueryLog` of its database with its latency. Statements slower than
+`CASSANDRA_SLOW_QUERY_MS` are logged on the `app.queries` logger as one
+JSON object with:
+
+- `statement`: the registry name of the statement, and `cql` its text;
+  `allow_filtering` flags the `ALLOW FILTERING` scans;
+- `params`: the shapes of the bound parameters (type names, and sizes
+  of collections), never their values;
+- `latency_ms`, `coordinator` (the host that answered), `rows` (rows of
+  the first page) and `error` for failed statements.
+
+A fraction `CASSANDRA_TRACE_SAMPLE_RATE` of the statements is sent with
+`trace=True`. Cassandra then records the server-side events of the
+request (replicas contacted, index or sstable reads, tombstones...);
+they are fetched from `system_traces` by a background thread, so the
+request does not wait for them, and logged with the same fields plus
+`trace`. Sampled statements are logged whatever their latency. At most
+`TRACE_QUEUE_DEPTH` traces wait for the thread; the traces of sampled
+statements beyond that are dropped (the statement is logged without
+them) and counted in `dropped_traces`.
+"""
+
+import json
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from .config.cluster import cluster_settings
+
+logger = logging.getLogger("app.queries")
+
+# Cassandra writes trace events asynchronously; wait at most this long
+# for the trace of a sampled statement to be complete
+TRACE_WAIT_SECONDS = 2.0
+
+# Traces waiting for (or being fetched by) the trace thread; each fetch
+# may wait `TRACE_WAIT_SECONDS`, so a burst of sampled statements would
+# otherwise queue up without bound
+TRACE_QUEUE_DEPTH = 64
+
+
+def param_shape(value: Any) -> str:
+    """Describe `value` without revealing it, e.g. `str`, `UUID` or `list[3]`."""
+    if value is None:
+        return "null"
+    name = type(value).__name__
+    if isinstance(value, (list, tuple, set, frozenset, dict)):
+        return f"{name}[{len(value)}]"
+    return name
+
+
+def statement_cql(statement: Any) -> str:
+    """Return the CQL text of a bound, simple or batch statement."""
+    prepared = getattr(statement, "prepared_statement", None)
+    if prepared is not None:
+        return prepared.query_string
+    query_string = getattr(statement, "query_string", None)
+    if query_string is not None:
+        return query_string
+    return type(statement).__name__
+
+
+class QueryLog:
+    """Log the statements slower than a threshold and trace a sample of them.
+
+    `slow_ms` <= 0 disables the slow-query log; `trace_rate` is the
+    probability of tracing a statement (0 disables tracing).
+    `dropped_traces` counts the traces not fetched because
+    `TRACE_QUEUE_DEPTH` traces were already pending.
+    """
+
+    def __init__(self, slow_ms: float, trace_rate: float, sample: Callable[[], float] = random.random) -> None:
+        self.slow_ms = slow_ms
+        self.trace_rate = trace_rate
+        self._sample = sample
+        # Threads are only started by the first traced statement
+        self._tracer: Optional[ThreadPoolExecutor] = ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-trace") if trace_rate > 0 else None
+        self._trace_slots = threading.BoundedSemaphore(TRACE_QUEUE_DEPTH)
+        self._lock = threading.Lock()
+        self.dropped_traces = 0
+
+    def should_trace(self) -> bool:
+        """Return True if the next statement should be sent with `trace=True`."""
+        return self.trace_rate > 0 and self._sample() < self.trace_rate
+
+    def record(
+        self,
+        name: str,
+        statement: Any,
+        params: Sequence[Any],
+        seconds: float,
+        response_future: Any = None,
+        rows: Optional[int] = None,
+        error: Optional[BaseException] = None,
+        traced: bool = False,
+    ) -> None:
+        """Report a statement that took `seconds`; log it if slow or traced.
+
+        `response_future` is the driver `ResponseFuture` of the request,
+        used for its coordinator and, when `traced`, its trace.
+        """
+        slow = 0 < self.slow_ms <= seconds * 1000
+        if not slow and not traced:
+            return
+        entry = self.entry(name, statement, params, seconds, response_future, rows, error)
+        if traced and response_future is not None and self._tracer is not None:
+            if self._trace_slots.acquire(blocking=False):
+                try:
+                    future = self._tracer.submit(self._log_traced, entry, response_future, slow)
+                except BaseException:
+                    self._trace_slots.release()
+                    raise
+                future.add_done_callback(lambda _: self._trace_slots.release())
+                return
+            with self._lock:
+                self.dropped_traces += 1
+        self._log(entry, slow)
+
+    @staticmethod
+    def entry(name: str, statement: Any, params: Sequence[Any], seconds: float, response_future: Any = None, rows: Optional[int] = None, error: Optional[BaseException] = None) -> Dict[str, Any]:
+        """Build the log entry of a statement (see the module docstring)."""
+        cql = statement_cql(statement)
+        coordinator = getattr(response_future, "coordinator_host", None)
+        entry: Dict[str, Any] = {
+            "statement": name,
+            "cql": cql,
+            "allow_filtering": "ALLOW FILTERING" in cql.upper(),
+            "params": [param_shape(value) for value in params],
+            "latency_ms": round(seconds * 1000, 3),
+            "coordinator": str(coordinator) if coordinator is not None else None,
+            "rows": rows,
+        }
+        if error is not None:
+            entry["error"] = type(error).__name__
+        return entry
+
+    @staticmethod
+    def trace_events(trace: Any) -> Dict[str, Any]:
+        """Return the fields of a driver `QueryTrace` worth logging."""
+        return {
+            "trace_id": str(trace.trace_id),
+            "coordinator": str(trace.coordinator),
+            "duration_us": int(trace.duration.total_seconds() * 1e6) if trace.duration is not None else None,
+            "events": [
+                {"source": str(event.source), "elapsed_us": int(event.source_elapsed.total_seconds() * 1e6) if event.source_elapsed is not None else None, "thread": event.thread_name, "description": event.description}
+                for event in trace.events
+            ],
+        }
+
+    def _log_traced(self, entry: Dict[str, Any], response_future: Any, slow: bool) -> None:
+        try:
+            entry["trace"] = self.trace_events(response_future.get_query_trace(TRACE_WAIT_SECONDS))
+        except Exception as e:
+            entry["trace"] = {"error": type(e).__name__}
+        self._log(entry, slow)
+
+    @staticmethod
+    def _log(entry: Dict[str, Any], slow: bool) -> None:
+        logger.log(logging.WARNING if slow else logging.INFO, "%s query %s", "Slow" if slow else "Traced", json.dumps(entry, default=str))
+
+    def shutdown(self) -> None:
+        """Stop the trace thread, dropping the traces not fetched yet."""
+        if self._tracer is not None:
+            self._tracer.shutdown(wait=False, cancel_futures=True)
+            self._tracer = None
+
+
+def query_log(db) -> QueryLog:
+    """Build the `QueryLog` shared by every repository of `db` (see `app_scoped`)."""
+    return QueryLog(cluster_settings.slow_query_ms, cluster_settings.trace_sample_rate)
@@ -2,138 +2,1105 @@
 
 This module provides `BaseRepository`, a small helper class that wraps
 access to a Cassandra session and exposes a common `list_with_search`
-method used by concrete repository implementations.
+method used by concrete repository implementations, and
+`AsyncBaseRepository`, its asyncio counterpart built on
+`session.execute_async`.
 
 The class is intentionally lightweight: concrete repositories set the
 `table` and `prefix` class attributes and reuse the provided `db`
-connection object.
+connection object. Queries go through named prepared statements held by
+the `StatementRegistry` of `db` so that each CQL text is parsed by
+Cassandra only once and bound statements can be routed token-aware.
+
+Every query runs under one of the execution profiles of
+`app.config.cluster`: `SELECT`s default to `PROFILE_READ` and other
+statements to `PROFILE_WRITE`; listings, counts and scans pass
+`PROFILE_SCAN` explicitly.
+
+Identical concurrent `SELECT`s are coalesced by the `SingleFlight` of
+`db` (see `app.singleflight`) and return a `ReadResult`, the first page
+of the read, which every caller can consume; every write starts a new
+generation of the coalescer first.
+
+Statements are reported to the `QueryLog` of `db`, which logs the slow
+ones and traces a sample of them (see `app.query_log`). Public
+repository methods are timed for `/metrics` (see
+`app.metrics.timed`) and the rows their reads return are counted.
 """
 
-from cassandra.query import SimpleStatement
+import asyncio
+import base64
+import binascii
+import contextvars
+import inspect
+import threading
+import time
 import uuid
-from typing import Tuple, Any, Optional, Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, Any, Callable, Collection, Iterable, Optional, Dict, List, NamedTuple
 
-class BaseRepository:
-  """Common repository base for simple Cassandra queries.
+from cassandra import InvalidRequest
+from cassandra.cluster import ResultSet
+from cassandra.protocol import ProtocolException
+from cassandra.query import BatchStatement, BatchType
 
-  Attributes:
-  - `table` (str): target Cassandra table name; must be provided by
-      subclasses.
-  - `select_cols` (str): columns to select in queries (defaults to
-      "*").
-  - `prefix` (str): prefix used for id/name column naming in queries
-      (e.g. `student` -> `student_id`, `student_name`).
+from ..cache import NOT_CACHED, EntityCaches, TinyLFUCache
+from ..config.cluster import PROFILE_READ, PROFILE_SCAN, PROFILE_WRITE, cluster_settings
+from ..config.database import NAME_SEARCH_LIKE
+from ..config.settings import app_settings
+from ..dependencies import app_scoped
+from ..exceptions import InvalidCursorError, PreconditionFailedError
+from ..metrics import count_rows, timed
+from ..query_log import QueryLog, query_log
+from ..singleflight import SingleFlight, read_flights
 
-  The repository expects a `db` object with a `get_session()` method
-  returning a live Cassandra session.
-  """
+# Ways a non-UUID `q` can match the name column
+NAME_MATCHES = ("exact", "prefix", "contains")
 
-  table: str = ""
-  select_cols: str = "*"
-  prefix: str = ""
+# Query log label of the counter batches of `row_counts`/`table_versions`
+COUNTS_BATCH = "batch(row_counts, table_versions)"
 
-  def __init__(self, db):
-    """Initialize repository with a database connection object.
+# Public repository methods that do not serve requests and are not timed
+UNTIMED_METHODS = ("register_statements",)
 
-    Args:
-            db: Database connection wrapper exposing `get_session()`.
+
+class PageResult(NamedTuple):
+    """One page of a listing.
+
+    `next_cursor` is the opaque token to pass back as `cursor` to read
+    the following page, or `None` when the listing is exhausted.
+    `total_exact` is `False` when `total` comes from Cassandra size
+    estimates rather than from a maintained count.
+    """
+
+    items: List[Any]
+    total: int
+    next_cursor: Optional[str] = None
+    total_exact: bool = True
+
+
+class SearchPlan(NamedTuple):
+    """Statements `list_with_search` runs for a given search.
+
+    `name`/`params`/`cql` select the rows; `single` marks a lookup by
+    primary key that is read in one go instead of paginated. `total`
+    tells how the total is obtained: `("stored", scope)`,
+    `("count", name, params, cql)`, `("estimate",)` or `("rows",)`
+    (number of rows read). `profile` is the execution profile of the
+    row query. Statements are registered lazily when the plan is
+    executed.
     """
-    self.db = db
-
-  def _get_session(self):
-      """Return an active Cassandra session or raise `DatabaseError`.
-
-      This helper centralizes the check for session availability so
-      callers can assume a valid session object is returned.
-      """
-      session = self.db.get_session()
-      if session is None:
-          from ..exceptions import DatabaseError
-
-          raise DatabaseError("Database session is not available")
-      return session
-
-  def list_with_search(
-    self,
-    page: int = 1,
-    size: int = 10,
-    q: Optional[Any] = None,
-    filters: Optional[Dict[str, Any]] = None,
-  ) -> Tuple[List[Any], int]:
-    """List rows from the repository table with optional search/filter.
-
-    The method supports three modes:
-    - `filters` provided: builds a WHERE clause from key/value pairs.
-    - `q` provided and is a UUID: searches by `{prefix}_id`.
-    - `q` provided and not a UUID: searches by `{prefix}_name` (uses
-      `ALLOW FILTERING`).
-
-    Pagination is applied in-memory using `page` and `size`.
-
-    Args:
-        page: 1-based page number.
-        size: number of items per page.
-        q: optional query value (UUID or string) used for simple
-            search by id or name depending on its type.
-        filters: optional mapping of column -> value for exact
-                  filtering.
-
-    Returns:
-        A tuple `(items, total)` where `items` is the list of rows
-        for the requested page and `total` is the total number of
-        rows matching the query.
+
+    name: str
+    params: Tuple
+    cql: str
+    single: bool
+    total: Tuple
+    profile: str = PROFILE_READ
+
+
+class ReadResult:
+    """First page of a read, shared by the callers coalesced on it.
+
+    A driver `ResultSet` is consumed by iteration (which also fetches
+    the following pages), so it cannot be handed to several callers.
+    The rows of its first page and the paging state are copied instead;
+    iterating a `ReadResult` yields `current_rows` and never fetches
+    another page, use `paging_state` (see `_fetch_page`) for that.
     """
 
-    if not self.table:
-        raise ValueError("`table` must be provided either as argument or class attribute")
-
-    session = self._get_session()
-
-    if filters:
-        clauses = []
-        params = []
-        for k, v in filters.items():
-            clauses.append(f"{k} = %s")
-            params.append(v)
-        where = " AND ".join(clauses)
-        query = SimpleStatement(f"SELECT {self.select_cols} FROM {self.table} WHERE {where}")
-        rows = session.execute(query, tuple(params))
-        items = list(rows)
-        total = len(items)
-        start = (page - 1) * size
-        return items[start:start + size], total
-
-    if q is not None:
-        q_val = None
-        is_uuid = False
-        if isinstance(q, uuid.UUID):
-            is_uuid = True
-            q_val = q
+    __slots__ = ("current_rows", "paging_state")
+
+    def __init__(self, current_rows: List[Any], paging_state: Optional[bytes] = None) -> None:
+        self.current_rows = current_rows
+        self.paging_state = paging_state
+
+    @classmethod
+    def of(cls, result) -> "ReadResult":
+        """Snapshot the first page of the driver result `result`."""
+        return cls(list(result.current_rows), result.paging_state)
+
+    def one(self) -> Optional[Any]:
+        """Return the first row, or `None` when there is none."""
+        return self.current_rows[0] if self.current_rows else None
+
+    def __iter__(self):
+        return iter(self.current_rows)
+
+
+def read_pool(db) -> ThreadPoolExecutor:
+    """Build the threads sending the point reads of `BaseRepository._read_many` for `db` (see `app_scoped`).
+
+    `LOOKUP_CONCURRENCY` threads are shared by every multi-get of the
+    process; they are started on first use and then reused.
+    """
+    return ThreadPoolExecutor(max_workers=max(1, app_settings.lookup_concurrency), thread_name_prefix="read-many")
+
+
+def encode_cursor(paging_state: Optional[bytes]) -> Optional[str]:
+    """Encode a driver paging state into an URL-safe opaque cursor."""
+    if not paging_state:
+        return None
+    return base64.urlsafe_b64encode(paging_state).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> bytes:
+    """Decode a cursor produced by `encode_cursor`, raising `InvalidCursorError`."""
+    try:
+        state = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    except (binascii.Error, ValueError):
+        raise InvalidCursorError("Invalid cursor")
+    if not state:
+        raise InvalidCursorError("Invalid cursor")
+    return state
+
+
+def as_asyncio_future(response_future) -> "asyncio.Future":
+    """Bridge a driver `ResponseFuture` to an asyncio future.
+
+    The driver completes requests on its own event loop thread; the
+    callbacks hand the outcome over to the running asyncio loop with
+    `call_soon_threadsafe`. The future resolves to a `ResultSet` whose
+    `current_rows`/`paging_state` describe the first page.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def _set_result(result):
+        if not future.done():
+            future.set_result(result)
+
+    def _set_exception(exc):
+        if not future.done():
+            future.set_exception(exc)
+
+    def on_success(rows):
+        loop.call_soon_threadsafe(_set_result, ResultSet(response_future, rows))
+
+    def on_error(exc):
+        loop.call_soon_threadsafe(_set_exception, exc)
+
+    response_future.add_callbacks(on_success, on_error)
+    return future
+
+
+class BaseRepository:
+    """Common repository base for simple Cassandra queries.
+
+    Attributes:
+    - `table` (str): target Cassandra table name; must be provided by
+        subclasses.
+    - `select_cols` (str): columns to select in queries (defaults to
+        "*").
+    - `prefix` (str): prefix used for id/name column naming in queries
+        (e.g. `student` -> `student_id`, `student_name`).
+    - `statements` (dict): named CQL statements used by the repository,
+        registered with the database `StatementRegistry` and prepared
+        once.
+    - `counted_filters` (tuple): filter columns for which per-value row
+        counts are maintained in `row_counts` next to the table count.
+    - `version_cols` (tuple): non-key columns whose latest `WRITETIME`
+        is the version of an entity; single-entity reads select them as
+        `<column>_written`.
+
+    The repository expects a `db` object with a `get_session()` method
+    returning a live Cassandra session and a `statements` registry.
+    Repositories reading single entities by id go through `cache`, the
+    table's read-through `TinyLFUCache`. Every write also bumps the
+    table counter of `table_versions` (see `table_version`).
+    """
+
+    table: str = ""
+    select_cols: str = "*"
+    prefix: str = ""
+    statements: Dict[str, str] = {}
+    counted_filters: Tuple[str, ...] = ()
+    version_cols: Tuple[str, ...] = ()
+    count_statements: Dict[str, str] = {
+        "row_counts.get": "SELECT row_count FROM row_counts WHERE table_name = ? AND scope = ?",
+        "row_counts.scopes": "SELECT scope, row_count FROM row_counts WHERE table_name = ?",
+        "row_counts.add": "UPDATE row_counts SET row_count = row_count + ? WHERE table_name = ? AND scope = ?",
+        "table_versions.get": "SELECT version FROM table_versions WHERE table_name = ?",
+        "table_versions.bump": "UPDATE table_versions SET version = version + 1 WHERE table_name = ?",
+        "size_estimates.get": "SELECT partitions_count FROM system.size_estimates WHERE keyspace_name = ? AND table_name = ?",
+    }
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        _time_methods(cls)
+
+    def __init__(self, db):
+        """Initialize repository with a database connection object.
+
+        Args:
+            db: Database connection wrapper exposing `get_session()`.
+        """
+        self.db = db
+        self._cache: Optional[TinyLFUCache] = None
+
+    @property
+    def cache(self) -> TinyLFUCache:
+        """Entity cache of `table`, shared by every repository of `db` for that table."""
+        if self._cache is None:
+            self._cache = app_scoped(self.db, EntityCaches).for_table(self.table)
+        return self._cache
+
+    def _get_session(self):
+        """Return an active Cassandra session or raise `DatabaseError`.
+
+        This helper centralizes the check for session availability so
+        callers can assume a valid session object is returned.
+        """
+        session = self.db.get_session()
+        if session is None:
+            from ..exceptions import DatabaseError
+
+            raise DatabaseError("Database session is not available")
+        return session
+
+    def _prepared(self, name: str, cql: Optional[str] = None):
+        """Return the prepared statement registered as `name`.
+
+        `cql` defaults to the entry of the class `statements` (or
+        `count_statements`) catalog; it may be passed explicitly for
+        statements built at runtime or omitted for statements already
+        registered.
+        """
+        if cql is None:
+            cql = self.statements.get(name) or self.count_statements.get(name)
+        return self.db.statements.get(name, cql)
+
+    def _bind(self, name: str, params: Tuple = (), cql: Optional[str] = None, fetch_size: Optional[int] = None):
+        """Bind `params` to the prepared statement `name`.
+
+        `fetch_size` sets the driver page size of the bound statement.
+        """
+        statement = self._prepared(name, cql).bind(params)
+        if fetch_size is not None:
+            statement.fetch_size = fetch_size
+        return statement
+
+    def _profile(self, name: str, profile: Optional[str] = None) -> str:
+        """Return `profile`, or the default profile of statement `name`."""
+        if profile is not None:
+            return profile
+        return PROFILE_READ if self.db.statements.is_read(name) else PROFILE_WRITE
+
+    @property
+    def flights(self) -> SingleFlight:
+        """Read coalescing shared by every repository of `db`."""
+        return app_scoped(self.db, read_flights)
+
+    @property
+    def query_log(self) -> QueryLog:
+        """Slow-query log and sampled tracing shared by every repository of `db`."""
+        return app_scoped(self.db, query_log)
+
+    def _send(self, session, name: str, statement, params: Tuple, profile: str, **kwargs):
+        """Execute `statement` and report it to `query_log`; `name` labels it in the log."""
+        log = self.query_log
+        traced = log.should_trace()
+        if traced:
+            kwargs["trace"] = True
+        start = time.perf_counter()
+        try:
+            result = session.execute(statement, execution_profile=profile, **kwargs)
+        except Exception as e:
+            log.record(name, statement, params, time.perf_counter() - start, error=e)
+            raise
+        log.record(name, statement, params, time.perf_counter() - start, getattr(result, "response_future", None), len(result.current_rows), traced=traced)
+        return result
+
+    def _send_concurrent(self, session, statements: List[Tuple[str, Any, Tuple]], concurrency: int, profile: str) -> List[Tuple[bool, Any]]:
+        """Execute `(name, statement, params)` items with at most `concurrency` in flight.
+
+        Like the driver's `execute_concurrent` without
+        `raise_on_first_error`, returns `(True, rows)` or
+        `(False, exception)` per statement, in order. Every statement is
+        reported to `query_log` and may be traced, as with `_send`.
+        """
+        log = self.query_log
+        concurrency = max(1, concurrency)
+        slots = threading.Semaphore(concurrency)
+        results: List[Tuple[bool, Any]] = [(False, None)] * len(statements)
+
+        def send(index: int, name: str, statement, params: Tuple) -> None:
+            traced = log.should_trace()
+            start = time.perf_counter()
+
+            def on_success(rows):
+                try:
+                    results[index] = (True, rows)
+                    log.record(name, statement, params, time.perf_counter() - start, response_future, len(rows or ()), traced=traced)
+                finally:
+                    slots.release()
+
+            def on_error(exc):
+                try:
+                    results[index] = (False, exc)
+                    log.record(name, statement, params, time.perf_counter() - start, response_future, error=exc)
+                finally:
+                    slots.release()
+
+            try:
+                response_future = session.execute_async(statement, trace=traced, execution_profile=profile)
+            except Exception as e:
+                response_future = None
+                on_error(e)
+                return
+            response_future.add_callbacks(on_success, on_error)
+
+        for index, (name, statement, params) in enumerate(statements):
+            slots.acquire()
+            send(index, name, statement, params)
+        # Every slot is free again once the last statement completed
+        for _ in range(concurrency):
+            slots.acquire()
+        return results
+
+    def _flight_key(self, name: str, params: Tuple, fetch_size: Optional[int], profile: str, kwargs: Dict[str, Any]) -> Optional[Tuple]:
+        """Return the coalescing key of a read, or `None` for writes and unhashable parameters."""
+        if not self.db.statements.is_read(name):
+            return None
+        key = (name, tuple(params), fetch_size, profile, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _execute(self, name: str, params: Tuple = (), cql: Optional[str] = None, fetch_size: Optional[int] = None, profile: Optional[str] = None, **kwargs):
+        """Execute the prepared statement `name` with positional `params`.
+
+        `profile` overrides the default execution profile of the
+        statement (see `_profile`). Remaining keyword arguments (e.g.
+        `paging_state`) are passed to `session.execute`. Reads return a
+        `ReadResult`, shared with the identical reads in flight; writes
+        first invalidate the reads in flight and return the driver
+        result (e.g. for `was_applied`).
+        """
+        session = self._get_session()
+        statement = self._bind(name, params, cql, fetch_size)
+        profile = self._profile(name, profile)
+        key = self._flight_key(name, params, fetch_size, profile, kwargs)
+        if key is None:
+            self.flights.invalidate()
+            return self._send(session, name, statement, params, profile, **kwargs)
+        result = self.flights.do(key, lambda: ReadResult.of(self._send(session, name, statement, params, profile, **kwargs)))
+        count_rows(len(result.current_rows))
+        return result
+
+    def _batch(self, statements: List[Tuple[str, Tuple]]) -> BatchStatement:
+        """Build a logged batch of named prepared statements.
+
+        Used for writes that must land in several tables together (e.g.
+        a base table and its query tables).
+        """
+        batch = BatchStatement(batch_type=BatchType.LOGGED)
+        for name, params in statements:
+            batch.add(self._prepared(name), params)
+        return batch
+
+    def _execute_batch(self, statements: List[Tuple[str, Tuple]]):
+        """Execute `statements` atomically in one logged batch."""
+        session = self._get_session()
+        self.flights.invalidate()
+        return self._send(session, self._batch_name(statements), self._batch(statements), self._batch_params(statements), PROFILE_WRITE)
+
+    @staticmethod
+    def _batch_name(statements: List[Tuple[str, Tuple]]) -> str:
+        """Label of a batch in the query log, e.g. `batch(students.insert, row_counts.add)`."""
+        return f"batch({', '.join(name for name, _ in statements)})"
+
+    @staticmethod
+    def _batch_params(statements: List[Tuple[str, Tuple]]) -> Tuple:
+        return tuple(value for _, params in statements for value in params)
+
+    def _write_statement(self, statements: List[Tuple[str, Tuple]]) -> Tuple[str, Any, Tuple]:
+        """Return `statements` as one executable statement, with its query log name and parameters.
+
+        A single statement is bound directly; several go in a logged
+        batch as in `_execute_batch`.
+        """
+        if len(statements) == 1:
+            name, params = statements[0]
+            return name, self._bind(name, params), params
+        return self._batch_name(statements), self._batch(statements), self._batch_params(statements)
+
+    def _bulk_write(self, rows: List[Tuple[List[Tuple[str, Tuple]], Optional[Dict[str, Any]]]], concurrency: int) -> List[Optional[Exception]]:
+        """Write many rows with `_send_concurrent`.
+
+        Each row is given as its write statements and the filters it is
+        counted under. At most `concurrency` requests are in flight and
+        a failed row does not stop the others; every request goes to the
+        query log. The row counts of the rows written are then adjusted
+        in a single counter batch. Returns, per row, `None` on success
+        or the driver exception.
+        """
+        session = self._get_session()
+        statements = [self._write_statement(row_statements) for row_statements, _ in rows]
+        self.flights.invalidate()
+        results = self._send_concurrent(session, statements, concurrency, PROFILE_WRITE)
+        deltas: Dict[str, int] = {}
+        errors: List[Optional[Exception]] = []
+        for (_, filters), (success, result) in zip(rows, results):
+            if success:
+                for scope in self._count_scopes(filters):
+                    deltas[scope] = deltas.get(scope, 0) + 1
+                errors.append(None)
+            else:
+                errors.append(result)
+        if deltas:
+            self._send(session, COUNTS_BATCH, self._scopes_counts_batch(deltas), (), PROFILE_WRITE)
+        return errors
+
+    def _fetch_page(self, name: str, params: Tuple, size: int, paging_state: Optional[bytes] = None, cql: Optional[str] = None, profile: Optional[str] = None) -> Tuple[List[Any], Optional[bytes]]:
+        """Read at most `size` rows starting at `paging_state` under `profile`.
+
+        Only the rows of the requested page are pulled from Cassandra.
+        Filtered queries may return short pages, so the method keeps
+        requesting the missing number of rows until the page is full or
+        the result set is exhausted. Returns the rows and the paging
+        state to resume from (`None` when there are no more rows).
+        """
+        items: List[Any] = []
+        while True:
+            try:
+                result = self._execute(name, params, cql=cql, fetch_size=size - len(items), profile=profile, paging_state=paging_state)
+            except (InvalidRequest, ProtocolException):
+                if paging_state is None:
+                    raise
+                raise InvalidCursorError("Invalid cursor")
+            items.extend(result.current_rows)
+            paging_state = result.paging_state
+            if paging_state is None or len(items) >= size:
+                return items, paging_state
+
+    def _paginate(self, name: str, params: Tuple, page: int, size: int, cursor: Optional[str], cql: Optional[str] = None, profile: Optional[str] = None) -> Tuple[List[Any], Optional[str]]:
+        """Return the rows of one page and the cursor of the next one.
+
+        With a `cursor` the page is read directly from the encoded
+        paging state. Without one, the first `page - 1` pages are
+        skipped page by page so that memory use stays bounded by `size`.
+        """
+        if cursor:
+            items, state = self._fetch_page(name, params, size, decode_cursor(cursor), cql, profile)
+            return items, encode_cursor(state)
+        state = None
+        for _ in range(page - 1):
+            _, state = self._fetch_page(name, params, size, state, cql, profile)
+            if state is None:
+                return [], None
+        items, state = self._fetch_page(name, params, size, state, cql, profile)
+        return items, encode_cursor(state)
+
+    def _count(self, name: str, params: Tuple = (), cql: Optional[str] = None) -> int:
+        """Run a `SELECT COUNT(*)` statement (scan profile) and return its value."""
+        row = self._execute(name, params, cql=cql, profile=PROFILE_SCAN).one()
+        return row[0] if row else 0
+
+    def _count_scope(self, filters: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Return the `row_counts` scope maintained for `filters`, if any.
+
+        The whole table uses the empty scope; a single equality filter on
+        one of `counted_filters` uses `"<column>=<value>"`. Other filter
+        combinations are not counted and return `None`.
+        """
+        if not filters:
+            return ""
+        if len(filters) == 1:
+            (column, value), = filters.items()
+            if column in self.counted_filters:
+                return f"{column}={value}"
+        return None
+
+    def _stored_count(self, scope: str) -> int:
+        """Read the maintained row count for `scope` (a single-partition read)."""
+        row = self._execute("row_counts.get", (self.table, scope)).one()
+        return row.row_count if row and row.row_count else 0
+
+    def _count_scopes(self, filters: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Return the `row_counts` scopes a row with `filters` is counted in.
+
+        Values that are `None` are skipped since rows without the column
+        are not part of any filtered listing.
+        """
+        scopes = [""]
+        for column, value in (filters or {}).items():
+            if column in self.counted_filters and value is not None:
+                scopes.append(f"{column}={value}")
+        return scopes
+
+    def _scopes_counts_batch(self, deltas: Dict[str, int]) -> BatchStatement:
+        """Build the counter batch adding each delta of `deltas` to its scope.
+
+        The batch also bumps the table version, so every write recorded
+        through it invalidates the ETags of list pages.
+        """
+        statement = self._prepared("row_counts.add")
+        batch = BatchStatement(batch_type=BatchType.COUNTER)
+        for scope, delta in deltas.items():
+            if delta:
+                batch.add(statement, (delta, self.table, scope))
+        batch.add(self._prepared("table_versions.bump"), (self.table,))
+        return batch
+
+    def _counts_batch(self, delta: int, filters: Optional[Dict[str, Any]] = None) -> BatchStatement:
+        """Build the counter batch adding `delta` to the table and `filters` scopes."""
+        return self._scopes_counts_batch({scope: delta for scope in self._count_scopes(filters)})
+
+    def _move_deltas(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> Dict[str, int]:
+        """Return the count deltas of a row moving from the `before` to the `after` filters."""
+        deltas: Dict[str, int] = {}
+        for scope in self._count_scopes(before):
+            deltas[scope] = deltas.get(scope, 0) - 1
+        for scope in self._count_scopes(after):
+            deltas[scope] = deltas.get(scope, 0) + 1
+        return deltas
+
+    def _record_write(self, deltas: Optional[Dict[str, int]] = None) -> None:
+        """Apply the row count `deltas` and bump the table version in one counter batch."""
+        self._send(self._get_session(), COUNTS_BATCH, self._scopes_counts_batch(deltas or {}), (), PROFILE_WRITE)
+
+    def _adjust_counts(self, delta: int, filters: Optional[Dict[str, Any]] = None) -> None:
+        """Add `delta` to the table count and to the counted `filters` scopes.
+
+        All counters are updated in a single counter batch, which also
+        bumps the table version.
+        """
+        self._send(self._get_session(), COUNTS_BATCH, self._counts_batch(delta, filters), (), PROFILE_WRITE)
+
+    def recount_rows(self, page_size: Optional[int] = None) -> Dict[str, int]:
+        """Recount the rows of `table` per scope and correct `row_counts`.
+
+        Counters cannot be set, so the table is scanned page by page
+        (`page_size` rows, `CASSANDRA_SCAN_FETCH_SIZE` by default), the
+        stored counts are read and the differences are added in one
+        counter batch. This fills the counters of rows written before
+        they were maintained and repairs the drift left by retried or
+        timed out counter batches. Writes running during the scan may
+        be miscounted; re-run the recount when writes are quiet. Returns
+        the corrections applied by scope.
+        """
+        actual: Dict[str, int] = {"": 0}
+        size = page_size or cluster_settings.scan_fetch_size
+        name = f"{self.table}.all"
+        cql = self._search_statements()[name]
+        state = None
+        while True:
+            rows, state = self._fetch_page(name, (), size, state, cql, PROFILE_SCAN)
+            self._tally_scopes(rows, actual)
+            if state is None:
+                break
+        stored: Dict[str, int] = {}
+        while True:
+            rows, state = self._fetch_page("row_counts.scopes", (self.table,), size, state, profile=PROFILE_SCAN)
+            stored.update((row.scope, row.row_count or 0) for row in rows)
+            if state is None:
+                break
+        deltas = self._count_corrections(actual, stored)
+        if deltas:
+            self._record_write(deltas)
+        return deltas
+
+    def _tally_scopes(self, rows: Iterable[Any], actual: Dict[str, int]) -> None:
+        """Add the scanned `rows` to the per-scope row counts in `actual`."""
+        for row in rows:
+            for scope in self._count_scopes({column: getattr(row, column) for column in self.counted_filters}):
+                actual[scope] = actual.get(scope, 0) + 1
+
+    @staticmethod
+    def _count_corrections(actual: Dict[str, int], stored: Dict[str, int]) -> Dict[str, int]:
+        """Return the non-zero deltas turning the `stored` counts into the `actual` ones."""
+        deltas = {scope: actual.get(scope, 0) - stored.get(scope, 0) for scope in actual.keys() | stored.keys()}
+        return {scope: delta for scope, delta in deltas.items() if delta}
+
+    def table_version(self) -> int:
+        """Return the number of writes recorded on `table` (a single-partition read).
+
+        The counter only grows, so it identifies the state of every
+        listing of the table: list endpoints use it as their ETag and
+        answer a matching `If-None-Match` without running the listing.
+        The bump follows the write in a separate counter batch; a bump
+        lost to a failure leaves list ETags stale until the next write.
+        """
+        row = self._execute("table_versions.get", (self.table,)).one()
+        return row.version if row and row.version else 0
+
+    def _row_version(self, row) -> Optional[int]:
+        """Return the latest `WRITETIME` of `version_cols` in `row`, in microseconds.
+
+        Columns holding null have no write time and are ignored.
+        """
+        written = [getattr(row, f"{column}_written", None) for column in self.version_cols]
+        written = [value for value in written if value is not None]
+        return max(written) if written else None
+
+    def _cached_many(self, ids: List[str]) -> Tuple[Dict[str, Any], List[str]]:
+        """Split `ids` into entities found in the entity cache and ids to read.
+
+        Duplicate ids are read once; the returned dict and list keep the
+        order of first appearance.
+        """
+        found: Dict[str, Any] = {}
+        misses: List[str] = []
+        for key in dict.fromkeys(ids):
+            cached = self.cache.get(key)
+            if cached is NOT_CACHED:
+                misses.append(key)
+            else:
+                found[key] = cached
+        return found, misses
+
+    def _store_many(self, ids: List[str], found: Dict[str, Any], misses: List[str], rows: List[Any], to_entity: Callable[[Any], Any], generation: int) -> Dict[str, Any]:
+        """Cache the entities read for `misses` and return every entity in `ids` order.
+
+        `generation` is the cache generation taken before the reads (see
+        `TinyLFUCache.set`).
+        """
+        for key, row in zip(misses, rows):
+            entity = to_entity(row) if row else None
+            self.cache.set(key, entity, generation)
+            found[key] = entity
+        return {key: found[key] for key in dict.fromkeys(ids)}
+
+    def _read_many(self, name: str, ids: List[str], to_entity: Callable[[Any], Any]) -> Dict[str, Any]:
+        """Read entities by id with concurrent single-partition reads.
+
+        `name` is a point read taking the id as its only parameter. Ids
+        found in the entity cache are not read; the others go through
+        `_execute` (coalescing, query log, row counts) on the app-scoped
+        `read_pool`, so at most `LOOKUP_CONCURRENCY` reads per process
+        are in flight and the call costs a few round trips instead of
+        one per id. Results (including unknown ids, as
+        negative entries) are cached like `get_*` reads. Returns
+        `{id: entity or None}` in the order of `ids`, without duplicates.
+        """
+        generation = self.cache.generation
+        found, misses = self._cached_many(ids)
+        rows: List[Any] = []
+        if len(misses) == 1:
+            rows = [self._execute(name, (misses[0],)).one()]
+        elif misses:
+            pool = app_scoped(self.db, read_pool)
+            # Each read runs in a copy of the caller's context, so its
+            # rows are counted under the calling repository method
+            futures = [pool.submit(contextvars.copy_context().run, self._execute, name, (key,)) for key in misses]
+            rows = [future.result().one() for future in futures]
+        return self._store_many(ids, found, misses, rows, to_entity, generation)
+
+    @staticmethod
+    def _check_version(current: Any, if_match: Optional[Collection[int]]) -> None:
+        """Raise `PreconditionFailedError` unless `current.version` is in `if_match`.
+
+        `None` accepts any version. `current` must be read at the write
+        consistency (`PROFILE_WRITE`), so that a version just written is
+        seen; the write itself is then made conditional by
+        `_write_if_unchanged`.
+        """
+        if if_match is not None and current.version not in if_match:
+            raise PreconditionFailedError("Entity was modified since it was read")
+
+    def _condition(self, statements: List[Tuple[str, Tuple]], current: Any) -> Tuple[str, Tuple]:
+        """Return the first of `statements` as its lightweight transaction.
+
+        `<name>_if` is the statement `name` followed by `IF` conditions
+        on `version_cols`, bound to their values in `current`.
+        """
+        name, params = statements[0]
+        return f"{name}_if", tuple(params) + tuple(getattr(current, column) for column in self.version_cols)
+
+    def _write_if_unchanged(self, statements: List[Tuple[str, Tuple]], current: Any, if_match: Optional[Collection[int]]) -> None:
+        """Write `statements`, conditionally on `current` when `if_match` is given.
+
+        Without `if_match`, a single statement is executed and several
+        go in one logged batch. With it, `current.version` must be
+        listed (see `_check_version`), and the first statement (on the
+        base table) is sent as a lightweight transaction that applies
+        only if the columns still hold the values of `current`, so two
+        writers holding the same version cannot both succeed; it raises
+        `PreconditionFailedError` otherwise. A conditional batch cannot
+        span partitions, so the remaining statements (query tables)
+        follow in a batch of their own once the condition held.
+        """
+        if if_match is None:
+            self._write_all(statements)
+            return
+        self._check_version(current, if_match)
+        if not self._execute(*self._condition(statements, current)).was_applied:
+            raise PreconditionFailedError("Entity was modified since it was read")
+        if len(statements) > 1:
+            self._write_all(statements[1:])
+
+    def _write_all(self, statements: List[Tuple[str, Tuple]]) -> None:
+        if len(statements) == 1:
+            self._execute(*statements[0])
         else:
+            self._execute_batch(statements)
+
+    def _estimated_count(self) -> int:
+        """Estimate the table row count from `system.size_estimates`.
+
+        The table only describes the primary token ranges of the node
+        that answers the query, so the sum is scaled by the number of
+        nodes in the cluster. Cheap, but only approximate.
+        """
+        rows = self._execute("size_estimates.get", (self.db.keyspace, self.table))
+        return self._scale_estimate(sum(row.partitions_count for row in rows))
+
+    def _scale_estimate(self, local: int) -> int:
+        return local * max(1, len(self.db.cluster.metadata.all_hosts()))
+
+    def _search_statements(self) -> Dict[str, str]:
+        """Return the statements used by `list_with_search` for this table."""
+        if not self.prefix:
+            return {}
+        return {
+            f"{self.table}.all": f"SELECT {self.select_cols} FROM {self.table}",
+            f"{self.table}.by_id": f"SELECT {self.select_cols} FROM {self.table} WHERE {self.prefix}_id = ?",
+            f"{self.table}.by_name": f"SELECT {self.select_cols} FROM {self.table} WHERE {self.prefix}_name = ? ALLOW FILTERING",
+            f"{self.table}.count_by_name": f"SELECT COUNT(*) FROM {self.table} WHERE {self.prefix}_name = ? ALLOW FILTERING",
+            **self._like_statements(),
+        }
+
+    def _like_statements(self) -> Dict[str, str]:
+        """Return the SAI `LIKE` name statements, empty when `LIKE` is unsupported.
+
+        They are only part of the catalog when `db.name_search` reports
+        `LIKE` support, since Cassandra refuses to prepare them otherwise.
+        """
+        if getattr(self.db, "name_search", None) != NAME_SEARCH_LIKE:
+            return {}
+        return {
+            f"{self.table}.by_name_like": f"SELECT {self.select_cols} FROM {self.table} WHERE {self.prefix}_name LIKE ?",
+            f"{self.table}.count_by_name_like": f"SELECT COUNT(*) FROM {self.table} WHERE {self.prefix}_name LIKE ?",
+        }
+
+    def _name_pattern(self, q: Any, match: str) -> Optional[str]:
+        """Return the `LIKE` pattern for a prefix/contains search on `q`.
+
+        Returns `None` when the search is an exact match, either because
+        `match` is `"exact"` or because the server cannot answer `LIKE`
+        (no SAI support): such searches explicitly fall back to the
+        exact `ALLOW FILTERING` lookup.
+        """
+        if match not in NAME_MATCHES:
+            raise ValueError(f"`match` must be one of {', '.join(NAME_MATCHES)}")
+        term = str(q).strip("%")
+        if match == "exact" or not term or not self._like_statements():
+            return None
+        return f"{term}%" if match == "prefix" else f"%{term}%"
+
+    def register_statements(self) -> None:
+        """Register the repository catalog so it can be prepared eagerly."""
+        for name, cql in {**self.statements, **self._search_statements(), **self.count_statements}.items():
+            self.db.statements.register(name, cql)
+
+    @staticmethod
+    def _as_uuid(q: Any) -> Optional[uuid.UUID]:
+        """Return `q` as a UUID when it is one (or parses as one), else None."""
+        if isinstance(q, uuid.UUID):
+            return q
+        try:
+            return uuid.UUID(str(q))
+        except (ValueError, AttributeError, TypeError):
+            return None
+
+    def _plan_search(self, q: Optional[Any], filters: Optional[Dict[str, Any]], estimate_total: bool, match: str = "exact") -> SearchPlan:
+        """Pick the statements answering a `list_with_search` call.
+
+        The plan is shared by the sync and async implementations so both
+        run exactly the same queries.
+        """
+        if not self.table:
+            raise ValueError("`table` must be provided either as argument or class attribute")
+
+        search = self._search_statements()
+
+        if filters:
+            columns = sorted(filters)
+            params = tuple(filters[k] for k in columns)
+            where = " AND ".join(f"{k} = ?" for k in columns)
+            name = f"{self.table}.filter.{'.'.join(columns)}"
+            cql = f"SELECT {self.select_cols} FROM {self.table} WHERE {where}"
+            scope = self._count_scope(filters)
+            if scope is not None:
+                return SearchPlan(name, params, cql, False, ("stored", scope), PROFILE_SCAN)
+            return SearchPlan(name, params, cql, False, ("count", f"{name}.count", params, f"SELECT COUNT(*) FROM {self.table} WHERE {where}"), PROFILE_SCAN)
+
+        if q is not None:
+            q_val = self._as_uuid(q)
+            if q_val is not None:
+                name = f"{self.table}.by_id"
+                return SearchPlan(name, (str(q_val),), search[name], True, ("rows",))
+            pattern = self._name_pattern(q, match)
+            if pattern is not None:
+                name, count_name = f"{self.table}.by_name_like", f"{self.table}.count_by_name_like"
+                return SearchPlan(name, (pattern,), search[name], False, ("count", count_name, (pattern,), search[count_name]), PROFILE_SCAN)
+            name, count_name = f"{self.table}.by_name", f"{self.table}.count_by_name"
+            return SearchPlan(name, (q,), search[name], False, ("count", count_name, (q,), search[count_name]), PROFILE_SCAN)
+
+        name = f"{self.table}.all"
+        if estimate_total:
+            return SearchPlan(name, (), search[name], False, ("estimate",), PROFILE_SCAN)
+        return SearchPlan(name, (), search[name], False, ("stored", ""), PROFILE_SCAN)
+
+    def _plan_total(self, plan: SearchPlan) -> int:
+        kind = plan.total[0]
+        if kind == "stored":
+            return self._stored_count(plan.total[1])
+        if kind == "count":
+            return self._count(plan.total[1], plan.total[2], plan.total[3])
+        return self._estimated_count()
+
+    def list_with_search(
+        self,
+        page: int = 1,
+        size: int = 10,
+        q: Optional[Any] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        cursor: Optional[str] = None,
+        estimate_total: bool = False,
+        match: str = "exact",
+    ) -> PageResult:
+        """List rows from the repository table with optional search/filter.
+
+        The method supports three modes:
+        - `filters` provided: builds a WHERE clause from key/value pairs.
+        - `q` provided and is a UUID: searches by `{prefix}_id`.
+        - `q` provided and not a UUID: searches by `{prefix}_name`. With
+          `match="exact"` this is an equality lookup (uses
+          `ALLOW FILTERING`); `"prefix"` and `"contains"` use an SAI
+          `LIKE` query when `db.name_search` supports it and fall back
+          to the exact lookup otherwise.
+
+        Pagination uses the driver paging state: each call reads a
+        single page of `size` rows from Cassandra. Passing the
+        `next_cursor` of a previous result as `cursor` resumes right
+        after that page; `page` is only used when no cursor is given.
+
+        `total` is read from the counters maintained in `row_counts` for
+        the whole table and for `counted_filters`; other searches fall
+        back to a server-side `COUNT(*)`. With `estimate_total` an
+        unfiltered listing uses `system.size_estimates` instead and
+        reports `total_exact=False`.
+
+        Args:
+            page: 1-based page number, ignored when `cursor` is set.
+            size: number of items per page.
+            q: optional query value (UUID or string) used for simple
+                search by id or name depending on its type.
+            filters: optional mapping of column -> value for exact
+                filtering.
+            cursor: optional opaque cursor returned by a previous call.
+            estimate_total: approximate `total` for unfiltered listings.
+            match: how a non-UUID `q` matches names: `"exact"`,
+                `"prefix"` or `"contains"`.
+
+        Returns:
+            A `PageResult` with the rows of the requested page, the
+            total number of rows matching the query and the cursor of
+            the next page.
+        """
+        plan = self._plan_search(q, filters, estimate_total, match)
+        if plan.single:
+            items = list(self._execute(plan.name, plan.params, plan.cql, profile=plan.profile))
+            return PageResult(items if page == 1 and not cursor else [], len(items), None)
+        items, next_cursor = self._paginate(plan.name, plan.params, page, size, cursor, plan.cql, plan.profile)
+        return PageResult(items, self._plan_total(plan), next_cursor, total_exact=plan.total[0] != "estimate")
+
+
+def _time_methods(cls: type) -> None:
+    """Wrap the public methods defined by `cls` with `app.metrics.timed`."""
+    for name, attr in list(vars(cls).items()):
+        if not name.startswith("_") and name not in UNTIMED_METHODS and inspect.isfunction(attr):
+            setattr(cls, name, timed(attr))
+
+
+_time_methods(BaseRepository)
+
+
+class AsyncBaseRepository(BaseRepository):
+    """Asyncio variant of `BaseRepository`.
+
+    Statements, search plans and row counting rules are inherited; only
+    the I/O goes through `session.execute_async` and is awaited, so a
+    request waiting on Cassandra does not hold a threadpool thread.
+    Concrete async repositories inherit from this class first and from
+    the matching sync repository second to reuse its table definition.
+    """
+
+    async def _send_async(self, session, name: str, statement, params: Tuple, profile: str, **kwargs):
+        """Asynchronously execute `statement` and report it to `query_log`."""
+        log = self.query_log
+        traced = log.should_trace()
+        if traced:
+            kwargs["trace"] = True
+        start = time.perf_counter()
+        response_future = session.execute_async(statement, execution_profile=profile, **kwargs)
+        try:
+            result = await as_asyncio_future(response_future)
+        except Exception as e:
+            log.record(name, statement, params, time.perf_counter() - start, response_future, error=e)
+            raise
+        log.record(name, statement, params, time.perf_counter() - start, response_future, len(result.current_rows), traced=traced)
+        return result
+
+    async def _read_result_async(self, session, name: str, statement, params: Tuple, profile: str, **kwargs) -> ReadResult:
+        return ReadResult.of(await self._send_async(session, name, statement, params, profile, **kwargs))
+
+    async def _execute_async(self, name: str, params: Tuple = (), cql: Optional[str] = None, fetch_size: Optional[int] = None, profile: Optional[str] = None, **kwargs):
+        """Asynchronously execute the prepared statement `name`, coalescing identical reads (see `BaseRepository._execute`)."""
+        session = self._get_session()
+        statement = self._bind(name, params, cql, fetch_size)
+        profile = self._profile(name, profile)
+        key = self._flight_key(name, params, fetch_size, profile, kwargs)
+        if key is None:
+            self.flights.invalidate()
+            return await self._send_async(session, name, statement, params, profile, **kwargs)
+        result = await self.flights.do_async(key, lambda: self._read_result_async(session, name, statement, params, profile, **kwargs))
+        count_rows(len(result.current_rows))
+        return result
+
+    async def _read_many(self, name: str, ids: List[str], to_entity: Callable[[Any], Any]) -> Dict[str, Any]:
+        """Read entities by id with concurrent point reads (see `BaseRepository._read_many`).
+
+        At most `LOOKUP_CONCURRENCY` reads are in flight at once.
+        """
+        generation = self.cache.generation
+        found, misses = self._cached_many(ids)
+        limit = asyncio.Semaphore(max(1, app_settings.lookup_concurrency))
+
+        async def read(key: str) -> Any:
+            async with limit:
+                return (await self._execute_async(name, (key,))).one()
+
+        rows = await asyncio.gather(*(read(key) for key in misses))
+        return self._store_many(ids, found, misses, list(rows), to_entity, generation)
+
+    async def _execute_batch(self, statements: List[Tuple[str, Tuple]]):
+        """Asynchronously execute `statements` in one logged batch."""
+        session = self._get_session()
+        self.flights.invalidate()
+        return await self._send_async(session, self._batch_name(statements), self._batch(statements), self._batch_params(statements), PROFILE_WRITE)
+
+    async def _fetch_page(self, name: str, params: Tuple, size: int, paging_state: Optional[bytes] = None, cql: Optional[str] = None, profile: Optional[str] = None) -> Tuple[List[Any], Optional[bytes]]:
+        items: List[Any] = []
+        while True:
             try:
-                q_val = uuid.UUID(str(q))
-                is_uuid = True
-            except (ValueError, AttributeError, TypeError):
-                is_uuid = False
-
-        if is_uuid:
-            query = SimpleStatement(f"SELECT {self.select_cols} FROM {self.table} WHERE {self.prefix}_id = %s")
-            rows = session.execute(query, (str(q_val),))
-            items = list(rows)
-            total = len(items)
-            start = (page - 1) * size
-            return items[start:start + size], total
-
-        query = SimpleStatement(f"SELECT {self.select_cols} FROM {self.table} WHERE {self.prefix}_name = %s ALLOW FILTERING")
-        rows = session.execute(query, (q,))
-        items = list(rows)
-        total = len(items)
-        start = (page - 1) * size
-        return items[start:start + size], total
-
-    query = SimpleStatement(f"SELECT {self.select_cols} FROM {self.table}")
-    rows = session.execute(query)
-    items = list(rows)
-    total = len(items)
-    start = (page - 1) * size
-    return items[start:start + size], total
+                result = await self._execute_async(name, params, cql=cql, fetch_size=size - len(items), profile=profile, paging_state=paging_state)
+            except (InvalidRequest, ProtocolException):
+                if paging_state is None:
+                    raise
+                raise InvalidCursorError("Invalid cursor")
+            items.extend(result.current_rows)
+            paging_state = result.paging_state
+            if paging_state is None or len(items) >= size:
+                return items, paging_state
+
+    async def _paginate(self, name: str, params: Tuple, page: int, size: int, cursor: Optional[str], cql: Optional[str] = None, profile: Optional[str] = None) -> Tuple[List[Any], Optional[str]]:
+        if cursor:
+            items, state = await self._fetch_page(name, params, size, decode_cursor(cursor), cql, profile)
+            return items, encode_cursor(state)
+        state = None
+        for _ in range(page - 1):
+            _, state = await self._fetch_page(name, params, size, state, cql, profile)
+            if state is None:
+                return [], None
+        items, state = await self._fetch_page(name, params, size, state, cql, profile)
+        return items, encode_cursor(state)
+
+    async def _count(self, name: str, params: Tuple = (), cql: Optional[str] = None) -> int:
+        row = (await self._execute_async(name, params, cql=cql, profile=PROFILE_SCAN)).one()
+        return row[0] if row else 0
+
+    async def _stored_count(self, scope: str) -> int:
+        row = (await self._execute_async("row_counts.get", (self.table, scope))).one()
+        return row.row_count if row and row.row_count else 0
+
+    async def _adjust_counts(self, delta: int, filters: Optional[Dict[str, Any]] = None) -> None:
+        await self._send_async(self._get_session(), COUNTS_BATCH, self._counts_batch(delta, filters), (), PROFILE_WRITE)
+
+    async def _record_write(self, deltas: Optional[Dict[str, int]] = None) -> None:
+        await self._send_async(self._get_session(), COUNTS_BATCH, self._scopes_counts_batch(deltas or {}), (), PROFILE_WRITE)
+
+    async def _write_if_unchanged(self, statements: List[Tuple[str, Tuple]], current: Any, if_match: Optional[Collection[int]]) -> None:
+        """Write `statements`, conditionally on `current` (see `BaseRepository._write_if_unchanged`)."""
+        if if_match is None:
+            await self._write_all(statements)
+            return
+        self._check_version(current, if_match)
+        if not (await self._execute_async(*self._condition(statements, current))).was_applied:
+            raise PreconditionFailedError("Entity was modified since it was read")
+        if len(statements) > 1:
+            await self._write_all(statements[1:])
+
+    async def _write_all(self, statements: List[Tuple[str, Tuple]]) -> None:
+        if len(statements) == 1:
+            await self._execute_async(*statements[0])
+        else:
+            await self._execute_batch(statements)
+
+    async def recount_rows(self, page_size: Optional[int] = None) -> Dict[str, int]:
+        """Recount the rows of `table` per scope and correct `row_counts` (see `BaseRepository.recount_rows`)."""
+        actual: Dict[str, int] = {"": 0}
+        size = page_size or cluster_settings.scan_fetch_size
+        name = f"{self.table}.all"
+        cql = self._search_statements()[name]
+        state = None
+        while True:
+            rows, state = await self._fetch_page(name, (), size, state, cql, PROFILE_SCAN)
+            self._tally_scopes(rows, actual)
+            if state is None:
+                break
+        stored: Dict[str, int] = {}
+        while True:
+            rows, state = await self._fetch_page("row_counts.scopes", (self.table,), size, state, profile=PROFILE_SCAN)
+            stored.update((row.scope, row.row_count or 0) for row in rows)
+            if state is None:
+                break
+        deltas = self._count_corrections(actual, stored)
+        if deltas:
+            await self._record_write(deltas)
+        return deltas
+
+    async def table_version(self) -> int:
+        row = (await self._execute_async("table_versions.get", (self.table,))).one()
+        return row.version if row and row.version else 0
+
+    async def _estimated_count(self) -> int:
+        result = await self._execute_async("size_estimates.get", (self.db.keyspace, self.table))
+        return self._scale_estimate(sum(row.partitions_count for row in result.current_rows))
+
+    async def _plan_total(self, plan: SearchPlan) -> int:
+        kind = plan.total[0]
+        if kind == "stored":
+            return await self._stored_count(plan.total[1])
+        if kind == "count":
+            return await self._count(plan.total[1], plan.total[2], plan.total[3])
+        return await self._estimated_count()
+
+    async def list_with_search(
+        self,
+        page: int = 1,
+        size: int = 10,
+        q: Optional[Any] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        cursor: Optional[str] = None,
+        estimate_total: bool = False,
+        match: str = "exact",
+    ) -> PageResult:
+        """Asynchronous `BaseRepository.list_with_search`.
+
+        The page and the total are read concurrently.
+        """
+        plan = self._plan_search(q, filters, estimate_total, match)
+        if plan.single:
+            result = await self._execute_async(plan.name, plan.params, plan.cql, profile=plan.profile)
+            items = list(result.current_rows)
+            return PageResult(items if page == 1 and not cursor else [], len(items), None)
+        (items, next_cursor), total = await asyncio.gather(
+            self._paginate(plan.name, plan.params, page, size, cursor, plan.cql, plan.profile),
+            self._plan_total(plan),
+        )
+        return PageResult(items, total, next_cursor, total_exact=plan.total[0] != "estimate")
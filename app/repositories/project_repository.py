@@ -1,79 +1,234 @@
 """Repository implementation for project CRUD operations using Cassandra."""
 
-from cassandra.query import SimpleStatement
+import asyncio
+from cassandra.query import UNSET_VALUE
 from ..entities.project import Project, ProjectCreate, ProjectUpdate
-from ..config.database import Database
 import uuid
-from typing import List, Optional, Tuple
-from .base import BaseRepository
+from typing import Collection, Dict, List, Optional, Tuple
+from ..cache import NOT_CACHED
+from ..config.cluster import PROFILE_WRITE
+from .base import AsyncBaseRepository, BaseRepository, PageResult
 
 class ProjectRepository(BaseRepository):
-    """Encapsulates Cassandra queries for the `projects` table."""
+    """Encapsulates Cassandra queries for the `projects` table.
 
-    def __init__(self, db: Database):
-        super().__init__(db)
-        self.table = "projects"
-        self.select_cols = "p_id, p_name, p_head"
-        self.prefix = "p"
+    `get_project` is served from the entity cache (including negative
+    entries for unknown ids); updates and deletes read the current row
+    from Cassandra at the write consistency and invalidate the cached
+    entry. Single-project reads carry the row `version` (latest
+    `WRITETIME`) that updates and deletes can be made conditional on;
+    conditional writes are lightweight transactions (see
+    `BaseRepository._write_if_unchanged`).
+    """
+
+    table = "projects"
+    select_cols = "p_id, p_name, p_head"
+    prefix = "p"
+    version_cols = ("p_name", "p_head")
+    statements = {
+        "projects.insert": "INSERT INTO projects (p_id, p_name, p_head) VALUES (?, ?, ?)",
+        "projects.update": "UPDATE projects SET p_name = ?, p_head = ? WHERE p_id = ?",
+        "projects.delete": "DELETE FROM projects WHERE p_id = ?",
+        "projects.update_if": "UPDATE projects SET p_name = ?, p_head = ? WHERE p_id = ? IF p_name = ? AND p_head = ?",
+        "projects.delete_if": "DELETE FROM projects WHERE p_id = ? IF p_name = ? AND p_head = ?",
+        "projects.get": "SELECT p_id, p_name, p_head, WRITETIME(p_name) AS p_name_written, WRITETIME(p_head) AS p_head_written FROM projects WHERE p_id = ?",
+    }
+
+    @staticmethod
+    def _to_project(row) -> Project:
+        """Map a `projects` row to a `Project` model, its only validation (see `StudentRepository._to_student`)."""
+        return Project.model_validate(row._asdict())
+
+    @staticmethod
+    def _update_params(p_id: str, project: ProjectUpdate) -> Optional[tuple]:
+        """Return the `projects.update` parameters, or None when nothing changes."""
+        values = (project.p_name, project.p_head)
+        if all(v is None for v in values):
+            return None
+        return tuple(UNSET_VALUE if v is None else v for v in values) + (p_id,)
+
+    @staticmethod
+    def _merge(current: Project, project: ProjectUpdate) -> Project:
+        """Return `current` with the fields set on `project` applied, version unknown."""
+        changes = {k: v for k, v in project.model_dump().items() if v is not None}
+        return current.model_copy(update={**changes, "version": None})
+
+    @staticmethod
+    def _insert(project: Project) -> Tuple[str, Tuple]:
+        return ("projects.insert", (project.p_id, project.p_name, project.p_head))
 
     def create_project(self, project: ProjectCreate) -> Project:
         """Insert a new project and return the created `Project` model."""
-        project_id = str(uuid.uuid4())
-        query = SimpleStatement("""
-        INSERT INTO projects (p_id, p_name, p_head)
-        VALUES (%s, %s, %s)
-        """)
-        self._get_session().execute(query, (project_id, project.p_name, project.p_head))
-        return Project(p_id=project_id, p_name=project.p_name, p_head=project.p_head)
-
-    def update_project(self, p_id: str, project: ProjectUpdate) -> Optional[Project]:
+        created = Project(p_id=str(uuid.uuid4()), p_name=project.p_name, p_head=project.p_head)
+        self._execute(*self._insert(created))
+        self._adjust_counts(1)
+        return created
+
+    def bulk_create_projects(self, projects: List[ProjectCreate], concurrency: int) -> List[Tuple[Optional[Project], Optional[Exception]]]:
+        """Insert many projects concurrently.
+
+        Writes go through `BaseRepository._bulk_write` with at most
+        `concurrency` in flight. Returns, per project, the created model
+        or the error that prevented its insertion.
+        """
+        created = [Project(p_id=str(uuid.uuid4()), p_name=p.p_name, p_head=p.p_head) for p in projects]
+        errors = self._bulk_write([([self._insert(p)], None) for p in created], concurrency)
+        return [(None, error) if error else (project, None) for project, error in zip(created, errors)]
+
+    def update_project(self, p_id: str, project: ProjectUpdate, if_match: Optional[Collection[int]] = None) -> Optional[Project]:
         """Apply partial updates to a project and return the updated model.
 
-        Returns `None` when the provided `project` contains no changes.
+        Returns `None` when the provided `project` contains no changes or
+        the project does not exist. The returned model is the current
+        row with the changes applied, so no read follows the write. With
+        `if_match`, raises `PreconditionFailedError` unless the current
+        version is listed and the project is unchanged when written.
         """
-        sets = []
-        params = []
-        if project.p_name is not None:
-            sets.append("p_name = %s")
-            params.append(project.p_name)
-        if project.p_head is not None:
-            sets.append("p_head = %s")
-            params.append(project.p_head)
-        if not sets:
+        params = self._update_params(p_id, project)
+        if params is None:
             return None
-        set_clause = ", ".join(sets)
-        query = SimpleStatement(f"UPDATE projects SET {set_clause} WHERE p_id = %s")
-        params.append(p_id)
-        self._get_session().execute(query, tuple(params))
-        return self.get_project(p_id)
-
-    def delete_project(self, p_id: str) -> bool:
-        """Delete the project with the given id. Returns True on success."""
-        query = SimpleStatement("DELETE FROM projects WHERE p_id = %s")
-        self._get_session().execute(query, (p_id,))
+        current = self._fetch_project(p_id, PROFILE_WRITE)
+        if current is None:
+            return None
+        self._write_if_unchanged([("projects.update", params)], current, if_match)
+        self.cache.invalidate(p_id)
+        self._record_write()
+        return self._merge(current, project)
+
+    def delete_project(self, p_id: str, if_match: Optional[Collection[int]] = None) -> bool:
+        """Delete the project with the given id.
+
+        Returns False when the project does not exist so that the row
+        count is only decremented for rows that were actually removed.
+        `if_match` makes the delete conditional as in `update_project`.
+        """
+        current = self._fetch_project(p_id, PROFILE_WRITE)
+        if current is None:
+            return False
+        self._write_if_unchanged([("projects.delete", (p_id,))], current, if_match)
+        self.cache.invalidate(p_id)
+        self._adjust_counts(-1)
         return True
 
+    def _versioned_project(self, row) -> Project:
+        """Map a `projects.get` row to a `Project` carrying its version."""
+        project = self._to_project(row)
+        project.version = self._row_version(row)
+        return project
+
+    def _fetch_project(self, p_id: str, profile: Optional[str] = None) -> Optional[Project]:
+        """Read a project and its version from Cassandra, bypassing the entity cache."""
+        row = self._execute("projects.get", (p_id,), profile=profile).one()
+        return self._versioned_project(row) if row else None
+
     def get_project(self, p_id: str) -> Optional[Project]:
-        """Fetch a single project by id and return a `Project` model or None."""
-        query = SimpleStatement("SELECT p_id, p_name, p_head FROM projects WHERE p_id = %s")
-        result = self._get_session().execute(query, (p_id,))
-        row = result.one()
-        if row:
-            return Project(p_id=row.p_id, p_name=row.p_name, p_head=row.p_head)
-        return None
+        """Fetch a single project by id and return a `Project` model or None.
+
+        Reads go through the entity cache; unknown ids are cached as
+        negative entries.
+        """
+        generation = self.cache.generation
+        cached = self.cache.get(p_id)
+        if cached is not NOT_CACHED:
+            return cached
+        project = self._fetch_project(p_id)
+        self.cache.set(p_id, project, generation)
+        return project
+
+    def get_projects(self, ids: List[str]) -> Dict[str, Optional[Project]]:
+        """Fetch many projects by id with concurrent point reads.
+
+        Cached ids are served from the entity cache and the others are
+        read concurrently (see `BaseRepository._read_many`). Returns
+        `{id: Project or None}` in the order of `ids`, without duplicates.
+        """
+        return self._read_many("projects.get", ids, self._versioned_project)
 
-    def list_projects(self, page: int = 1, size: int = 10, q: Optional[str] = None) -> Tuple[List[Project], int]:
-        """Return a paginated list of projects and the total count.
+    def list_projects(self, page: int = 1, size: int = 10, q: Optional[str] = None, cursor: Optional[str] = None, estimate_total: bool = False, match: str = "exact") -> PageResult:
+        """Return a page of projects with the total count and next cursor.
 
         Search by `q` is delegated to `BaseRepository.list_with_search`.
         """
-        rows, total = self.list_with_search(
+        result = self.list_with_search(
             page=page,
             size=size,
             q=q,
             filters=None,
+            cursor=cursor,
+            estimate_total=estimate_total,
+            match=match,
         )
 
-        projects = [Project(p_id=row.p_id, p_name=row.p_name, p_head=row.p_head) for row in rows]
+        projects = [self._to_project(row) for row in result.items]
+
+        return result._replace(items=projects)
+
+
+class AsyncProjectRepository(AsyncBaseRepository, ProjectRepository):
+    """Asyncio counterpart of `ProjectRepository` using `execute_async`."""
+
+    async def create_project(self, project: ProjectCreate) -> Project:
+        """Insert a new project and return the created `Project` model."""
+        created = Project(p_id=str(uuid.uuid4()), p_name=project.p_name, p_head=project.p_head)
+        await self._execute_async(*self._insert(created))
+        await self._adjust_counts(1)
+        return created
+
+    async def bulk_create_projects(self, projects: List[ProjectCreate], concurrency: int) -> List[Tuple[Optional[Project], Optional[Exception]]]:
+        """Insert many projects concurrently, from a worker thread."""
+        return await asyncio.to_thread(ProjectRepository.bulk_create_projects, self, projects, concurrency)
+
+    async def update_project(self, p_id: str, project: ProjectUpdate, if_match: Optional[Collection[int]] = None) -> Optional[Project]:
+        """Apply partial updates to a project and return the updated model."""
+        params = self._update_params(p_id, project)
+        if params is None:
+            return None
+        current = await self._fetch_project(p_id, PROFILE_WRITE)
+        if current is None:
+            return None
+        await self._write_if_unchanged([("projects.update", params)], current, if_match)
+        self.cache.invalidate(p_id)
+        await self._record_write()
+        return self._merge(current, project)
+
+    async def delete_project(self, p_id: str, if_match: Optional[Collection[int]] = None) -> bool:
+        """Delete the project with the given id, False when it does not exist."""
+        current = await self._fetch_project(p_id, PROFILE_WRITE)
+        if current is None:
+            return False
+        await self._write_if_unchanged([("projects.delete", (p_id,))], current, if_match)
+        self.cache.invalidate(p_id)
+        await self._adjust_counts(-1)
+        return True
+
+    async def _fetch_project(self, p_id: str, profile: Optional[str] = None) -> Optional[Project]:
+        """Read a project and its version from Cassandra, bypassing the entity cache."""
+        row = (await self._execute_async("projects.get", (p_id,), profile=profile)).one()
+        return self._versioned_project(row) if row else None
+
+    async def get_project(self, p_id: str) -> Optional[Project]:
+        """Fetch a single project by id, through the entity cache."""
+        generation = self.cache.generation
+        cached = self.cache.get(p_id)
+        if cached is not NOT_CACHED:
+            return cached
+        project = await self._fetch_project(p_id)
+        self.cache.set(p_id, project, generation)
+        return project
+
+    async def get_projects(self, ids: List[str]) -> Dict[str, Optional[Project]]:
+        """Fetch many projects by id with concurrent point reads, in the order of `ids`."""
+        return await self._read_many("projects.get", ids, self._versioned_project)
 
-        return projects, total
+    async def list_projects(self, page: int = 1, size: int = 10, q: Optional[str] = None, cursor: Optional[str] = None, estimate_total: bool = False, match: str = "exact") -> PageResult:
+        """Return a page of projects with the total count and next cursor."""
+        result = await self.list_with_search(
+            page=page,
+            size=size,
+            q=q,
+            filters=None,
+            cursor=cursor,
+            estimate_total=estimate_total,
+            match=match,
+        )
+        return result._replace(items=[self._to_project(row) for row in result.items])
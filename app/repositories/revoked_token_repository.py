@@ -0,0 +1,55 @@
+"""Repository for the `revoked_tokens` table."""
+
+from typing import List
+from ..config.cluster import PROFILE_SCAN, cluster_settings
+from .base import AsyncBaseRepository, BaseRepository
+
+
+class RevokedTokenRepository(BaseRepository):
+    """Stores revoked token keys until the tokens they cover expire.
+
+    Keys are `jti:<token id>` for a single token or `sub:<username>`
+    for every token of a user. Rows are written with a TTL equal to the
+    remaining token lifetime, so the table only ever holds keys that
+    still matter and can be read in full on every refresh, with the
+    scan execution profile.
+    """
+
+    table = "revoked_tokens"
+    select_cols = "key"
+    statements = {
+        "revoked_tokens.insert": "INSERT INTO revoked_tokens (key) VALUES (?) USING TTL ?",
+        "revoked_tokens.all": "SELECT key FROM revoked_tokens",
+    }
+
+    def revoke(self, key: str, ttl_seconds: int) -> None:
+        """Record `key` as revoked for `ttl_seconds`."""
+        self._execute("revoked_tokens.insert", (key, max(1, int(ttl_seconds))))
+
+    def all_keys(self) -> List[str]:
+        """Return every revoked key, reading the table page by page."""
+        keys: List[str] = []
+        state = None
+        while True:
+            rows, state = self._fetch_page("revoked_tokens.all", (), cluster_settings.scan_fetch_size, state, profile=PROFILE_SCAN)
+            keys.extend(row.key for row in rows)
+            if state is None:
+                return keys
+
+
+class AsyncRevokedTokenRepository(AsyncBaseRepository, RevokedTokenRepository):
+    """Asyncio counterpart of `RevokedTokenRepository`."""
+
+    async def revoke(self, key: str, ttl_seconds: int) -> None:
+        """Record `key` as revoked for `ttl_seconds`."""
+        await self._execute_async("revoked_tokens.insert", (key, max(1, int(ttl_seconds))))
+
+    async def all_keys(self) -> List[str]:
+        """Return every revoked key, reading the table page by page."""
+        keys: List[str] = []
+        state = None
+        while True:
+            rows, state = await self._fetch_page("revoked_tokens.all", (), cluster_settings.scan_fetch_size, state, profile=PROFILE_SCAN)
+            keys.extend(row.key for row in rows)
+            if state is None:
+                return keys
@@ -1,11 +1,13 @@
 """Repository implementation for student CRUD operations using Cassandra."""
 
-from cassandra.query import SimpleStatement
+import asyncio
+from cassandra.query import UNSET_VALUE
 from ..entities.student import Student, StudentCreate, StudentUpdate
-from ..config.database import Database
 import uuid
-from typing import List, Optional, Tuple
-from .base import BaseRepository
+from typing import Any, Collection, Dict, List, Optional, Tuple
+from ..cache import NOT_CACHED
+from ..config.cluster import PROFILE_SCAN, PROFILE_WRITE, cluster_settings
+from .base import AsyncBaseRepository, BaseRepository, PageResult, SearchPlan
 
 class StudentRepository(BaseRepository):
     """Encapsulates Cassandra queries for the `students` table.
@@ -13,87 +15,382 @@ class StudentRepository(BaseRepository):
     Methods return `Student` Pydantic models or primitives (e.g.
     boolean for deletion). The repository uses the helpers on
     `BaseRepository` to fetch sessions and perform simple searches.
+
+    Students assigned to a project are also stored in the
+    `students_by_project` query table (partitioned by project id,
+    clustered by student id); every write keeps both tables in sync in
+    a single logged batch so listing a project's students is a
+    single-partition read.
+
+    `get_student` is served from the entity cache (including negative
+    entries for unknown ids); updates and deletes read the current row
+    from Cassandra at the write consistency and invalidate the cached
+    entry. Single-student reads carry the row `version` (latest
+    `WRITETIME`) that updates and deletes can be made conditional on;
+    conditional writes are lightweight transactions on `students` (see
+    `BaseRepository._write_if_unchanged`).
     """
 
-    def __init__(self, db: Database):
-        super().__init__(db)
-        self.table = "students"
-        self.select_cols = "s_id, s_name, s_course, s_branch, s_project_id"
-        self.prefix = "s"
+    table = "students"
+    select_cols = "s_id, s_name, s_course, s_branch, s_project_id"
+    prefix = "s"
+    counted_filters = ("s_project_id",)
+    version_cols = ("s_name", "s_course", "s_branch", "s_project_id")
+    statements = {
+        "students.insert": "INSERT INTO students (s_id, s_name, s_course, s_branch, s_project_id) VALUES (?, ?, ?, ?, ?)",
+        "students.update": "UPDATE students SET s_name = ?, s_course = ?, s_branch = ?, s_project_id = ? WHERE s_id = ?",
+        "students.delete": "DELETE FROM students WHERE s_id = ?",
+        "students.update_if": (
+            "UPDATE students SET s_name = ?, s_course = ?, s_branch = ?, s_project_id = ? WHERE s_id = ? "
+            "IF s_name = ? AND s_course = ? AND s_branch = ? AND s_project_id = ?"
+        ),
+        "students.delete_if": "DELETE FROM students WHERE s_id = ? IF s_name = ? AND s_course = ? AND s_branch = ? AND s_project_id = ?",
+        "students.get": (
+            "SELECT s_id, s_name, s_course, s_branch, s_project_id, WRITETIME(s_name) AS s_name_written, WRITETIME(s_course) AS s_course_written, "
+            "WRITETIME(s_branch) AS s_branch_written, WRITETIME(s_project_id) AS s_project_id_written FROM students WHERE s_id = ?"
+        ),
+        "students_by_project.insert": "INSERT INTO students_by_project (s_project_id, s_id, s_name, s_course, s_branch) VALUES (?, ?, ?, ?, ?)",
+        "students_by_project.update": "UPDATE students_by_project SET s_name = ?, s_course = ?, s_branch = ? WHERE s_project_id = ? AND s_id = ?",
+        "students_by_project.delete": "DELETE FROM students_by_project WHERE s_project_id = ? AND s_id = ?",
+        "students_by_project.list": "SELECT s_id, s_name, s_course, s_branch, s_project_id FROM students_by_project WHERE s_project_id = ?",
+        "students_by_project.by_id": "SELECT s_id, s_name, s_course, s_branch, s_project_id FROM students_by_project WHERE s_project_id = ? AND s_id = ?",
+        "students_by_project.by_name": "SELECT s_id, s_name, s_course, s_branch, s_project_id FROM students_by_project WHERE s_project_id = ? AND s_name = ? ALLOW FILTERING",
+        "students_by_project.count_by_name": "SELECT COUNT(*) FROM students_by_project WHERE s_project_id = ? AND s_name = ? ALLOW FILTERING",
+    }
+
+    @staticmethod
+    def _to_student(row) -> Student:
+        """Map a `students` row to a `Student` model.
+
+        This is the only validation of a row: services return the model
+        as their response. Validating the row's dict is cheaper than
+        keyword arguments, and than `model_construct`, which is
+        implemented in Python; extra columns (e.g. `<column>_written`)
+        are ignored.
+        """
+        return Student.model_validate(row._asdict())
+
+    @staticmethod
+    def _update_params(s_id: str, student: StudentUpdate) -> Optional[tuple]:
+        """Return the `students.update` parameters, or None when nothing changes."""
+        values = (student.s_name, student.s_course, student.s_branch, student.s_project_id)
+        if all(v is None for v in values):
+            return None
+        return tuple(UNSET_VALUE if v is None else v for v in values) + (s_id,)
+
+    @staticmethod
+    def _merge(current: Student, student: StudentUpdate) -> Student:
+        """Return `current` with the fields set on `student` applied.
+
+        The version of the result is unknown until the row is read again.
+        """
+        changes = {k: v for k, v in student.model_dump().items() if v is not None}
+        return current.model_copy(update={**changes, "version": None})
+
+    @staticmethod
+    def _by_project_insert(student: Student) -> Tuple[str, Tuple]:
+        return ("students_by_project.insert", (student.s_project_id, student.s_id, student.s_name, student.s_course, student.s_branch))
+
+    def _create_statements(self, student: Student) -> List[Tuple[str, Tuple]]:
+        """Statements writing a new student to `students` and its query table."""
+        statements = [("students.insert", (student.s_id, student.s_name, student.s_course, student.s_branch, student.s_project_id))]
+        if student.s_project_id:
+            statements.append(self._by_project_insert(student))
+        return statements
+
+    def _update_statements(self, current: Student, updated: Student, params: tuple) -> List[Tuple[str, Tuple]]:
+        """Statements applying an update, moving the student between projects if needed.
+
+        Within a project, the `students_by_project` row gets the same
+        partial update as `students` (`params`, unset columns left
+        alone), so columns the update does not set are never rewritten
+        from the row read before it. A student moving to another
+        project is deleted from the partition of its current project
+        and copied in full, from the merged model, to the new one.
+        """
+        statements = [("students.update", params)]
+        if current.s_project_id == updated.s_project_id:
+            if current.s_project_id:
+                statements.append(("students_by_project.update", params[:3] + (current.s_project_id, current.s_id)))
+            return statements
+        if current.s_project_id:
+            statements.append(("students_by_project.delete", (current.s_project_id, current.s_id)))
+        if updated.s_project_id:
+            statements.append(self._by_project_insert(updated))
+        return statements
+
+    def _delete_statements(self, current: Student) -> List[Tuple[str, Tuple]]:
+        """Statements removing a student from `students` and its query table."""
+        statements = [("students.delete", (current.s_id,))]
+        if current.s_project_id:
+            statements.append(("students_by_project.delete", (current.s_project_id, current.s_id)))
+        return statements
+
+    def _plan_search(self, q: Optional[Any], filters: Optional[Dict[str, Any]], estimate_total: bool, match: str = "exact") -> SearchPlan:
+        """Route project listings to the `students_by_project` partition.
+
+        A filter on `s_project_id` alone reads a single partition of the
+        query table instead of going through a secondary index; `q`
+        further narrows the listing to an id or a name within the
+        project. The query table has no name index, so name searches
+        within a project are always exact matches.
+        """
+        if not filters or set(filters) != {"s_project_id"}:
+            return super()._plan_search(q, filters, estimate_total, match)
+        project_id = filters["s_project_id"]
+        if q is None:
+            name = "students_by_project.list"
+            return SearchPlan(name, (project_id,), self.statements[name], False, ("stored", self._count_scope(filters)))
+        q_val = self._as_uuid(q)
+        if q_val is not None:
+            name = "students_by_project.by_id"
+            return SearchPlan(name, (project_id, str(q_val)), self.statements[name], True, ("rows",))
+        name, count_name = "students_by_project.by_name", "students_by_project.count_by_name"
+        return SearchPlan(name, (project_id, q), self.statements[name], False, ("count", count_name, (project_id, q), self.statements[count_name]))
+
+    @staticmethod
+    def _new_student(student: StudentCreate) -> Student:
+        """Return the `Student` to insert for `student`, with a fresh UUID."""
+        return Student(s_id=str(uuid.uuid4()), s_name=student.s_name, s_course=student.s_course, s_branch=student.s_branch, s_project_id=student.s_project_id)
 
     def create_student(self, student: StudentCreate) -> Student:
         """Insert a new student row and return the created `Student` model.
 
-        A UUID is generated for the `s_id` field.
+        A UUID is generated for the `s_id` field. The table and
+        per-project row counts are incremented.
         """
-        student_id = str(uuid.uuid4())
-        query = SimpleStatement("""
-        INSERT INTO students (s_id, s_name, s_course, s_branch, s_project_id)
-        VALUES (%s, %s, %s, %s, %s)
-        """)
-        self._get_session().execute(query, (student_id, student.s_name, student.s_course, student.s_branch, student.s_project_id))
-        return Student(s_id=student_id, s_name=student.s_name, s_course=student.s_course, s_branch=student.s_branch, s_project_id=student.s_project_id)
-
-    def update_student(self, s_id: str, student: StudentUpdate) -> Optional[Student]:
+        created = self._new_student(student)
+        self._execute_batch(self._create_statements(created))
+        self._adjust_counts(1, {"s_project_id": created.s_project_id})
+        return created
+
+    def update_student(self, s_id: str, student: StudentUpdate, if_match: Optional[Collection[int]] = None) -> Optional[Student]:
         """Apply partial updates to a student and return the updated model.
 
-        If the provided `student` has no fields set, the method returns
-        `None` to indicate there was nothing to change.
+        If the provided `student` has no fields set or the student does
+        not exist, the method returns `None`. Fields left to `None` are
+        bound as `UNSET_VALUE` so a single prepared statement serves
+        every combination of updated columns. Moving the student to
+        another project moves it between `students_by_project`
+        partitions and between the per-project row counts. The returned
+        model is the current row with the changes applied, so no read
+        follows the write. With `if_match`, raises
+        `PreconditionFailedError` unless the current version is listed
+        and the student is unchanged when written.
         """
-        sets = []
-        params = []
-        if student.s_name is not None:
-            sets.append("s_name = %s")
-            params.append(student.s_name)
-        if student.s_course is not None:
-            sets.append("s_course = %s")
-            params.append(student.s_course)
-        if student.s_branch is not None:
-            sets.append("s_branch = %s")
-            params.append(student.s_branch)
-        if student.s_project_id is not None:
-            sets.append("s_project_id = %s")
-            params.append(student.s_project_id)
-        if not sets:
+        params = self._update_params(s_id, student)
+        if params is None:
+            return None
+        current = self._fetch_student(s_id, PROFILE_WRITE)
+        if current is None:
             return None
-        set_clause = ", ".join(sets)
-        query = SimpleStatement(f"UPDATE students SET {set_clause} WHERE s_id = %s")
-        params.append(s_id)
-        self._get_session().execute(query, tuple(params))
-        return self.get_student(s_id)
-
-    def delete_student(self, s_id: str) -> bool:
-        """Delete the student with the given id. Returns True on success."""
-        query = SimpleStatement("DELETE FROM students WHERE s_id = %s")
-        self._get_session().execute(query, (s_id,))
+        updated = self._merge(current, student)
+        self._write_if_unchanged(self._update_statements(current, updated, params), current, if_match)
+        self.cache.invalidate(s_id)
+        self._record_write(self._move_deltas({"s_project_id": current.s_project_id}, {"s_project_id": updated.s_project_id}))
+        return updated
+
+    def delete_student(self, s_id: str, if_match: Optional[Collection[int]] = None) -> bool:
+        """Delete the student with the given id.
+
+        Returns False when the student does not exist, so that row
+        counts are only decremented for rows that were actually removed.
+        `if_match` makes the delete conditional as in `update_student`.
+        """
+        current = self._fetch_student(s_id, PROFILE_WRITE)
+        if current is None:
+            return False
+        self._write_if_unchanged(self._delete_statements(current), current, if_match)
+        self.cache.invalidate(s_id)
+        self._adjust_counts(-1, {"s_project_id": current.s_project_id})
         return True
 
+    def bulk_create_students(self, students: List[StudentCreate], concurrency: int) -> List[Tuple[Optional[Student], Optional[Exception]]]:
+        """Insert many students concurrently.
+
+        Each student is written like `create_student` (with its
+        `students_by_project` row in the same logged batch) through
+        `BaseRepository._bulk_write`, with at most `concurrency` writes
+        in flight. Returns, per student, the created model or the error
+        that prevented its insertion.
+        """
+        created = [self._new_student(student) for student in students]
+        errors = self._bulk_write([(self._create_statements(s), {"s_project_id": s.s_project_id}) for s in created], concurrency)
+        return [(None, error) if error else (student, None) for student, error in zip(created, errors)]
+
+    def backfill_students_by_project(self, page_size: Optional[int] = None) -> int:
+        """Copy every student assigned to a project into `students_by_project`.
+
+        Needed once for rows written before the query table existed. The
+        `students` table is scanned page by page (`page_size` rows,
+        `CASSANDRA_SCAN_FETCH_SIZE` by default, scan profile) and the
+        copy is idempotent, so the method can be re-run safely. Returns
+        the number of rows written.
+        """
+        copied = 0
+        name = f"{self.table}.all"
+        cql = self._search_statements()[name]
+        state = None
+        while True:
+            rows, state = self._fetch_page(name, (), page_size or cluster_settings.scan_fetch_size, state, cql, PROFILE_SCAN)
+            for row in rows:
+                if row.s_project_id:
+                    self._execute(*self._by_project_insert(self._to_student(row)))
+                    copied += 1
+            if state is None:
+                return copied
+
+    def _versioned_student(self, row) -> Student:
+        """Map a `students.get` row to a `Student` carrying its version."""
+        student = self._to_student(row)
+        student.version = self._row_version(row)
+        return student
+
+    def _fetch_student(self, s_id: str, profile: Optional[str] = None) -> Optional[Student]:
+        """Read a student and its version from Cassandra, bypassing the entity cache."""
+        row = self._execute("students.get", (s_id,), profile=profile).one()
+        return self._versioned_student(row) if row else None
+
     def get_student(self, s_id: str) -> Optional[Student]:
-        """Fetch a single student by id and return a `Student` model or None."""
-        query = SimpleStatement("SELECT s_id, s_name, s_course, s_branch, s_project_id FROM students WHERE s_id = %s")
-        result = self._get_session().execute(query, (s_id,))
-        row = result.one()
-        if row:
-            return Student(s_id=row.s_id, s_name=row.s_name, s_course=row.s_course, s_branch=row.s_branch, s_project_id=row.s_project_id)
-        return None
-
-    def list_students(self, page: int = 1, size: int = 10, q: Optional[str] = None, project_id: Optional[str] = None) -> Tuple[List[Student], int]:
-        """Return a paginated list of students and the total count.
-
-        Optionally filter by `project_id` and search using `q` (delegated
-        to `BaseRepository.list_with_search`).
+        """Fetch a single student by id and return a `Student` model or None.
+
+        Reads go through the entity cache; unknown ids are cached as
+        negative entries.
+        """
+        generation = self.cache.generation
+        cached = self.cache.get(s_id)
+        if cached is not NOT_CACHED:
+            return cached
+        student = self._fetch_student(s_id)
+        self.cache.set(s_id, student, generation)
+        return student
+
+    def get_students(self, ids: List[str]) -> Dict[str, Optional[Student]]:
+        """Fetch many students by id with concurrent point reads.
+
+        Cached ids are served from the entity cache and the others are
+        read concurrently (see `BaseRepository._read_many`). Returns
+        `{id: Student or None}` in the order of `ids`, without duplicates.
+        """
+        return self._read_many("students.get", ids, self._versioned_student)
+
+    def list_students(self, page: int = 1, size: int = 10, q: Optional[str] = None, project_id: Optional[str] = None, cursor: Optional[str] = None, estimate_total: bool = False, match: str = "exact") -> PageResult:
+        """Return a page of students with the total count and next cursor.
+
+        Optionally filter by `project_id` (read from `students_by_project`)
+        and search using `q`, matched against names as selected by
+        `match` (delegated to `BaseRepository.list_with_search`).
         """
         filters = None
         if project_id:
             filters = {"s_project_id": project_id}
 
-        rows, total = self.list_with_search(
+        result = self.list_with_search(
             page=page,
             size=size,
             q=q,
             filters=filters,
+            cursor=cursor,
+            estimate_total=estimate_total,
+            match=match,
         )
 
-        students = [Student(s_id=row.s_id, s_name=row.s_name, s_course=row.s_course, s_branch=row.s_branch, s_project_id=getattr(row, 's_project_id', None)) for row in rows]
+        students = [self._to_student(row) for row in result.items]
+
+        return result._replace(items=students)
+
+
+class AsyncStudentRepository(AsyncBaseRepository, StudentRepository):
+    """Asyncio counterpart of `StudentRepository` using `execute_async`.
+
+    Runs the same prepared statements, query-table writes and row-count
+    maintenance as the sync repository.
+    """
+
+    async def create_student(self, student: StudentCreate) -> Student:
+        """Insert a new student row and return the created `Student` model."""
+        created = self._new_student(student)
+        await self._execute_batch(self._create_statements(created))
+        await self._adjust_counts(1, {"s_project_id": created.s_project_id})
+        return created
+
+    async def bulk_create_students(self, students: List[StudentCreate], concurrency: int) -> List[Tuple[Optional[Student], Optional[Exception]]]:
+        """Insert many students concurrently.
+
+        `_bulk_write` blocks its calling thread while the driver
+        keeps `concurrency` writes in flight, so it runs in a worker
+        thread.
+        """
+        return await asyncio.to_thread(StudentRepository.bulk_create_students, self, students, concurrency)
+
+    async def update_student(self, s_id: str, student: StudentUpdate, if_match: Optional[Collection[int]] = None) -> Optional[Student]:
+        """Apply partial updates to a student and return the updated model."""
+        params = self._update_params(s_id, student)
+        if params is None:
+            return None
+        current = await self._fetch_student(s_id, PROFILE_WRITE)
+        if current is None:
+            return None
+        updated = self._merge(current, student)
+        await self._write_if_unchanged(self._update_statements(current, updated, params), current, if_match)
+        self.cache.invalidate(s_id)
+        await self._record_write(self._move_deltas({"s_project_id": current.s_project_id}, {"s_project_id": updated.s_project_id}))
+        return updated
+
+    async def delete_student(self, s_id: str, if_match: Optional[Collection[int]] = None) -> bool:
+        """Delete the student with the given id, False when it does not exist."""
+        current = await self._fetch_student(s_id, PROFILE_WRITE)
+        if current is None:
+            return False
+        await self._write_if_unchanged(self._delete_statements(current), current, if_match)
+        self.cache.invalidate(s_id)
+        await self._adjust_counts(-1, {"s_project_id": current.s_project_id})
+        return True
+
+    async def _fetch_student(self, s_id: str, profile: Optional[str] = None) -> Optional[Student]:
+        """Read a student and its version from Cassandra, bypassing the entity cache."""
+        row = (await self._execute_async("students.get", (s_id,), profile=profile)).one()
+        return self._versioned_student(row) if row else None
+
+    async def get_student(self, s_id: str) -> Optional[Student]:
+        """Fetch a single student by id, through the entity cache."""
+        generation = self.cache.generation
+        cached = self.cache.get(s_id)
+        if cached is not NOT_CACHED:
+            return cached
+        student = await self._fetch_student(s_id)
+        self.cache.set(s_id, student, generation)
+        return student
+
+    async def get_students(self, ids: List[str]) -> Dict[str, Optional[Student]]:
+        """Fetch many students by id with concurrent point reads, in the order of `ids`."""
+        return await self._read_many("students.get", ids, self._versioned_student)
+
+    async def list_students(self, page: int = 1, size: int = 10, q: Optional[str] = None, project_id: Optional[str] = None, cursor: Optional[str] = None, estimate_total: bool = False, match: str = "exact") -> PageResult:
+        """Return a page of students with the total count and next cursor."""
+        filters = {"s_project_id": project_id} if project_id else None
+        result = await self.list_with_search(
+            page=page,
+            size=size,
+            q=q,
+            filters=filters,
+            cursor=cursor,
+            estimate_total=estimate_total,
+            match=match,
+        )
+        return result._replace(items=[self._to_student(row) for row in result.items])
 
-        return students, total
+    async def backfill_students_by_project(self, page_size: Optional[int] = None) -> int:
+        """Copy every student assigned to a project into `students_by_project` (see `StudentRepository.backfill_students_by_project`)."""
+        copied = 0
+        name = f"{self.table}.all"
+        cql = self._search_statements()[name]
+        state = None
+        while True:
+            rows, state = await self._fetch_page(name, (), page_size or cluster_settings.scan_fetch_size, state, cql, PROFILE_SCAN)
+            for row in rows:
+                if row.s_project_id:
+                    await self._execute_async(*self._by_project_insert(self._to_student(row)))
+                    copied += 1
+            if state is None:
+                return copied
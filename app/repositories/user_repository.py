@@ -1,46 +1,205 @@
 """Repository utilities for user persistence in Cassandra."""
 
-from cassandra.query import SimpleStatement
 from ..entities.user import User, UserCreate
-from ..config.database import Database
+from ..exceptions import ConflictError
 import uuid
-from typing import Optional
+from typing import List, Optional, Tuple
+from ..config.cluster import PROFILE_SCAN, PROFILE_WRITE, cluster_settings
+from .base import AsyncBaseRepository, BaseRepository
 
-class UserRepository:
+class UserRepository(BaseRepository):
     """Handles user creation and lookup operations.
 
     Note: the repository returns `User` Pydantic models including the
     `hashed_password` field. Callers should avoid exposing that field in
     API responses and use `UserResponse` where appropriate.
+
+    Users are looked up through two query tables keyed by the lookup
+    value: `users_by_username` holds a full copy of the user so that
+    authentication is a single-partition read, and `users_by_email`
+    maps an email to its username. Both are written with
+    `IF NOT EXISTS` lightweight transactions, which makes usernames and
+    emails unique. They are read at the write consistency
+    (`LOCAL_QUORUM`), so a claim that was just applied is seen.
     """
 
-    def __init__(self, db: Database):
-        self.db = db
+    table = "users"
+    select_cols = "id, username, email, hashed_password, is_active"
+    statements = {
+        "users.insert": "INSERT INTO users (id, username, email, hashed_password, is_active) VALUES (?, ?, ?, ?, ?)",
+        "users.all": "SELECT id, username, email, hashed_password, is_active FROM users",
+        "users.set_active": "UPDATE users SET is_active = ? WHERE id = ?",
+        "users.set_password": "UPDATE users SET hashed_password = ? WHERE id = ?",
+        "users_by_username.claim": "INSERT INTO users_by_username (username, id, email, hashed_password, is_active) VALUES (?, ?, ?, ?, ?) IF NOT EXISTS",
+        "users_by_username.release": "DELETE FROM users_by_username WHERE username = ? IF id = ?",
+        "users_by_username.get": "SELECT id, username, email, hashed_password, is_active FROM users_by_username WHERE username = ?",
+        "users_by_username.set_active": "UPDATE users_by_username SET is_active = ? WHERE username = ? IF EXISTS",
+        "users_by_username.set_password": "UPDATE users_by_username SET hashed_password = ? WHERE username = ? IF EXISTS",
+        "users_by_email.claim": "INSERT INTO users_by_email (email, username, id) VALUES (?, ?, ?) IF NOT EXISTS",
+        "users_by_email.release": "DELETE FROM users_by_email WHERE email = ? IF id = ?",
+        "users_by_email.get": "SELECT username FROM users_by_email WHERE email = ?",
+    }
+
+    @staticmethod
+    def _to_user(row) -> User:
+        """Map a `users` row to a `User` model."""
+        return User(id=row.id, username=row.username, email=row.email, hashed_password=row.hashed_password, is_active=row.is_active)
+
+    @staticmethod
+    def _claims(user: User) -> List[Tuple[str, Tuple]]:
+        """Conditional inserts reserving the username and the email of `user`."""
+        return [
+            ("users_by_username.claim", (user.username, user.id, user.email, user.hashed_password, user.is_active)),
+            ("users_by_email.claim", (user.email, user.username, user.id)),
+        ]
+
+    @staticmethod
+    def _releases(user: User) -> List[Tuple[str, Tuple]]:
+        """Conditional deletes giving back the claims of `user`, email first."""
+        return [
+            ("users_by_email.release", (user.email, user.id)),
+            ("users_by_username.release", (user.username, user.id)),
+        ]
+
+    @staticmethod
+    def _new_user(user: UserCreate, hashed_password: str) -> User:
+        return User(id=str(uuid.uuid4()), username=user.username, email=user.email, hashed_password=hashed_password)
 
     def create_user(self, user: UserCreate, hashed_password: str) -> User:
-        """Create a new user row and return the stored `User` model."""
-        user_id = str(uuid.uuid4())
-        query = SimpleStatement("""
-        INSERT INTO users (id, username, email, hashed_password, is_active)
-        VALUES (%s, %s, %s, %s, %s)
-        """)
-        self.db.get_session().execute(query, (user_id, user.username, user.email, hashed_password, True))
-        return User(id=user_id, username=user.username, email=user.email, hashed_password=hashed_password)
+        """Create a new user row and return the stored `User` model.
+
+        The username is claimed first, then the email; when the email is
+        already taken the username claim is released again, and both
+        claims are released when the `users` insert fails. Raises
+        `ConflictError` when either value is already registered.
+        """
+        created = self._new_user(user, hashed_password)
+        username_claim, email_claim = self._claims(created)
+        if not self._execute(*username_claim).was_applied:
+            raise ConflictError("Username already registered")
+        if not self._execute(*email_claim).was_applied:
+            self._execute("users_by_username.release", (created.username, created.id))
+            raise ConflictError("Email already registered")
+        try:
+            self._execute("users.insert", (created.id, created.username, created.email, hashed_password, created.is_active))
+        except Exception:
+            for release in self._releases(created):
+                self._execute(*release)
+            raise
+        return created
 
     def get_user_by_username(self, username: str) -> Optional[User]:
         """Return the `User` with the given username or `None` if absent."""
-        query = SimpleStatement("SELECT id, username, email, hashed_password, is_active FROM users WHERE username = %s")
-        result = self.db.get_session().execute(query, (username,))
+        result = self._execute("users_by_username.get", (username,), profile=PROFILE_WRITE)
         row = result.one()
         if row:
-            return User(id=row.id, username=row.username, email=row.email, hashed_password=row.hashed_password, is_active=row.is_active)
+            return self._to_user(row)
         return None
 
     def get_user_by_email(self, email: str) -> Optional[User]:
         """Return the `User` with the given email or `None` if absent."""
-        query = SimpleStatement("SELECT id, username, email, hashed_password, is_active FROM users WHERE email = %s")
-        result = self.db.get_session().execute(query, (email,))
+        result = self._execute("users_by_email.get", (email,), profile=PROFILE_WRITE)
         row = result.one()
         if row:
-            return User(id=row.id, username=row.username, email=row.email, hashed_password=row.hashed_password, is_active=row.is_active)
-        return None
\ No newline at end of file
+            return self.get_user_by_username(row.username)
+        return None
+
+    def set_active(self, username: str, is_active: bool) -> Optional[User]:
+        """Activate or deactivate `username` and return the updated `User`.
+
+        Returns `None` when the user does not exist. The lookup table is
+        updated with `IF EXISTS` so that a missing user is not recreated
+        as a partial row.
+        """
+        user = self.get_user_by_username(username)
+        if user is None:
+            return None
+        if not self._execute("users_by_username.set_active", (is_active, username)).was_applied:
+            return None
+        self._execute("users.set_active", (is_active, user.id))
+        return user.model_copy(update={"is_active": is_active})
+
+    def update_password(self, user: User, hashed_password: str) -> None:
+        """Store a new password hash for `user`."""
+        if self._execute("users_by_username.set_password", (hashed_password, user.username)).was_applied:
+            self._execute("users.set_password", (hashed_password, user.id))
+
+    def backfill_lookup_tables(self, page_size: Optional[int] = None) -> int:
+        """Copy users created before the lookup tables existed into them.
+
+        Rows are claimed with the same conditional inserts as new users,
+        so the method can be re-run safely; a second user sharing an
+        already claimed username or email is skipped. Returns the number
+        of users whose username was claimed. `users` is scanned with the
+        scan profile, `page_size` rows at a time.
+        """
+        copied = 0
+        state = None
+        while True:
+            rows, state = self._fetch_page("users.all", (), page_size or cluster_settings.scan_fetch_size, state, profile=PROFILE_SCAN)
+            for row in rows:
+                username_claim, email_claim = self._claims(self._to_user(row))
+                if self._execute(*username_claim).was_applied:
+                    self._execute(*email_claim)
+                    copied += 1
+            if state is None:
+                return copied
+
+
+class AsyncUserRepository(AsyncBaseRepository, UserRepository):
+    """Asyncio counterpart of `UserRepository`."""
+
+    async def create_user(self, user: UserCreate, hashed_password: str) -> User:
+        """Create a new user row and return the stored `User` model."""
+        created = self._new_user(user, hashed_password)
+        username_claim, email_claim = self._claims(created)
+        if not (await self._execute_async(*username_claim)).was_applied:
+            raise ConflictError("Username already registered")
+        if not (await self._execute_async(*email_claim)).was_applied:
+            await self._execute_async("users_by_username.release", (created.username, created.id))
+            raise ConflictError("Email already registered")
+        try:
+            await self._execute_async("users.insert", (created.id, created.username, created.email, hashed_password, created.is_active))
+        except Exception:
+            for release in self._releases(created):
+                await self._execute_async(*release)
+            raise
+        return created
+
+    async def get_user_by_username(self, username: str) -> Optional[User]:
+        """Return the `User` with the given username or `None` if absent."""
+        row = (await self._execute_async("users_by_username.get", (username,), profile=PROFILE_WRITE)).one()
+        if row:
+            return self._to_user(row)
+        return None
+
+    async def get_user_by_email(self, email: str) -> Optional[User]:
+        """Return the `User` with the given email or `None` if absent."""
+        row = (await self._execute_async("users_by_email.get", (email,), profile=PROFILE_WRITE)).one()
+        if row:
+            return await self.get_user_by_username(row.username)
+        return None
+
+    async def set_active(self, username: str, is_active: bool) -> Optional[User]:
+        """Activate or deactivate `username` and return the updated `User` (see `UserRepository.set_active`)."""
+        user = await self.get_user_by_username(username)
+        if user is None:
+            return None
+        if not (await self._execute_async("users_by_username.set_active", (is_active, username))).was_applied:
+            return None
+        await self._execute_async("users.set_active", (is_active, user.id))
+        return user.model_copy(update={"is_active": is_active})
+
+    async def backfill_lookup_tables(self, page_size: Optional[int] = None) -> int:
+        """Copy users created before the lookup tables existed into them (see `UserRepository.backfill_lookup_tables`)."""
+        copied = 0
+        state = None
+        while True:
+            rows, state = await self._fetch_page("users.all", (), page_size or cluster_settings.scan_fetch_size, state, profile=PROFILE_SCAN)
+            for row in rows:
+                username_claim, email_claim = self._claims(self._to_user(row))
+                if (await self._execute_async(*username_claim)).was_applied:
+                    await self._execute_async(*email_claim)
+                    copied += 1
+            if state is None:
+                return copied
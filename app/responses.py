@@ -0,0 +1,34 @@
+"""Fast JSON rendering of list responses.
+
+By default FastAPI turns the model returned by an endpoint back into a
+dict, validates it again against `response_model` and encodes the
+result with `jsonable_encoder` and the stdlib `json` module. List
+endpoints build their response model from entities that were already
+validated when read (see `StudentRepository._to_student`), so with
+`FAST_JSON_RESPONSES` enabled `render` serializes the model directly
+with pydantic-core (`model_dump_json`) and returns the bytes as a
+`Response`, which FastAPI sends as is.
+
+The route keeps its `response_model`, so the OpenAPI schema is the same
+in both modes.
+"""
+
+from typing import Union
+
+from fastapi import Response
+from pydantic import BaseModel
+
+from .config.settings import app_settings
+
+
+def render(model: BaseModel, response: Response) -> Union[BaseModel, Response]:
+    """Return `model`, or its JSON as a `Response` in fast response mode.
+
+    Headers already set on the endpoint's `response` parameter (e.g.
+    `ETag`) are copied, since FastAPI does not merge them into a
+    returned `Response`.
+    """
+    if not app_settings.fast_json_responses:
+        return model
+    headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+    return Response(content=model.model_dump_json(), media_type="application/json", headers=headers)
@@ -0,0 +1,60 @@
+"""Production server entry point: `python -m app.server`.
+
+Runs uvicorn with `SERVER_WORKERS` worker processes. The Cassandra
+driver is not fork-safe (its connections, IO threads and prepared
+statement state do not survive `fork()`), so the application is passed
+to uvicorn as an import string and nothing touches Cassandra in this
+supervisor process: each worker is a fresh interpreter that imports
+`app.main` and builds its own `Database` in the lifespan handler, then
+warms it up before accepting requests and reporting ready on `/ready`.
+
+`SERVER_LOOP` and `SERVER_HTTP` select the event loop (`uvloop`,
+`asyncio`) and HTTP parser (`httptools`, `h11`); `auto` uses uvloop and
+httptools when they are installed. `SERVER_RELOAD` is meant for
+development and forces a single worker.
+"""
+
+import logging
+import sys
+
+from .config.settings import app_settings
+
+logger = logging.getLogger("app.server")
+
+LOOPS = ("auto", "asyncio", "uvloop")
+HTTP_IMPLEMENTATIONS = ("auto", "h11", "httptools")
+
+
+def server_options(settings=app_settings) -> dict:
+    """Return the keyword arguments for `uvicorn.run` built from `settings`.
+
+    Unknown loop or HTTP implementation names fall back to `auto`.
+    """
+    loop = settings.server_loop if settings.server_loop in LOOPS else "auto"
+    http = settings.server_http if settings.server_http in HTTP_IMPLEMENTATIONS else "auto"
+    options = {
+        "host": settings.server_host,
+        "port": settings.server_port,
+        "loop": loop,
+        "http": http,
+        "workers": max(1, settings.server_workers),
+        "reload": settings.server_reload,
+        "proxy_headers": True,
+    }
+    if options["reload"]:
+        options["workers"] = 1
+    return options
+
+
+def main() -> int:
+    import uvicorn
+
+    options = server_options()
+    logger.info("Starting %d worker(s) on %s:%d (loop=%s, http=%s)", options["workers"], options["host"], options["port"], options["loop"], options["http"])
+    uvicorn.run("app.main:app", **options)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    sys.exit(main())
@@ -4,72 +4,190 @@ This module exposes `AuthService` which centralizes password hashing,
 verification, user authentication, token creation, and token-based
 current-user retrieval. It relies on `UserRepository` for persistence
 and `settings` for JWT configuration.
+
+Users resolved from tokens are kept in an app-scoped `TTLCache` keyed by
+username, so most authenticated requests do not query Cassandra.
+Deactivating a user invalidates its entry.
+
+With `AUTH_MODE=claims` tokens carry the user id, email and active flag
+and the user is built from the claims alone; the only per-request check
+is against the in-memory `RevocationFilter`, reloaded from the
+`revoked_tokens` table by `revocation_refresher`.
 """
 
-from passlib.context import CryptContext
+import asyncio
+import logging
+import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import JWTError, jwt
 from fastapi import HTTPException
+from ..cache import RevocationFilter, TTLCache
 from ..entities.user import User, UserCreate
-from ..repositories.user_repository import UserRepository
+from ..exceptions import NotFoundError, TokenNotRevocableError
+from ..repositories.revoked_token_repository import AsyncRevokedTokenRepository, RevokedTokenRepository
+from ..repositories.user_repository import AsyncUserRepository, UserRepository
 from ..config.database import Database
-from ..config.security import settings
+from ..dependencies import app_scoped
+from ..config.security import AUTH_MODE_CLAIMS, settings
+from .password_hasher import PasswordHasher
+
+logger = logging.getLogger(__name__)
+
+
+def principal_cache(db: Database) -> TTLCache:
+    """Build the cache of authenticated users shared by the auth services of `db`."""
+    return TTLCache(settings.principal_cache_size, settings.principal_cache_ttl_seconds)
+
+
+def password_hasher(db: Database) -> PasswordHasher:
+    """Build the process-pool password hasher shared by the auth services of `db`.
+
+    argon2 costs pinned in `settings` are applied here; otherwise they
+    are calibrated at startup (see `PasswordHasher.calibrate`).
+    """
+    return PasswordHasher(
+        settings.password_hash_workers,
+        settings.password_hash_queue_depth,
+        time_cost=settings.argon2_time_cost,
+        memory_cost=settings.argon2_memory_cost,
+    )
 
-pwd_context = CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto")
+
+def revocation_filter(db: Database) -> RevocationFilter:
+    """Build the revoked token filter shared by the auth services of `db`."""
+    return RevocationFilter()
 
 
 class AuthService:
     """Service providing authentication helpers and JWT token handling.
 
     Responsibilities:
-    - hash and verify passwords using `passlib` contexts,
+    - hash and verify passwords using `passlib` contexts, in the
+      process pool of `hasher`,
     - authenticate a user by username/password,
     - create JWT access tokens with expiration,
     - register a new user (hashing the password before persistence),
-    - extract the current user from a JWT token.
+    - extract the current user from a JWT token,
+    - deactivate users and revoke tokens.
+
+    `principals` caches the users returned by `get_current_user` for
+    `PRINCIPAL_CACHE_TTL_SECONDS`; its `hits`/`misses` counters tell how
+    many lookups it saved. `revocations` holds the revoked token keys:
+    `jti:<token id>` for a single token and `sub:<username>` for every
+    token of a user.
     """
 
     def __init__(self, db: Database):
         """Initialize service with a `Database` wrapper used to build repository instances."""
-        self.user_repo = UserRepository(db)
+        self.user_repo = app_scoped(db, UserRepository)
+        self.revoked_repo = app_scoped(db, RevokedTokenRepository)
+        self.principals = app_scoped(db, principal_cache)
+        self.revocations = app_scoped(db, revocation_filter)
+        self.hasher = app_scoped(db, password_hasher)
 
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        """Return True if `plain_password` matches `hashed_password`."""
-        return pwd_context.verify(plain_password, hashed_password)
+        """Return True if `plain_password` matches `hashed_password`.
+
+        Raises `ServiceUnavailableError` when the hashing queue is full.
+        """
+        return self.hasher.verify(plain_password, hashed_password)
 
     def get_password_hash(self, password: str) -> str:
-        """Hash `password` using configured password hashing schemes."""
-        return pwd_context.hash(password)
+        """Hash `password` using configured password hashing schemes.
+
+        Raises `ServiceUnavailableError` when the hashing queue is full.
+        """
+        return self.hasher.hash(password)
 
     def authenticate_user(self, username: str, password: str) -> Optional[User]:
-        """Return the authenticated `User` when credentials are valid, else `None`."""
+        """Return the authenticated `User` when credentials are valid, else `None`.
+
+        Inactive users cannot authenticate. When the stored hash is weaker
+        than the current parameters (another scheme or lower argon2
+        costs) the password is rehashed and stored, so cost increases
+        roll out as users log in.
+        """
         user = self.user_repo.get_user_by_username(username)
-        if not user:
+        if not user or not user.is_active:
             return None
-        if not self.verify_password(password, user.hashed_password):
+        valid, new_hash = self.hasher.verify_and_update(password, user.hashed_password)
+        if not valid:
             return None
+        if new_hash:
+            self.user_repo.update_password(user, new_hash)
+            self.principals.invalidate(user.username)
+            user = user.model_copy(update={"hashed_password": new_hash})
         return user
 
     def create_access_token(self, data: dict, expires_delta: Optional[timedelta] = None):
         """Create a JWT token containing `data` and an expiration claim.
 
         If `expires_delta` is not provided the default from `settings` is used.
+        Every token gets a unique `jti` claim so it can be revoked.
         """
         to_encode = data.copy()
         if expires_delta:
             expire = datetime.now(timezone.utc) + expires_delta
         else:
             expire = datetime.now(timezone.utc) + timedelta(minutes=settings.access_token_expire_minutes)
-        to_encode.update({"exp": expire})
+        to_encode.update({"exp": expire, "jti": str(uuid.uuid4())})
         encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
         return encoded_jwt
 
+    @staticmethod
+    def _token_claims(user: User) -> dict:
+        """Claims identifying `user`; the profile is embedded in claims mode."""
+        claims = {"sub": user.username}
+        if settings.auth_mode == AUTH_MODE_CLAIMS:
+            claims.update({"uid": user.id, "email": user.email, "active": user.is_active})
+        return claims
+
     def register_user(self, user: UserCreate) -> User:
-        """Register a new user by hashing the provided password and persisting the user."""
+        """Register a new user by hashing the provided password and persisting the user.
+
+        Raises `ConflictError` when the username or email is already registered.
+        """
         hashed_password = self.get_password_hash(user.password)
         return self.user_repo.create_user(user, hashed_password)
 
+    def deactivate_user(self, username: str) -> User:
+        """Deactivate `username`, revoke its tokens and drop it from the principal cache.
+
+        Raises `NotFoundError` when the user does not exist. Other
+        worker processes keep serving their cached entry until it
+        expires, and accept its tokens until their next revocation
+        refresh.
+        """
+        user = self.user_repo.set_active(username, False)
+        self.principals.invalidate(username)
+        if user is None:
+            raise NotFoundError(f"User {username} not found")
+        key = f"sub:{username}"
+        self.revoked_repo.revoke(key, settings.access_token_expire_minutes * 60)
+        self.revocations.add(key)
+        return user
+
+    def revoke_token(self, token: str) -> None:
+        """Revoke `token` until it expires.
+
+        Tokens issued before the `jti` claim was added cannot be revoked
+        one by one and raise `TokenNotRevocableError`; they expire after
+        `ACCESS_TOKEN_EXPIRE_MINUTES` or with `deactivate_user`.
+        """
+        payload = self._decode_token(token)
+        jti = payload.get("jti")
+        if not jti:
+            raise TokenNotRevocableError("Token has no jti claim and cannot be revoked; it expires on its own")
+        key = f"jti:{jti}"
+        ttl = payload.get("exp", 0) - datetime.now(timezone.utc).timestamp()
+        self.revoked_repo.revoke(key, ttl)
+        self.revocations.add(key)
+
+    def refresh_revocations(self) -> None:
+        """Reload the revocation filter from the `revoked_tokens` table."""
+        self.revocations.replace(self.revoked_repo.all_keys())
+
     def login_user(self, form_data) -> Optional[str]:
         """Authenticate `form_data` (expected to have `username` and `password`) and
         return an access token string when successful, else `None`."""
@@ -78,29 +196,120 @@ class AuthService:
             return None
         access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
         access_token = self.create_access_token(
-            data={"sub": user.username}, expires_delta=access_token_expires
+            data=self._token_claims(user), expires_delta=access_token_expires
         )
         return access_token
 
-    def get_current_user(self, token: str) -> User:
-        """Decode `token` and return the corresponding `User` or raise HTTPException.
-
-        Raises 401 HTTPException when token validation fails or the user
-        does not exist.
-        """
-        credentials_exception = HTTPException(
+    def _credentials_exception(self) -> HTTPException:
+        return HTTPException(
             status_code=401,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    def _decode_token(self, token: str) -> dict:
+        """Decode `token` and return its claims or raise a 401 HTTPException.
+
+        Tokens without a `sub` claim and revoked tokens are rejected.
+        """
+        credentials_exception = self._credentials_exception()
         try:
             payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-            username: Optional[str] = payload.get("sub")
-            if username is None:
-                raise credentials_exception
         except JWTError:
             raise credentials_exception
-        user = self.user_repo.get_user_by_username(username)
-        if user is None:
+        username: Optional[str] = payload.get("sub")
+        if username is None:
+            raise credentials_exception
+        if f"sub:{username}" in self.revocations:
             raise credentials_exception
-        return user
\ No newline at end of file
+        jti = payload.get("jti")
+        if jti and f"jti:{jti}" in self.revocations:
+            raise credentials_exception
+        return payload
+
+    def _username_from_token(self, token: str) -> str:
+        """Decode `token` and return its `sub` claim or raise a 401 HTTPException."""
+        return self._decode_token(token)["sub"]
+
+    def _user_from_claims(self, payload: dict) -> Optional[User]:
+        """Build the `User` of a claims-mode token, `None` for other tokens.
+
+        The password hash is not part of the claims and is left empty.
+        """
+        if settings.auth_mode != AUTH_MODE_CLAIMS or "uid" not in payload:
+            return None
+        if not payload.get("active", False):
+            raise self._credentials_exception()
+        return User(id=payload["uid"], username=payload["sub"], email=payload.get("email", ""), hashed_password="", is_active=True)
+
+    def _remember_principal(self, username: str, user: Optional[User]) -> User:
+        """Cache and return `user`, raising a 401 when it is missing or inactive."""
+        if user is None or not user.is_active:
+            raise self._credentials_exception()
+        self.principals.set(username, user)
+        return user
+
+    def get_current_user(self, token: str) -> User:
+        """Decode `token` and return the corresponding `User` or raise HTTPException.
+
+        Raises 401 HTTPException when token validation fails, the token
+        is revoked or the user does not exist or is inactive. In claims
+        mode the user is built from the token; otherwise it is read from
+        the principal cache when present.
+        """
+        payload = self._decode_token(token)
+        user = self._user_from_claims(payload)
+        if user is not None:
+            return user
+        username = payload["sub"]
+        user = self.principals.get(username)
+        if user is not None:
+            return user
+        return self._remember_principal(username, self.user_repo.get_user_by_username(username))
+
+
+class AsyncAuthService(AuthService):
+    """`AuthService` whose per-request user lookup is awaited.
+
+    Only `get_current_user`, which runs on every authenticated request,
+    and the revocation refresh are asynchronous. Password hashing and
+    verification stay synchronous since they are CPU bound and belong
+    in the threadpool.
+    """
+
+    def __init__(self, db: Database):
+        super().__init__(db)
+        self.async_user_repo = app_scoped(db, AsyncUserRepository)
+        self.async_revoked_repo = app_scoped(db, AsyncRevokedTokenRepository)
+
+    async def get_current_user(self, token: str) -> User:
+        """Asynchronous `AuthService.get_current_user`."""
+        payload = self._decode_token(token)
+        user = self._user_from_claims(payload)
+        if user is not None:
+            return user
+        username = payload["sub"]
+        user = self.principals.get(username)
+        if user is not None:
+            return user
+        return self._remember_principal(username, await self.async_user_repo.get_user_by_username(username))
+
+    async def refresh_revocations(self) -> None:
+        """Asynchronous `AuthService.refresh_revocations`."""
+        self.revocations.replace(await self.async_revoked_repo.all_keys())
+
+
+async def revocation_refresher(db: Database) -> None:
+    """Reload the revocation filter of `db` every `REVOCATION_REFRESH_SECONDS`.
+
+    Meant to run as a background task for the lifetime of the
+    application; failed refreshes are logged and the previous filter is
+    kept until the next attempt.
+    """
+    service = app_scoped(db, AsyncAuthService)
+    while True:
+        try:
+            await service.refresh_revocations()
+        except Exception:
+            logger.exception("Failed to refresh the token revocation filter")
+        await asyncio.sleep(settings.revocation_refresh_seconds)
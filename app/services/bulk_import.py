@@ -0,0 +1,148 @@
+"""Streaming bulk import of NDJSON or CSV request bodies.
+
+`import_stream` reads the body chunk by chunk as it arrives, parses one
+record per line, validates records against a Pydantic model and hands
+them to a writer in chunks of `chunk_size` valid rows. Only one chunk
+is held in memory at a time. Rows that cannot be parsed, validated or
+written are reported with their line number in a `BulkImportResponse`.
+"""
+
+import codecs
+import csv
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Type, Union
+
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+
+from ..entities.bulk import BulkImportResponse, BulkRowError
+
+NDJSON = "ndjson"
+CSV = "csv"
+
+_FORMATS = {
+    "application/x-ndjson": NDJSON,
+    "application/ndjson": NDJSON,
+    "application/jsonl": NDJSON,
+    "application/json-lines": NDJSON,
+    "text/csv": CSV,
+}
+
+# Writes a chunk of validated rows; returns, per row, None or an error message
+ChunkWriter = Callable[[List[BaseModel]], Awaitable[List[Optional[str]]]]
+
+
+def bulk_format(content_type: Optional[str]) -> str:
+    """Return the bulk format of a `Content-Type`, raising a 415 HTTPException otherwise."""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    fmt = _FORMATS.get(media_type)
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Bulk import expects application/x-ndjson or text/csv")
+    return fmt
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    """Yield the non-blank lines of a UTF-8 byte stream with their 1-based numbers."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    number = 0
+    async for chunk in stream:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            number += 1
+            if line.strip():
+                yield number, line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending.strip():
+        yield number + 1, pending.rstrip("\r")
+
+
+async def iter_records(stream: AsyncIterator[bytes], fmt: str) -> AsyncIterator[Tuple[int, Union[Dict[str, Any], str]]]:
+    """Yield `(line, record)` for each line, or `(line, error)` when it cannot be parsed.
+
+    CSV bodies start with a header naming the fields; empty cells are
+    read as missing values. Records must fit on one line.
+    """
+    header: Optional[List[str]] = None
+    async for number, line in iter_lines(stream):
+        if fmt == NDJSON:
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield number, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield number, "Expected a JSON object"
+                continue
+            yield number, record
+            continue
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield number, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        yield number, {name: value for name, value in zip(header, values) if value != ""}
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc']) or 'row'}: {e['msg']}" for e in error.errors())
+
+
+async def import_stream(
+    stream: AsyncIterator[bytes],
+    fmt: str,
+    model: Type[BaseModel],
+    write_chunk: ChunkWriter,
+    chunk_size: int,
+    max_errors: int,
+) -> BulkImportResponse:
+    """Import every record of `stream` and return the import report.
+
+    Args:
+        stream: request body as an async iterator of bytes.
+        fmt: `NDJSON` or `CSV` (see `bulk_format`).
+        model: Pydantic model validating each record.
+        write_chunk: coroutine writing a chunk of validated rows.
+        chunk_size: number of valid rows written per `write_chunk` call.
+        max_errors: maximum number of row errors listed in the report.
+    """
+    received = created = failed = 0
+    errors: List[BulkRowError] = []
+
+    def reject(line: int, message: str) -> None:
+        nonlocal failed
+        failed += 1
+        if len(errors) < max_errors:
+            errors.append(BulkRowError(line=line, error=message))
+
+    chunk: List[Tuple[int, BaseModel]] = []
+
+    async def flush() -> None:
+        nonlocal created
+        results = await write_chunk([row for _, row in chunk])
+        for (line, _), error in zip(chunk, results):
+            if error is None:
+                created += 1
+            else:
+                reject(line, error)
+        chunk.clear()
+
+    async for line, record in iter_records(stream, fmt):
+        received += 1
+        if isinstance(record, str):
+            reject(line, record)
+            continue
+        try:
+            chunk.append((line, model.model_validate(record)))
+        except ValidationError as e:
+            reject(line, _validation_message(e))
+            continue
+        if len(chunk) >= chunk_size:
+            await flush()
+    if chunk:
+        await flush()
+
+    return BulkImportResponse(received=received, created=created, failed=failed, errors=errors, errors_truncated=failed > len(errors))
@@ -0,0 +1,71 @@
+"""Request-scoped batch loaders for embedding related entities.
+
+A loader is built per request (see the `get_project_loader` dependency
+of the student controller). Ids requested with `load` during the same
+event loop iteration are collected, de-duplicated and fetched together
+with one `AsyncProjectRepository.get_projects` call, which reads them
+concurrently through the entity cache. Results are memoized for the
+rest of the request, so each project is read at most once per request
+whatever the number of students referencing it.
+"""
+
+import asyncio
+from typing import Dict, Iterable, List, Optional
+
+from ..entities.project import Project
+from ..entities.student import StudentResponse
+from ..repositories.project_repository import AsyncProjectRepository
+
+
+class ProjectLoader:
+    """Batch and memoize project reads by id for the lifetime of one request."""
+
+    def __init__(self, repo: AsyncProjectRepository) -> None:
+        self.repo = repo
+        self.batches = 0
+        self._loaded: Dict[str, "asyncio.Future[Optional[Project]]"] = {}
+        self._pending: List[str] = []
+
+    def load(self, p_id: str) -> "asyncio.Future[Optional[Project]]":
+        """Return a future resolving to the project `p_id`, or `None` when unknown."""
+        future = self._loaded.get(p_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._loaded[p_id] = future
+            if not self._pending:
+                loop.call_soon(lambda: asyncio.ensure_future(self._dispatch()))
+            self._pending.append(p_id)
+        return future
+
+    async def load_many(self, ids: Iterable[str]) -> Dict[str, Optional[Project]]:
+        """Load every id of `ids` in one batch and return `{id: project or None}`."""
+        ids = list(dict.fromkeys(ids))
+        projects = await asyncio.gather(*(self.load(p_id) for p_id in ids))
+        return dict(zip(ids, projects))
+
+    async def _dispatch(self) -> None:
+        batch, self._pending = self._pending, []
+        self.batches += 1
+        try:
+            found = await self.repo.get_projects(batch)
+        except Exception as e:
+            for p_id in batch:
+                self._loaded.pop(p_id).set_exception(e)
+            return
+        for p_id in batch:
+            self._loaded[p_id].set_result(found.get(p_id))
+
+
+async def embed_projects(students: List[StudentResponse], loader: ProjectLoader) -> List[StudentResponse]:
+    """Return copies of `students` with their `project` embedded.
+
+    Students are copied rather than updated in place since they may be
+    shared with the entity cache. Students without a project, or whose
+    project no longer exists, are returned unchanged.
+    """
+    projects = await loader.load_many(s.s_project_id for s in students if s.s_project_id)
+    return [
+        s.model_copy(update={"project": projects[s.s_project_id]}) if projects.get(s.s_project_id) is not None else s
+        for s in students
+    ]
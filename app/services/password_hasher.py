@@ -0,0 +1,285 @@
+"""Password hashing off the request threads.
+
+argon2 hashing is CPU bound and holds the GIL for most of its run, so
+hashing inline in a request stalls every other request of the worker.
+`PasswordHasher` runs `pwd_context` in a `ProcessPoolExecutor` instead;
+the calling thread only waits on the result. The number of pending
+jobs is bounded: when the pool and its queue are full, new jobs are
+rejected at once with `ServiceUnavailableError` (HTTP 503) rather than
+queued.
+
+Queue wait (submission to start in a worker) and hash time are recorded
+in `TimingStats`. The pool is created on first use so that it belongs
+to the worker process using it, and its processes are spawned rather
+than forked from a process running driver threads.
+
+The argon2 time and memory costs should be pinned by configuration
+(`ARGON2_TIME_COST`/`ARGON2_MEMORY_COST`), calibrated once on the
+production hardware with::
+
+    python -m app.services.password_hasher
+
+When they are not pinned, each process calibrates at startup, and
+processes may then pick different costs. Hashes with lower costs than
+the current ones (or from a deprecated scheme) are reported by
+`verify_and_update`, which returns a new hash to store; hashes with
+higher costs are kept, so processes that disagree on the costs do not
+rehash each other's hashes on every login.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import sys
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+from passlib.context import CryptContext
+from passlib.hash import argon2
+
+from ..exceptions import ServiceUnavailableError
+
+logger = logging.getLogger(__name__)
+
+
+def build_context(time_cost: Optional[int] = None, memory_cost: Optional[int] = None) -> CryptContext:
+    """Return the password `CryptContext`, argon2 using the given costs.
+
+    Costs left to `None` keep passlib's defaults.
+    """
+    options = {}
+    if time_cost is not None:
+        options["argon2__time_cost"] = time_cost
+    if memory_cost is not None:
+        options["argon2__memory_cost"] = memory_cost
+    return CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto", **options)
+
+
+pwd_context = build_context()
+
+
+def _init_worker(time_cost: Optional[int], memory_cost: Optional[int]) -> None:
+    """Pool initializer installing the parent's argon2 costs in the worker."""
+    global pwd_context
+    pwd_context = build_context(time_cost, memory_cost)
+
+
+def _measure(time_cost: int, memory_cost: int, runs: int = 3) -> float:
+    """Return the fastest of `runs` argon2 hashes with the given costs, in seconds."""
+    handler = argon2.using(time_cost=time_cost, memory_cost=memory_cost)
+    best = float("inf")
+    for _ in range(runs):
+        started = time.perf_counter()
+        handler.hash("calibration")
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def calibrate_argon2(target_seconds: float, max_memory_kib: int = 65536, min_memory_kib: int = 8192, max_time_cost: int = 10) -> Tuple[int, int]:
+    """Pick argon2 `(time_cost, memory_cost)` so one hash takes about `target_seconds`.
+
+    Memory is preferred over passes: starting from `max_memory_kib`, the
+    memory cost is halved until a single pass fits in the target, then
+    passes are added while they fit. Memory costs are powers of two
+    times `min_memory_kib`, so repeated calibrations on similar
+    hardware land on the same parameters.
+    """
+    memory_cost = max_memory_kib
+    per_pass = _measure(1, memory_cost)
+    while memory_cost > min_memory_kib and per_pass > target_seconds:
+        memory_cost //= 2
+        per_pass = _measure(1, memory_cost)
+    time_cost = max(1, min(max_time_cost, int(target_seconds / per_pass)))
+    return time_cost, memory_cost
+
+
+def needs_rehash(context: CryptContext, hashed_password: str) -> bool:
+    """Return True if `hashed_password` is weaker than what `context` creates.
+
+    argon2 hashes need a rehash only when their time or memory cost is
+    lower than the configured one; other schemes follow passlib's
+    `needs_update` (deprecated schemes are rehashed).
+    """
+    if not argon2.identify(hashed_password):
+        return context.needs_update(hashed_password)
+    handler = context.handler("argon2")
+    parsed = argon2.from_string(hashed_password)
+    return parsed.rounds < handler.default_rounds or parsed.memory_cost < handler.memory_cost
+
+
+def _apply(context: CryptContext, method: str, *args):
+    """Run `method` (`hash`, `verify` or `verify_and_update`) with `context`."""
+    if method == "verify_and_update":
+        password, hashed_password = args
+        if not context.verify(password, hashed_password):
+            return False, None
+        return True, context.hash(password) if needs_rehash(context, hashed_password) else None
+    return getattr(context, method)(*args)
+
+
+def _timed(func: Callable, submitted_at: float, *args) -> Tuple[object, float, float]:
+    """Run `func(*args)` and return its result, queue wait and run time.
+
+    `time.monotonic` is system-wide on the platforms we deploy to, so
+    values taken in the parent and in the worker can be compared.
+    """
+    started = time.monotonic()
+    result = func(*args)
+    return result, started - submitted_at, time.monotonic() - started
+
+
+def _call(method: str, *args):
+    """Run `method` with the worker's `pwd_context`."""
+    return _apply(pwd_context, method, *args)
+
+
+class TimingStats:
+    """Count, sum and maximum of observed durations in seconds."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {"count": self.count, "total": self.total, "max": self.max, "avg": self.total / self.count if self.count else 0.0}
+
+
+class PasswordHasher:
+    """Hash and verify passwords in a bounded process pool.
+
+    Attributes:
+    - `workers` (int): pool processes; `0` hashes inline in the calling
+        thread (no pool, no queue limit).
+    - `queue_depth` (int): jobs allowed to wait for a free process on
+        top of the ones running.
+    - `queue_wait` / `hash_time` (`TimingStats`): time spent waiting
+        for a process and hashing/verifying.
+    - `rejected` (int): jobs refused because the queue was full.
+    - `time_cost` / `memory_cost` (int or None): argon2 costs used for
+        new hashes; `None` until pinned or calibrated (passlib
+        defaults).
+    """
+
+    def __init__(self, workers: int, queue_depth: int, time_cost: Optional[int] = None, memory_cost: Optional[int] = None):
+        self.workers = max(0, workers)
+        self.queue_depth = max(0, queue_depth)
+        self.time_cost = time_cost
+        self.memory_cost = memory_cost
+        self._context = build_context(time_cost, memory_cost)
+        self.queue_wait = TimingStats()
+        self.hash_time = TimingStats()
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_depth) if self.workers else None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.time_cost, self.memory_cost),
+                )
+            return self._executor
+
+    def calibrate(self, target_seconds: float, max_memory_kib: int = 65536) -> Tuple[Optional[int], Optional[int]]:
+        """Calibrate the argon2 costs to `target_seconds` unless they are pinned.
+
+        Costs set at construction (from configuration) take precedence;
+        a target of `0` keeps passlib's defaults. Must run before the
+        pool is started, i.e. at application startup. Returns the costs
+        in use.
+        """
+        if self.time_cost is None and self.memory_cost is None and target_seconds > 0:
+            self.time_cost, self.memory_cost = calibrate_argon2(target_seconds, max_memory_kib)
+            self._context = build_context(self.time_cost, self.memory_cost)
+            logger.warning(
+                "argon2 calibrated to time_cost=%s memory_cost=%s KiB for %.0f ms in this process; pin ARGON2_TIME_COST/ARGON2_MEMORY_COST "
+                "(see python -m app.services.password_hasher) so that every worker uses the same costs",
+                self.time_cost, self.memory_cost, target_seconds * 1000,
+            )
+        return self.time_cost, self.memory_cost
+
+    def _run(self, method: str, *args):
+        """Run `pwd_context.<method>(*args)` in the pool, raising `ServiceUnavailableError` when full."""
+        if not self.workers:
+            result, wait, elapsed = _timed(_apply, time.monotonic(), self._context, method, *args)
+        else:
+            if not self._slots.acquire(blocking=False):
+                with self._lock:
+                    self.rejected += 1
+                raise ServiceUnavailableError("Password hashing is overloaded, retry later")
+            try:
+                future: Future = self._get_executor().submit(_timed, _call, time.monotonic(), method, *args)
+            except BaseException:
+                self._slots.release()
+                raise
+            future.add_done_callback(lambda _: self._slots.release())
+            result, wait, elapsed = future.result()
+        self.queue_wait.observe(wait)
+        self.hash_time.observe(elapsed)
+        return result
+
+    def hash(self, password: str) -> str:
+        """Return the hash of `password` using the configured schemes."""
+        return self._run("hash", password)
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        """Return True if `password` matches `hashed_password`."""
+        return self._run("verify", password, hashed_password)
+
+    def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify `password` and return a replacement hash when needed.
+
+        Returns `(valid, new_hash)`: `new_hash` is set when the password
+        is valid but `hashed_password` is weaker than the current
+        parameters (see `needs_rehash`), and is `None` otherwise. The
+        rehash happens in the same worker job as the verification.
+        """
+        return self._run("verify_and_update", password, hashed_password)
+
+    def needs_update(self, hashed_password: str) -> bool:
+        """Return True if `hashed_password` is weaker than the current parameters."""
+        return needs_rehash(self._context, hashed_password)
+
+    def stats(self) -> Dict[str, object]:
+        """Return the timing statistics and the number of rejected jobs."""
+        return {"queue_wait": self.queue_wait.stats(), "hash_time": self.hash_time.stats(), "rejected": self.rejected}
+
+    def shutdown(self) -> None:
+        """Stop the worker processes, if they were started."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+def main(argv=None) -> int:
+    """Calibrate argon2 on this machine and print the settings to pin."""
+    from ..config.security import settings
+
+    parser = argparse.ArgumentParser(prog="python -m app.services.password_hasher", description="Calibrate the argon2 costs on this machine and print the settings to pin.")
+    parser.add_argument("--target-ms", type=float, default=settings.password_hash_target_ms, help="duration of one hash (default: PASSWORD_HASH_TARGET_MS)")
+    parser.add_argument("--max-memory-kib", type=int, default=settings.argon2_max_memory_kib, help="memory cost ceiling (default: ARGON2_MAX_MEMORY_KIB)")
+    args = parser.parse_args(argv)
+    time_cost, memory_cost = calibrate_argon2(args.target_ms / 1000, args.max_memory_kib)
+    print(f"ARGON2_TIME_COST={time_cost}")
+    print(f"ARGON2_MEMORY_COST={memory_cost}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
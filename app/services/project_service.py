@@ -5,10 +5,13 @@ updating, deleting and listing projects using the underlying
 `ProjectRepository`.
 """
 
-from ..repositories.project_repository import ProjectRepository
+from ..repositories.project_repository import AsyncProjectRepository, ProjectRepository
 from ..config.database import Database
+from ..config.settings import app_settings
+from ..dependencies import app_scoped
 from ..entities.project import ProjectCreate, ProjectUpdate, ProjectResponse
-from typing import List, Optional, Tuple
+from ..repositories.base import PageResult
+from typing import Collection, List, Optional, Tuple
 from ..exceptions import NotFoundError
 
 class ProjectService:
@@ -16,27 +19,36 @@ class ProjectService:
 
     def __init__(self, db: Database):
         """Initialize the service with a database wrapper."""
-        self.repo = ProjectRepository(db)
+        self.repo = app_scoped(db, ProjectRepository)
 
     def create_project(self, project: ProjectCreate) -> ProjectResponse:
         """Create a new project and return a `ProjectResponse`."""
         p = self.repo.create_project(project)
-        return ProjectResponse(**p.model_dump())
+        return p
 
-    def update_project(self, p_id: str, project: ProjectUpdate) -> ProjectResponse:
+    def bulk_create_projects(self, projects: List[ProjectCreate]) -> List[Optional[str]]:
+        """Create many projects with up to `BULK_CONCURRENCY` writes in flight.
+
+        Returns, per project, `None` when it was created or the error
+        message explaining why it was not.
+        """
+        results = self.repo.bulk_create_projects(projects, app_settings.bulk_concurrency)
+        return [None if error is None else str(error) for _, error in results]
+
+    def update_project(self, p_id: str, project: ProjectUpdate, if_match: Optional[Collection[int]] = None) -> ProjectResponse:
         """Update project `p_id` and return the updated object.
 
         Raises `NotFoundError` if the project does not exist or no
         modifications were made.
         """
-        updated = self.repo.update_project(p_id, project)
+        updated = self.repo.update_project(p_id, project, if_match=if_match)
         if updated is None:
             raise NotFoundError(f"Project with id {p_id} not found or no changes provided")
-        return ProjectResponse(**updated.model_dump())
+        return updated
 
-    def delete_project(self, p_id: str) -> bool:
+    def delete_project(self, p_id: str, if_match: Optional[Collection[int]] = None) -> bool:
         """Delete project by id, raising `NotFoundError` if not found."""
-        success = self.repo.delete_project(p_id)
+        success = self.repo.delete_project(p_id, if_match=if_match)
         if not success:
             raise NotFoundError(f"Project with id {p_id} not found")
         return True
@@ -46,9 +58,83 @@ class ProjectService:
         p = self.repo.get_project(p_id)
         if p is None:
             raise NotFoundError(f"Project with id {p_id} not found")
-        return ProjectResponse(**p.model_dump())
+        return p
+
+    def get_project_with_version(self, p_id: str) -> Tuple[ProjectResponse, Optional[int]]:
+        """Return a project by id with its version (used as ETag), raising `NotFoundError` if absent."""
+        p = self.repo.get_project(p_id)
+        if p is None:
+            raise NotFoundError(f"Project with id {p_id} not found")
+        return p, p.version
+
+    def lookup_projects(self, ids: List[str]) -> Tuple[List[ProjectResponse], List[str]]:
+        """Return the projects with the given ids in request order, and the ids not found."""
+        found = self.repo.get_projects(ids)
+        return [x for x in found.values() if x is not None], [key for key, x in found.items() if x is None]
+
+    def list_version(self) -> int:
+        """Return the `projects` table version identifying the current state of every listing."""
+        return self.repo.table_version()
+
+    def list_projects(self, page: int = 1, size: int = 10, q: Optional[str] = None, cursor: Optional[str] = None, estimate_total: bool = False, match: str = "exact") -> PageResult:
+        """Return a page of projects, optional `q` for searching by id/name."""
+        return self.repo.list_projects(page=page, size=size, q=q, cursor=cursor, estimate_total=estimate_total, match=match)
+
+
+class AsyncProjectService(ProjectService):
+    """Asyncio variant of `ProjectService` backed by `AsyncProjectRepository`."""
+
+    def __init__(self, db: Database):
+        """Initialize the service with a database wrapper."""
+        self.repo = app_scoped(db, AsyncProjectRepository)
+
+    async def create_project(self, project: ProjectCreate) -> ProjectResponse:
+        """Create a new project and return a `ProjectResponse`."""
+        p = await self.repo.create_project(project)
+        return p
+
+    async def bulk_create_projects(self, projects: List[ProjectCreate]) -> List[Optional[str]]:
+        """Create many projects, returning `None` or an error message per project."""
+        results = await self.repo.bulk_create_projects(projects, app_settings.bulk_concurrency)
+        return [None if error is None else str(error) for _, error in results]
+
+    async def update_project(self, p_id: str, project: ProjectUpdate, if_match: Optional[Collection[int]] = None) -> ProjectResponse:
+        """Update project `p_id`, raising `NotFoundError` when absent or unchanged."""
+        updated = await self.repo.update_project(p_id, project, if_match=if_match)
+        if updated is None:
+            raise NotFoundError(f"Project with id {p_id} not found or no changes provided")
+        return updated
+
+    async def delete_project(self, p_id: str, if_match: Optional[Collection[int]] = None) -> bool:
+        """Delete project by id, raising `NotFoundError` if not found."""
+        success = await self.repo.delete_project(p_id, if_match=if_match)
+        if not success:
+            raise NotFoundError(f"Project with id {p_id} not found")
+        return True
+
+    async def get_project(self, p_id: str) -> ProjectResponse:
+        """Return a project by id or raise `NotFoundError`."""
+        p = await self.repo.get_project(p_id)
+        if p is None:
+            raise NotFoundError(f"Project with id {p_id} not found")
+        return p
+
+    async def get_project_with_version(self, p_id: str) -> Tuple[ProjectResponse, Optional[int]]:
+        """Return a project by id with its version, raising `NotFoundError` if absent."""
+        p = await self.repo.get_project(p_id)
+        if p is None:
+            raise NotFoundError(f"Project with id {p_id} not found")
+        return p, p.version
+
+    async def lookup_projects(self, ids: List[str]) -> Tuple[List[ProjectResponse], List[str]]:
+        """Return the projects with the given ids in request order, and the ids not found."""
+        found = await self.repo.get_projects(ids)
+        return [x for x in found.values() if x is not None], [key for key, x in found.items() if x is None]
+
+    async def list_version(self) -> int:
+        """Return the `projects` table version."""
+        return await self.repo.table_version()
 
-    def list_projects(self, page: int = 1, size: int = 10, q: Optional[str] = None) -> Tuple[List[ProjectResponse], int]:
-        """Return paginated projects, optional `q` for searching by id/name."""
-        items, total = self.repo.list_projects(page=page, size=size, q=q)
-        return [ProjectResponse(**p.model_dump()) for p in items], total
+    async def list_projects(self, page: int = 1, size: int = 10, q: Optional[str] = None, cursor: Optional[str] = None, estimate_total: bool = False, match: str = "exact") -> PageResult:
+        """Return a page of projects, optional `q` for searching by id/name."""
+        return await self.repo.list_projects(page=page, size=size, q=q, cursor=cursor, estimate_total=estimate_total, match=match)
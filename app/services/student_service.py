@@ -1,15 +1,18 @@
 """Business logic related to students.
 
 This service exposes methods used by the API layer to create, update,
-delete and list students. It translates repository return values into
-Pydantic response models and raises domain-specific exceptions when
-resources are not found.
+delete and list students. Repository entities are returned as they
+are (a `Student` is a `StudentResponse`) and domain-specific exceptions
+are raised when resources are not found.
 """
 
-from ..repositories.student_repository import StudentRepository
+from ..repositories.student_repository import AsyncStudentRepository, StudentRepository
 from ..config.database import Database
+from ..config.settings import app_settings
+from ..dependencies import app_scoped
 from ..entities.student import StudentCreate, StudentUpdate, StudentResponse
-from typing import List, Tuple, Optional
+from ..repositories.base import PageResult
+from typing import Collection, List, Optional, Tuple
 from ..exceptions import NotFoundError
 
 
@@ -18,7 +21,7 @@ class StudentService:
 
     def __init__(self, db: Database):
         """Create a `StudentService` using the provided `db` wrapper."""
-        self.repo = StudentRepository(db)
+        self.repo = app_scoped(db, StudentRepository)
 
     def create_student(self, student: StudentCreate) -> StudentResponse:
         """Create a new student and return a `StudentResponse`.
@@ -30,26 +33,35 @@ class StudentService:
             Created `StudentResponse`.
         """
         s = self.repo.create_student(student)
-        return StudentResponse(**s.model_dump())
+        return s
 
-    def update_student(self, s_id: str, student: StudentUpdate) -> StudentResponse:
+    def bulk_create_students(self, students: List[StudentCreate]) -> List[Optional[str]]:
+        """Create many students with up to `BULK_CONCURRENCY` writes in flight.
+
+        Returns, per student, `None` when it was created or the error
+        message explaining why it was not.
+        """
+        results = self.repo.bulk_create_students(students, app_settings.bulk_concurrency)
+        return [None if error is None else str(error) for _, error in results]
+
+    def update_student(self, s_id: str, student: StudentUpdate, if_match: Optional[Collection[int]] = None) -> StudentResponse:
         """Update student identified by `s_id`.
 
         Raises `NotFoundError` if the student does not exist or no changes
         were applied.
         """
-        updated = self.repo.update_student(s_id, student)
+        updated = self.repo.update_student(s_id, student, if_match=if_match)
         if updated is None:
             raise NotFoundError(f"Student with id {s_id} not found or no changes provided")
-        return StudentResponse(**updated.model_dump())
+        return updated
 
-    def delete_student(self, s_id: str) -> bool:
+    def delete_student(self, s_id: str, if_match: Optional[Collection[int]] = None) -> bool:
         """Delete the student with id `s_id`.
 
         Raises `NotFoundError` when the student is not found.
         Returns True on successful deletion.
         """
-        success = self.repo.delete_student(s_id)
+        success = self.repo.delete_student(s_id, if_match=if_match)
         if not success:
             raise NotFoundError(f"Student with id {s_id} not found")
         return True
@@ -59,12 +71,93 @@ class StudentService:
         s = self.repo.get_student(s_id)
         if s is None:
             raise NotFoundError(f"Student with id {s_id} not found")
-        return StudentResponse(**s.model_dump())
+        return s
+
+    def get_student_with_version(self, s_id: str) -> Tuple[StudentResponse, Optional[int]]:
+        """Return a student by id with its version (used as ETag), raising `NotFoundError` if absent."""
+        s = self.repo.get_student(s_id)
+        if s is None:
+            raise NotFoundError(f"Student with id {s_id} not found")
+        return s, s.version
+
+    def lookup_students(self, ids: List[str]) -> Tuple[List[StudentResponse], List[str]]:
+        """Return the students with the given ids in request order, and the ids not found."""
+        found = self.repo.get_students(ids)
+        return [x for x in found.values() if x is not None], [key for key, x in found.items() if x is None]
+
+    def list_version(self) -> int:
+        """Return the `students` table version identifying the current state of every listing."""
+        return self.repo.table_version()
 
-    def list_students(self, page: int = 1, size: int = 10, q: Optional[str] = None, project_id: Optional[str] = None) -> Tuple[List[StudentResponse], int]:
-        """Return a paginated list of students as `StudentResponse` objects.
+    def list_students(self, page: int = 1, size: int = 10, q: Optional[str] = None, project_id: Optional[str] = None, cursor: Optional[str] = None, estimate_total: bool = False, match: str = "exact") -> PageResult:
+        """Return a page of students as `StudentResponse` objects.
 
-        Supports an optional search `q` and filtering by `project_id`.
+        Supports an optional search `q`, filtering by `project_id` and
+        resuming from a `cursor` returned by a previous page.
+        `estimate_total` trades an exact `total` for a size estimate on
+        unfiltered listings. `match` selects an exact, prefix or
+        contains match of `q` against student names.
         """
-        items, total = self.repo.list_students(page=page, size=size, q=q, project_id=project_id)
-        return [StudentResponse(**s.model_dump()) for s in items], total
+        return self.repo.list_students(page=page, size=size, q=q, project_id=project_id, cursor=cursor, estimate_total=estimate_total, match=match)
+
+
+class AsyncStudentService(StudentService):
+    """Asyncio variant of `StudentService` backed by `AsyncStudentRepository`.
+
+    Methods mirror `StudentService` and must be awaited.
+    """
+
+    def __init__(self, db: Database):
+        """Create an `AsyncStudentService` using the provided `db` wrapper."""
+        self.repo = app_scoped(db, AsyncStudentRepository)
+
+    async def create_student(self, student: StudentCreate) -> StudentResponse:
+        """Create a new student and return a `StudentResponse`."""
+        s = await self.repo.create_student(student)
+        return s
+
+    async def bulk_create_students(self, students: List[StudentCreate]) -> List[Optional[str]]:
+        """Create many students, returning `None` or an error message per student."""
+        results = await self.repo.bulk_create_students(students, app_settings.bulk_concurrency)
+        return [None if error is None else str(error) for _, error in results]
+
+    async def update_student(self, s_id: str, student: StudentUpdate, if_match: Optional[Collection[int]] = None) -> StudentResponse:
+        """Update student `s_id`, raising `NotFoundError` when absent or unchanged."""
+        updated = await self.repo.update_student(s_id, student, if_match=if_match)
+        if updated is None:
+            raise NotFoundError(f"Student with id {s_id} not found or no changes provided")
+        return updated
+
+    async def delete_student(self, s_id: str, if_match: Optional[Collection[int]] = None) -> bool:
+        """Delete the student with id `s_id`, raising `NotFoundError` when absent."""
+        success = await self.repo.delete_student(s_id, if_match=if_match)
+        if not success:
+            raise NotFoundError(f"Student with id {s_id} not found")
+        return True
+
+    async def get_student(self, s_id: str) -> StudentResponse:
+        """Retrieve a student by id, raising `NotFoundError` if absent."""
+        s = await self.repo.get_student(s_id)
+        if s is None:
+            raise NotFoundError(f"Student with id {s_id} not found")
+        return s
+
+    async def get_student_with_version(self, s_id: str) -> Tuple[StudentResponse, Optional[int]]:
+        """Return a student by id with its version, raising `NotFoundError` if absent."""
+        s = await self.repo.get_student(s_id)
+        if s is None:
+            raise NotFoundError(f"Student with id {s_id} not found")
+        return s, s.version
+
+    async def lookup_students(self, ids: List[str]) -> Tuple[List[StudentResponse], List[str]]:
+        """Return the students with the given ids in request order, and the ids not found."""
+        found = await self.repo.get_students(ids)
+        return [x for x in found.values() if x is not None], [key for key, x in found.items() if x is None]
+
+    async def list_version(self) -> int:
+        """Return the `students` table version."""
+        return await self.repo.table_version()
+
+    async def list_students(self, page: int = 1, size: int = 10, q: Optional[str] = None, project_id: Optional[str] = None, cursor: Optional[str] = None, estimate_total: bool = False, match: str = "exact") -> PageResult:
+        """Return a page of students as `StudentResponse` objects."""
+        return await self.repo.list_students(page=page, size=size, q=q, project_id=project_id, cursor=cursor, estimate_total=estimate_total, match=match)
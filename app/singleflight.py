@@ -0,0 +1,110 @@
+"""Single-flight coalescing of identical concurrent reads.
+
+While a read for a key (statement name, parameters, page size, paging
+state and profile) is in flight, identical reads wait for it and share
+its result instead of sending their own query: a burst of requests for
+the same page or the same entity costs one Cassandra round trip.
+
+`SingleFlight` serves both the threaded sync repositories (`do`) and
+the asyncio ones (`do_async`). Shared results must be treated as
+read-only and must not be consumed by reading them: repositories
+share a `ReadResult` snapshot of the first page, never the driver
+`ResultSet`, which iteration consumes.
+
+Writes call `invalidate` before they are sent. It starts a new
+generation of keys, so a read issued after a write never joins a read
+that was already in flight before it and cannot miss the write.
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, Union
+
+
+class _Call:
+    """A sync read in flight and, once done, its outcome."""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Union[BaseException, None] = None
+
+
+class SingleFlight:
+    """Run at most one read per key at a time and share its outcome."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Tuple[int, Hashable], _Call] = {}
+        self._tasks: Dict[Tuple[int, Hashable], "asyncio.Future[Any]"] = {}
+        self._generation = 0
+        self.executed = 0
+        self.coalesced = 0
+
+    def invalidate(self) -> None:
+        """Stop new reads from joining the reads currently in flight."""
+        with self._lock:
+            self._generation += 1
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Return `fn()`, or the outcome of the identical call already in flight."""
+        with self._lock:
+            key = (self._generation, key)
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await `fn()`, or the identical call already in flight on this event loop.
+
+        `fn` returns a coroutine or a future. The read is shielded, so a
+        cancelled caller does not cancel it for the others.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            key = (self._generation, key)
+            task = self._tasks.get(key)
+            if task is not None and task.get_loop() is loop:
+                self.coalesced += 1
+            else:
+                task = self._tasks[key] = asyncio.ensure_future(fn(), loop=loop)
+                task.add_done_callback(lambda done: self._forget(key, done))
+                self.executed += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Tuple[int, Hashable], task: "asyncio.Future[Any]") -> None:
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of reads sent, reads coalesced and reads in flight."""
+        return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": len(self._calls) + len(self._tasks)}
+
+
+def read_flights(db) -> SingleFlight:
+    """Build the `SingleFlight` shared by every repository of `db` (see `app_scoped`)."""
+    return SingleFlight()
@@ -0,0 +1,187 @@
+"""Requests/sec of sync vs async list endpoints against a simulated Cassandra.
+
+Both variants serve `GET /students/` through the real services and
+repositories; only the database is replaced by an in-process fake whose
+queries complete after `--latency` milliseconds, the way the driver
+completes them on its own I/O thread. The sync variant is the former
+`def` endpoint running in Starlette's threadpool, the async one is the
+current `async def` endpoint awaiting `execute_async`.
+
+Usage:
+    python -m benchmarks.bench_async --concurrency 200 --latency 5 --duration 5
+"""
+
+import argparse
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import namedtuple
+
+import httpx
+from fastapi import Depends, FastAPI
+
+from app.config.statements import StatementRegistry
+from app.dependencies import app_scoped
+from app.services.student_service import AsyncStudentService, StudentService
+
+Row = namedtuple("Row", ["s_id", "s_name", "s_course", "s_branch", "s_project_id"])
+CountRow = namedtuple("CountRow", ["row_count"])
+ROWS = [Row(f"s-{i}", f"Student {i}", "CS", "A", None) for i in range(10)]
+
+
+class FakeBound:
+    def __init__(self, cql, params):
+        self.cql = cql
+        self.params = params
+        self.fetch_size = None
+
+
+class FakePrepared:
+    def __init__(self, cql):
+        self.cql = cql
+
+    def bind(self, params):
+        return FakeBound(self.cql, params)
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.current_rows = rows
+        self.paging_state = None
+
+    def one(self):
+        return self.current_rows[0] if self.current_rows else None
+
+
+class FakeResponseFuture:
+    _col_names = None
+    _col_types = None
+    has_more_pages = False
+    _paging_state = None
+
+    def __init__(self, loop, rows):
+        self.loop = loop
+        self.rows = rows
+
+    def add_callbacks(self, callback, errback):
+        self.loop.call_later(callback, self.rows)
+
+
+class DriverLoop(threading.Thread):
+    """Single I/O thread completing requests after the simulated latency."""
+
+    def __init__(self, latency):
+        super().__init__(daemon=True)
+        self.latency = latency
+        self.queue = []
+        self.counter = itertools.count()
+        self.cond = threading.Condition()
+
+    def call_later(self, callback, *args):
+        with self.cond:
+            heapq.heappush(self.queue, (time.monotonic() + self.latency, next(self.counter), callback, args))
+            self.cond.notify()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.queue:
+                    self.cond.wait()
+                due, _, callback, args = self.queue[0]
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self.cond.wait(delay)
+                    continue
+                heapq.heappop(self.queue)
+            callback(*args)
+
+
+class FakeSession:
+    def __init__(self, latency, loop):
+        self.latency = latency
+        self.loop = loop
+
+    def prepare(self, cql):
+        return FakePrepared(cql)
+
+    def _rows(self, statement):
+        if "row_counts" in statement.cql:
+            return [CountRow(len(ROWS))]
+        return ROWS
+
+    def execute(self, statement, **kwargs):
+        time.sleep(self.latency)
+        return FakeResult(self._rows(statement))
+
+    def execute_async(self, statement, **kwargs):
+        return FakeResponseFuture(self.loop, self._rows(statement))
+
+
+class FakeDB:
+    def __init__(self, latency):
+        loop = DriverLoop(latency)
+        loop.start()
+        self.session = FakeSession(latency, loop)
+        self.statements = StatementRegistry()
+        self.statements.bind(self.session)
+
+    def get_session(self):
+        return self.session
+
+
+def build_app(db) -> FastAPI:
+    app = FastAPI()
+
+    def sync_service() -> StudentService:
+        return app_scoped(db, StudentService)
+
+    async def async_service() -> AsyncStudentService:
+        return app_scoped(db, AsyncStudentService)
+
+    @app.get("/sync/students/")
+    def list_sync(service: StudentService = Depends(sync_service)):
+        result = service.list_students(size=10)
+        return {"items": result.items, "total": result.total}
+
+    @app.get("/async/students/")
+    async def list_async(service: AsyncStudentService = Depends(async_service)):
+        result = await service.list_students(size=10)
+        return {"items": result.items, "total": result.total}
+
+    return app
+
+
+async def run(app, path, concurrency, duration):
+    done = 0
+    deadline = time.monotonic() + duration
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            nonlocal done
+            while time.monotonic() < deadline:
+                response = await client.get(path)
+                response.raise_for_status()
+                done += 1
+
+        start = time.monotonic()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return done / (time.monotonic() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=5.0, help="simulated query latency in ms")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per variant")
+    args = parser.parse_args()
+
+    app = build_app(FakeDB(args.latency / 1000))
+    for name in ("sync", "async"):
+        rps = asyncio.run(run(app, f"/{name}/students/", args.concurrency, args.duration))
+        print(f"{name:>5}: {rps:8.1f} req/s (concurrency={args.concurrency}, latency={args.latency}ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Latency of a list page rendered through `response_model` vs `FAST_JSON_RESPONSES`.
+
+Both routes return the same `StudentListResponse` of `--size` students
+built from already validated entities, as the list endpoints do. The
+`default` route lets FastAPI revalidate it against `response_model` and
+encode it with `jsonable_encoder` and `json`; the `fast` route goes
+through `app.responses.render` with the fast mode enabled. Requests run
+sequentially over an in-process ASGI transport.
+
+Usage:
+    python -m benchmarks.bench_json --size 100 --requests 2000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI, Response
+
+from app.config.settings import app_settings
+from app.entities.student import Student, StudentListResponse
+from app.responses import render
+
+
+def build_app(size) -> FastAPI:
+    app = FastAPI()
+    items = [Student(s_id=f"00000000-0000-0000-0000-{i:012d}", s_name=f"Student {i}", s_course="CS", s_branch="A") for i in range(size)]
+
+    def page():
+        return StudentListResponse(items=items, total=size, page=1, size=size)
+
+    @app.get("/default/students/", response_model=StudentListResponse)
+    async def list_default():
+        return page()
+
+    @app.get("/fast/students/", response_model=StudentListResponse)
+    async def list_fast(response: Response):
+        return render(page(), response)
+
+    return app
+
+
+async def run(client, path, requests):
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await client.get(path)
+        latencies.append((time.perf_counter() - start) * 1e6)
+        response.raise_for_status()
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+
+async def main_async(size, requests):
+    app_settings.fast_json_responses = True
+    app = build_app(size)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for name in ("default", "fast"):
+            await run(client, f"/{name}/students/", 50)
+            p50, p99 = await run(client, f"/{name}/students/", requests)
+            print(f"{name:>7}: p50 {p50:8.1f} us  p99 {p99:8.1f} us (size={size})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100, help="students per page")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.size, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""CPU time and memory of mapping Cassandra rows to list responses.
+
+Compares the former mapping of a `GET /students/` page with the current
+one, on the same raw rows:
+
+- `legacy`: the driver's `named_tuple_factory` (a namedtuple class per
+  page), a validated `Student(...)` per row in the repository, then
+  `StudentResponse(**student.model_dump())` per row in the service.
+- `current`: `cached_named_tuple_factory`, `Student.model_validate`
+  of the row dict in the repository and the entities returned as
+  response models.
+
+Both variants then go through FastAPI's `response_model` validation and
+serialization, which is where the single remaining validation happens.
+The `mapping` lines time rows -> response items alone; the `endpoint`
+lines time whole requests over an in-process ASGI transport. Memory is
+the peak traced by `tracemalloc` per page.
+
+Usage:
+    python -m benchmarks.bench_mapping --size 100 --iterations 500
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+import httpx
+from cassandra.query import named_tuple_factory
+from fastapi import FastAPI
+
+from app.config.cluster import cached_named_tuple_factory
+from app.entities.student import Student, StudentListResponse, StudentResponse
+from app.repositories.student_repository import StudentRepository
+
+COLUMNS = ["s_id", "s_name", "s_course", "s_branch", "s_project_id"]
+
+
+def raw_rows(size):
+    return [(f"00000000-0000-0000-0000-{i:012d}", f"Student {i}", "CS", "A", None) for i in range(size)]
+
+
+def legacy_items(raw):
+    rows = named_tuple_factory(COLUMNS, raw)
+    students = [Student(s_id=r.s_id, s_name=r.s_name, s_course=r.s_course, s_branch=r.s_branch, s_project_id=r.s_project_id) for r in rows]
+    return [StudentResponse(**s.model_dump()) for s in students]
+
+
+def current_items(raw):
+    rows = cached_named_tuple_factory(COLUMNS, raw)
+    return [StudentRepository._to_student(r) for r in rows]
+
+
+VARIANTS = {"legacy": legacy_items, "current": current_items}
+
+
+def build_app(raw) -> FastAPI:
+    app = FastAPI()
+    for name, items in VARIANTS.items():
+        def endpoint(items=items):
+            return StudentListResponse(items=items(raw), total=len(raw), page=1, size=len(raw))
+
+        app.add_api_route(f"/{name}/students/", endpoint, methods=["GET"], response_model=StudentListResponse)
+    return app
+
+
+def measure(fn, iterations):
+    """Return (CPU microseconds per call, peak KiB traced during one call)."""
+    fn()
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    cpu = (time.process_time() - start) / iterations * 1e6
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+    return cpu, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100, help="rows per page")
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    raw = raw_rows(args.size)
+    for name, items in VARIANTS.items():
+        cpu, peak = measure(lambda: items(raw), args.iterations)
+        print(f"mapping  {name:>7}: {cpu:9.1f} us/page  {peak:8.1f} KiB peak (size={args.size})")
+
+    app = build_app(raw)
+    loop = asyncio.new_event_loop()
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+    try:
+        for name in VARIANTS:
+            def request(path=f"/{name}/students/"):
+                loop.run_until_complete(client.get(path)).raise_for_status()
+
+            cpu, peak = measure(request, args.iterations)
+            print(f"endpoint {name:>7}: {cpu:9.1f} us/req   {peak:8.1f} KiB peak (size={args.size})")
+    finally:
+        loop.run_until_complete(client.aclose())
+        loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+
+from app.cache import RevocationFilter, TTLCache
+from app.entities.user import User
+from app.services.auth_service import AuthService
+from app.services.password_hasher import PasswordHasher
+
+
+class CountingUserRepo:
+    def __init__(self):
+        self.users = {"alice": User(id="u-1", username="alice", email="a@example.com", hashed_password="h")}
+        self.lookups = 0
+
+    def get_user_by_username(self, username):
+        self.lookups += 1
+        return self.users.get(username)
+
+    def set_active(self, username, is_active):
+        user = self.users.get(username)
+        if user is None:
+            return None
+        self.users[username] = user.model_copy(update={"is_active": is_active})
+        return self.users[username]
+
+    def update_password(self, user, hashed_password):
+        self.users[user.username] = user.model_copy(update={"hashed_password": hashed_password})
+
+
+class RecordingRevokedRepo:
+    def __init__(self):
+        self.keys = {}
+
+    def revoke(self, key, ttl_seconds):
+        self.keys[key] = ttl_seconds
+
+    def all_keys(self):
+        return list(self.keys)
+
+
+class FakeAuthService(AuthService):
+    def __init__(self, repo):
+        # bypass UserRepository and DB
+        self.user_repo = repo
+        self.revoked_repo = RecordingRevokedRepo()
+        self.principals = TTLCache(maxsize=10, ttl=60)
+        self.revocations = RevocationFilter()
+        self.hasher = PasswordHasher(workers=0, queue_depth=0, time_cost=2, memory_cost=1024)
+
+
+def assert_unauthorized(svc, token):
+    try:
+        svc.get_current_user(token)
+        assert False, "Expected HTTPException"
+    except HTTPException as e:
+        assert e.status_code == 401
+
+
+def test_current_user_is_served_from_cache():
+    repo = CountingUserRepo()
+    svc = FakeAuthService(repo)
+    token = svc.create_access_token({"sub": "alice"})
+
+    assert svc.get_current_user(token).id == "u-1"
+    assert svc.get_current_user(token).id == "u-1"
+    assert repo.lookups == 1
+    assert svc.principals.hits == 1
+    assert svc.principals.misses == 1
+
+
+def test_deactivation_invalidates_cached_user():
+    repo = CountingUserRepo()
+    svc = FakeAuthService(repo)
+    token = svc.create_access_token({"sub": "alice"})
+    svc.get_current_user(token)
+
+    svc.deactivate_user("alice")
+
+    assert_unauthorized(svc, token)
+    assert "sub:alice" in svc.revoked_repo.keys
+
+
+def test_claims_mode_skips_user_lookup(monkeypatch):
+    from app.config.security import settings
+
+    monkeypatch.setattr(settings, "auth_mode", "claims")
+    repo = CountingUserRepo()
+    svc = FakeAuthService(repo)
+    token = svc.create_access_token(svc._token_claims(repo.users["alice"]))
+
+    user = svc.get_current_user(token)
+
+    assert (user.id, user.username, user.email) == ("u-1", "alice", "a@example.com")
+    assert repo.lookups == 0
+
+
+def test_revoked_token_is_rejected_after_refresh():
+    repo = CountingUserRepo()
+    svc = FakeAuthService(repo)
+    revoked = svc.create_access_token({"sub": "alice"})
+    other = svc.create_access_token({"sub": "alice"})
+
+    svc.revoke_token(revoked)
+    svc.revocations = RevocationFilter()
+    svc.refresh_revocations()
+
+    assert_unauthorized(svc, revoked)
+    assert svc.get_current_user(other).id == "u-1"
+
+
+def test_login_rehashes_outdated_hash():
+    repo = CountingUserRepo()
+    svc = FakeAuthService(repo)
+    old_hash = PasswordHasher(workers=0, queue_depth=0, time_cost=1, memory_cost=1024).hash("s3cret")
+    repo.users["alice"] = repo.users["alice"].model_copy(update={"hashed_password": old_hash})
+
+    assert svc.authenticate_user("alice", "s3cret") is not None
+    stored = repo.users["alice"].hashed_password
+    assert stored != old_hash
+    assert not svc.hasher.needs_update(stored)
+    assert svc.authenticate_user("alice", "wrong") is None
+
+
+def test_token_without_jti_cannot_be_revoked():
+    from jose import jwt
+    from app.config.security import settings
+    from app.exceptions import TokenNotRevocableError
+
+    repo = CountingUserRepo()
+    svc = FakeAuthService(repo)
+    legacy = jwt.encode({"sub": "alice", "exp": datetime.now(timezone.utc) + timedelta(minutes=5)}, settings.secret_key, algorithm=settings.algorithm)
+    current = svc.create_access_token({"sub": "alice"})
+
+    try:
+        svc.revoke_token(legacy)
+        assert False, "Expected TokenNotRevocableError"
+    except TokenNotRevocableError:
+        pass
+    assert svc.revoked_repo.keys == {}
+    assert svc.get_current_user(legacy).id == "u-1"
+
+    # A stray "jti:None" entry does not revoke legacy tokens either
+    svc.revocations.add("jti:None")
+    assert svc.get_current_user(legacy).id == "u-1"
+    svc.revoke_token(current)
+    assert svc.get_current_user(legacy).id == "u-1"
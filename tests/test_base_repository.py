@@ -0,0 +1,356 @@
+from collections import namedtuple
+
+from app.config.statements import StatementRegistry
+from app.exceptions import InvalidCursorError
+from app.repositories.base import decode_cursor, encode_cursor
+from app.repositories.project_repository import ProjectRepository
+
+Row = namedtuple("Row", ["p_id", "p_name", "p_head"])
+CountRow = namedtuple("CountRow", ["row_count"])
+
+
+class FakeBound:
+    def __init__(self, cql, params):
+        self.cql = cql
+        self.params = params
+        self.fetch_size = None
+
+
+class FakePrepared:
+    def __init__(self, cql):
+        self.cql = cql
+
+    def bind(self, params):
+        return FakeBound(self.cql, params)
+
+
+class FakeResult:
+    def __init__(self, rows, paging_state=None):
+        self.current_rows = rows
+        self.paging_state = paging_state
+
+    def one(self):
+        return self.current_rows[0] if self.current_rows else None
+
+
+class PagingSession:
+    """Serve `SELECT` pages from an in-memory list, honouring `fetch_size`."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.fetched = 0
+
+    def prepare(self, cql):
+        return FakePrepared(cql)
+
+    def execute(self, statement, paging_state=None, **kwargs):
+        if "row_counts" in statement.cql:
+            return FakeResult([CountRow(len(self.rows))])
+        start = int(paging_state) if paging_state else 0
+        end = start + statement.fetch_size
+        page = self.rows[start:end]
+        self.fetched += len(page)
+        return FakeResult(page, str(end).encode() if end < len(self.rows) else None)
+
+
+class FakeDB:
+    def __init__(self, session):
+        self.session = session
+        self.statements = StatementRegistry()
+        self.statements.bind(session)
+
+    def get_session(self):
+        return self.session
+
+
+def make_repo(count):
+    rows = [Row(f"p-{i}", f"Project {i}", "Lead") for i in range(count)]
+    session = PagingSession(rows)
+    return ProjectRepository(FakeDB(session)), session
+
+
+def test_list_reads_only_requested_page():
+    repo, session = make_repo(50)
+    result = repo.list_projects(page=1, size=10)
+    assert [p.p_id for p in result.items] == [f"p-{i}" for i in range(10)]
+    assert result.total == 50
+    assert result.next_cursor is not None
+    assert session.fetched == 10
+
+
+def test_cursor_resumes_after_previous_page():
+    repo, _ = make_repo(25)
+    first = repo.list_projects(size=10)
+    second = repo.list_projects(size=10, cursor=first.next_cursor)
+    third = repo.list_projects(size=10, cursor=second.next_cursor)
+    assert second.items[0].p_id == "p-10"
+    assert [p.p_id for p in third.items] == [f"p-{i}" for i in range(20, 25)]
+    assert third.next_cursor is None
+
+
+def test_page_number_without_cursor_skips_pages():
+    repo, _ = make_repo(25)
+    result = repo.list_projects(page=3, size=10)
+    assert [p.p_id for p in result.items] == [f"p-{i}" for i in range(20, 25)]
+
+
+def test_cursor_roundtrip_and_invalid_cursor():
+    assert decode_cursor(encode_cursor(b"\x00\x01state")) == b"\x00\x01state"
+    assert encode_cursor(None) is None
+    try:
+        decode_cursor("!!!")
+        assert False, "Expected InvalidCursorError"
+    except InvalidCursorError:
+        pass
+
+
+def test_count_scope_only_for_counted_filters():
+    from app.repositories.student_repository import StudentRepository
+
+    repo = StudentRepository(FakeDB(PagingSession([])))
+    assert repo._count_scope(None) == ""
+    assert repo._count_scope({"s_project_id": "p-1"}) == "s_project_id=p-1"
+    assert repo._count_scope({"s_name": "Alice"}) is None
+
+
+class FakeResponseFuture:
+    """Complete from another thread, like the driver's event loop does."""
+
+    _col_names = None
+    _col_types = None
+    has_more_pages = False
+    _paging_state = None
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def add_callbacks(self, callback, errback):
+        import threading
+
+        threading.Thread(target=callback, args=(self.rows,)).start()
+
+
+class AsyncSession(PagingSession):
+    def execute_async(self, statement, **kwargs):
+        return FakeResponseFuture([Row(statement.params[0], "Async", "Lead")])
+
+
+def test_async_repository_awaits_driver_future():
+    import asyncio
+    from app.repositories.project_repository import AsyncProjectRepository
+
+    repo = AsyncProjectRepository(FakeDB(AsyncSession([])))
+    project = asyncio.run(repo.get_project("p-42"))
+    assert project.p_id == "p-42"
+    assert project.p_name == "Async"
+
+
+def test_prefix_search_uses_sai_like_when_supported():
+    repo, _ = make_repo(0)
+    repo.db.name_search = "like"
+    plan = repo._plan_search("Ali", None, False, match="prefix")
+    assert plan.name == "projects.by_name_like"
+    assert plan.params == ("Ali%",)
+    assert plan.cql.endswith("WHERE p_name LIKE ?")
+    assert repo._plan_search("Ali", None, False, match="contains").params == ("%Ali%",)
+
+
+def test_prefix_search_falls_back_to_exact_match_without_sai():
+    repo, _ = make_repo(0)
+    for name_search in (None, "exact"):
+        repo.db.name_search = name_search
+        plan = repo._plan_search("Ali", None, False, match="prefix")
+        assert plan.name == "projects.by_name"
+        assert plan.params == ("Ali",)
+
+
+class LookupSession(PagingSession):
+    def __init__(self):
+        super().__init__([])
+        self.reads = []
+
+    def execute_async(self, statement, **kwargs):
+        p_id = statement.params[0]
+        self.reads.append(p_id)
+        return FakeResponseFuture([] if p_id.startswith("missing") else [Row(p_id, f"Project {p_id}", "Lead")])
+
+
+def test_multi_get_keeps_request_order_and_reports_missing():
+    import asyncio
+    from app.repositories.project_repository import AsyncProjectRepository
+    from app.services.project_service import AsyncProjectService
+
+    session = LookupSession()
+    db = FakeDB(session)
+    repo = AsyncProjectRepository(db)
+    repo.cache.set("p-cached", repo._to_project(Row("p-cached", "Cached", "Lead")))
+
+    found = asyncio.run(repo.get_projects(["p-2", "missing-1", "p-cached", "p-1", "p-2"]))
+    assert list(found) == ["p-2", "missing-1", "p-cached", "p-1"]
+    assert found["missing-1"] is None
+    assert found["p-cached"].p_name == "Cached"
+    assert sorted(session.reads) == ["missing-1", "p-1", "p-2"]
+
+    service = AsyncProjectService.__new__(AsyncProjectService)
+    service.repo = repo
+    items, missing = asyncio.run(service.lookup_projects(["p-1", "missing-1", "p-3"]))
+    assert [p.p_id for p in items] == ["p-1", "p-3"]
+    assert missing == ["missing-1"]
+    assert sorted(session.reads) == ["missing-1", "p-1", "p-2", "p-3"]
+
+
+def test_read_racing_an_invalidation_is_not_cached():
+    from app.cache import NOT_CACHED
+
+    class RacingSession(PagingSession):
+        """Apply a concurrent update while the first read is in flight."""
+
+        def execute(self, statement, **kwargs):
+            result = FakeResult(list(self.rows))
+            if self.rows[0].p_name == "Old":
+                self.rows[0] = Row("p-1", "New", "Lead")
+                repo.cache.invalidate("p-1")
+            return result
+
+    session = RacingSession([Row("p-1", "Old", "Lead")])
+    repo = ProjectRepository(FakeDB(session))
+
+    assert repo.get_project("p-1").p_name == "Old"
+    assert repo.cache.get("p-1") is NOT_CACHED
+    assert repo.get_project("p-1").p_name == "New"
+    assert repo.cache.get("p-1").p_name == "New"
+
+
+def test_coalesced_listings_each_get_the_rows():
+    import threading
+    import time
+    import uuid
+
+    from cassandra.cluster import ResultSet
+
+    class DriverResponse:
+        _col_names = _col_types = _continuous_paging_session = _paging_state = None
+        has_more_pages = False
+
+    class CoalescingSession(PagingSession):
+        """Answer with a driver `ResultSet` once a second read has joined the first one."""
+
+        def execute(self, statement, **kwargs):
+            deadline = time.monotonic() + 5
+            while repo.flights.coalesced == 0 and time.monotonic() < deadline:
+                time.sleep(0.001)
+            return ResultSet(DriverResponse(), list(self.rows))
+
+    p_id = str(uuid.uuid4())
+    repo = ProjectRepository(FakeDB(CoalescingSession([Row(p_id, "Shared", "Lead")])))
+    pages = []
+    threads = [threading.Thread(target=lambda: pages.append(repo.list_with_search(q=p_id))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert repo.flights.stats()["executed"] == 1
+    assert [[p.p_name for p in page.items] for page in pages] == [["Shared"], ["Shared"]]
+    assert [page.total for page in pages] == [1, 1]
+
+
+def test_sync_multi_get_is_capped_and_goes_through_execute(monkeypatch):
+    import threading
+    import time
+
+    from app.config.settings import app_settings
+
+    class CountingSession(PagingSession):
+        def __init__(self):
+            super().__init__([])
+            self.lock = threading.Lock()
+            self.in_flight = self.peak = 0
+
+        def execute(self, statement, **kwargs):
+            with self.lock:
+                self.in_flight += 1
+                self.peak = max(self.peak, self.in_flight)
+            time.sleep(0.01)
+            with self.lock:
+                self.in_flight -= 1
+            p_id = statement.params[0]
+            return FakeResult([] if p_id.startswith("missing") else [Row(p_id, f"Project {p_id}", "Lead")])
+
+    monkeypatch.setattr(app_settings, "lookup_concurrency", 2)
+    session = CountingSession()
+    repo = ProjectRepository(FakeDB(session))
+    recorded = []
+    monkeypatch.setattr(repo.query_log, "record", lambda name, *args, **kwargs: recorded.append(name))
+
+    found = repo.get_projects(["p-1", "p-2", "missing-1", "p-3", "p-4"])
+
+    assert [p and p.p_name for p in found.values()] == ["Project p-1", "Project p-2", None, "Project p-3", "Project p-4"]
+    assert session.peak == 2
+    assert recorded == ["projects.get"] * 5
+    assert repo.flights.stats()["executed"] == 5
+
+    # The threads are shared by the following multi-gets
+    from app.dependencies import app_scoped
+    from app.repositories.base import read_pool
+
+    pool = app_scoped(repo.db, read_pool)
+    repo.cache.clear()
+    repo.get_projects(["p-5", "p-6", "p-7"])
+    assert app_scoped(repo.db, read_pool) is pool
+    assert session.peak == 2
+
+
+def test_bulk_writes_are_capped_and_reported_to_the_query_log(monkeypatch):
+    import threading
+
+    class WriteFuture:
+        def __init__(self, session, statement):
+            self.session = session
+            self.statement = statement
+
+        def add_callbacks(self, callback, errback):
+            def complete():
+                with self.session.lock:
+                    self.session.in_flight -= 1
+                if self.statement.params[1] == "Broken":
+                    errback(RuntimeError("write failed"))
+                else:
+                    callback([])
+
+            threading.Timer(0.005, complete).start()
+
+    class BulkSession(PagingSession):
+        def __init__(self):
+            super().__init__([])
+            self.lock = threading.Lock()
+            self.in_flight = self.peak = 0
+            self.kwargs = []
+
+        def execute_async(self, statement, **kwargs):
+            with self.lock:
+                self.in_flight += 1
+                self.peak = max(self.peak, self.in_flight)
+                self.kwargs.append(kwargs)
+            return WriteFuture(self, statement)
+
+        def execute(self, statement, **kwargs):
+            return FakeResult([])
+
+    session = BulkSession()
+    repo = ProjectRepository(FakeDB(session))
+    recorded = []
+    monkeypatch.setattr(repo.query_log, "record", lambda name, *args, **kwargs: recorded.append((name, kwargs.get("error"))))
+    monkeypatch.setattr(repo.query_log, "should_trace", lambda: True)
+    monkeypatch.setattr(repo, "_scopes_counts_batch", lambda deltas: FakeBound("BATCH", tuple(deltas.values())))
+
+    rows = [([("projects.insert", (f"p-{i}", "Broken" if i == 2 else "Fine", "Lead"))], None) for i in range(5)]
+    errors = repo._bulk_write(rows, concurrency=2)
+
+    assert [type(error).__name__ if error else None for error in errors] == [None, None, "RuntimeError", None, None]
+    assert session.peak == 2
+    assert sorted(name for name, error in recorded if name == "projects.insert") == ["projects.insert"] * 5
+    assert [type(error).__name__ for _, error in recorded if error] == ["RuntimeError"]
+    assert session.kwargs[0] == {"trace": True, "execution_profile": "write"}
+    # The row counts of the four rows written, in one batch
+    assert recorded[-1] == ("batch(row_counts, table_versions)", None)
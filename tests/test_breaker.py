@@ -0,0 +1,90 @@
+import os
+import threading
+
+from app.config.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from app.config.database import Database
+from app.exceptions import DatabaseError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_refuses_and_closes():
+    clock = FakeClock()
+    breaker = CircuitBreaker(2, clock=clock)
+    assert breaker.allow_request()
+
+    breaker.trip()
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+    assert breaker.retry_in() == 2
+
+    clock.now += 1.5
+    assert breaker.retry_in() == 0.5
+    breaker.half_open()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.retry_in() == 2
+
+    breaker.half_open()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow_request()
+    assert breaker.stats() == {"state": CLOSED, "opens": 1, "rejections": 2, "failures": 1}
+
+
+def make_db(connect):
+    db = Database.__new__(Database)
+    db.session = None
+    db.cluster = None
+    db.pid = os.getpid()
+    db.breaker = CircuitBreaker(0.01)
+    db._closing = threading.Event()
+    db._reconnect_lock = threading.Lock()
+    db._reconnector = None
+    db.connect = connect
+    return db
+
+
+def test_lost_session_fails_fast_and_reconnects_in_background():
+    attempts = []
+
+    def connect():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise OSError("connection refused")
+        db.session = "session"
+
+    db = make_db(connect)
+    try:
+        db.get_session()
+    except DatabaseError:
+        pass
+    else:
+        assert False, "Expected DatabaseError"
+    db._reconnector.join(timeout=5)
+
+    assert len(attempts) == 3
+    assert db.breaker.state == CLOSED
+    assert db.get_session() == "session"
+    assert db.breaker.stats()["failures"] == 2
+
+
+def test_open_breaker_rejects_without_reconnecting():
+    db = make_db(lambda: None)
+    db.session = "session"
+    db.breaker.trip()
+    try:
+        db.get_session()
+    except DatabaseError:
+        pass
+    else:
+        assert False, "Expected DatabaseError"
+    assert db._reconnector is None
@@ -0,0 +1,57 @@
+import asyncio
+
+from app.entities.student import StudentCreate
+from app.services.bulk_import import CSV, NDJSON, import_stream
+
+
+async def body(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+class RecordingWriter:
+    def __init__(self, fail_names=()):
+        self.chunks = []
+        self.fail_names = fail_names
+
+    async def __call__(self, rows):
+        self.chunks.append([row.s_name for row in rows])
+        return ["write failed" if row.s_name in self.fail_names else None for row in rows]
+
+
+def run(stream, fmt, writer, chunk_size=2, max_errors=10):
+    return asyncio.run(import_stream(stream, fmt, StudentCreate, writer, chunk_size, max_errors))
+
+
+def test_ndjson_rows_are_written_in_chunks_across_body_chunks():
+    writer = RecordingWriter()
+    stream = body(
+        b'{"s_name": "A", "s_course": "CS", "s_branch": "X"}\n{"s_name": "B", "s_co',
+        b'urse": "CS", "s_branch": "X"}\n{"s_name": "C", "s_course": "CS", "s_branch": "X"}',
+    )
+    report = run(stream, NDJSON, writer)
+    assert writer.chunks == [["A", "B"], ["C"]]
+    assert (report.received, report.created, report.failed) == (3, 3, 0)
+
+
+def test_per_row_errors_report_line_numbers():
+    writer = RecordingWriter(fail_names=("D",))
+    stream = body(
+        b'{"s_name": "A", "s_course": "CS", "s_branch": "X"}\n',
+        b'not json\n',
+        b'{"s_name": "B"}\n',
+        b'\n{"s_name": "D", "s_course": "CS", "s_branch": "X"}\n',
+    )
+    report = run(stream, NDJSON, writer, max_errors=2)
+    assert (report.received, report.created, report.failed) == (4, 1, 3)
+    assert [e.line for e in report.errors] == [2, 3]
+    assert report.errors_truncated
+
+
+def test_csv_header_maps_columns_and_empty_cells_are_missing():
+    writer = RecordingWriter()
+    stream = body(b"s_name,s_course,s_branch,s_project_id\r\nAlice,CS,X,\r\n", b'"Bob, Jr",CS,Y,p-1\r\nshort,row\r\n')
+    report = run(stream, CSV, writer)
+    assert writer.chunks == [["Alice", "Bob, Jr"]]
+    assert report.created == 2
+    assert report.errors[0].line == 4
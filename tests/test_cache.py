@@ -0,0 +1,87 @@
+from app.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+    cache.set("alice", 1)
+    assert cache.get("alice") == 1
+    clock.now = 5
+    assert cache.get("alice") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 0}
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_invalidate_and_disabled_cache():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+    cache.invalidate("a")
+    assert cache.get("a") is None
+
+    disabled = TTLCache(maxsize=0, ttl=60)
+    disabled.set("a", 1)
+    assert len(disabled) == 0
+
+
+def test_revocation_filter_checks_exact_set():
+    from app.cache import RevocationFilter
+
+    revocations = RevocationFilter()
+    revocations.replace(f"jti:{i}" for i in range(3000))
+    assert "jti:42" in revocations
+    assert "jti:3000" not in revocations
+    revocations.add("sub:alice")
+    assert "sub:alice" in revocations
+    assert len(revocations) == 3001
+
+
+def test_tinylfu_admits_frequent_keys_only():
+    from app.cache import NOT_CACHED, TinyLFUCache
+
+    cache = TinyLFUCache(maxsize=2, ttl=60, negative_ttl=5)
+    for key in ("a", "b"):
+        for _ in range(3):
+            cache.get(key)
+        cache.set(key, key.upper())
+    cache.get("once")
+    cache.set("once", "ONCE")
+    assert cache.get("once") is NOT_CACHED
+    assert cache.stats()["rejections"] == 1
+
+    for _ in range(5):
+        cache.get("hot")
+    cache.set("hot", "HOT")
+    assert cache.get("hot") == "HOT"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_tinylfu_negative_entries_use_their_own_ttl():
+    from app.cache import NOT_CACHED, TinyLFUCache
+
+    clock = FakeClock()
+    cache = TinyLFUCache(maxsize=10, ttl=60, negative_ttl=5, clock=clock)
+    cache.set("missing", None)
+    cache.set("present", 1)
+    assert cache.get("missing") is None
+    clock.now = 5
+    assert cache.get("missing") is NOT_CACHED
+    assert cache.get("present") == 1
+    assert cache.stats()["hit_ratio"] == 2 / 3
@@ -0,0 +1,40 @@
+from cassandra import ConsistencyLevel
+from cassandra.cluster import EXEC_PROFILE_DEFAULT
+from cassandra.policies import ConstantSpeculativeExecutionPolicy, NoSpeculativeExecutionPolicy, TokenAwarePolicy
+from cassandra.query import named_tuple_factory
+
+from app.config.cluster import PROFILE_READ, PROFILE_SCAN, PROFILE_WRITE, ClusterSettings, cached_named_tuple_factory
+
+
+def test_execution_profiles_from_environment(monkeypatch):
+    monkeypatch.setenv("CASSANDRA_CONTACT_POINTS", "cass-1, cass-2")
+    monkeypatch.setenv("CASSANDRA_WRITE_CONSISTENCY", "each_quorum")
+    monkeypatch.setenv("CASSANDRA_READ_CONSISTENCY", "not-a-level")
+    settings = ClusterSettings()
+    profiles = settings.execution_profiles()
+
+    assert settings.contact_points == ["cass-1", "cass-2"]
+    assert set(profiles) == {EXEC_PROFILE_DEFAULT, PROFILE_READ, PROFILE_WRITE, PROFILE_SCAN}
+    assert profiles[PROFILE_READ].consistency_level == ConsistencyLevel.LOCAL_ONE
+    assert profiles[PROFILE_WRITE].consistency_level == ConsistencyLevel.EACH_QUORUM
+    assert profiles[PROFILE_WRITE].serial_consistency_level == ConsistencyLevel.LOCAL_SERIAL
+    assert isinstance(profiles[PROFILE_READ].speculative_execution_policy, ConstantSpeculativeExecutionPolicy)
+    assert profiles[PROFILE_SCAN].request_timeout > profiles[PROFILE_READ].request_timeout
+    assert all(isinstance(p.load_balancing_policy, TokenAwarePolicy) for p in profiles.values())
+
+
+def test_speculative_execution_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("CASSANDRA_SPECULATIVE_DELAY_MS", "0")
+    profiles = ClusterSettings().execution_profiles()
+    assert isinstance(profiles[PROFILE_READ].speculative_execution_policy, NoSpeculativeExecutionPolicy)
+
+
+def test_row_factory_reuses_one_row_class_per_column_list():
+    first = cached_named_tuple_factory(["s_id", "s_name"], [("1", "Ada"), ("2", "Bob")])
+    second = cached_named_tuple_factory(["s_id", "s_name"], [("3", "Cy")])
+    assert type(first[0]) is type(second[0])
+    assert first == named_tuple_factory(["s_id", "s_name"], [("1", "Ada"), ("2", "Bob")])
+    assert first[1].s_name == "Bob"
+
+    applied = cached_named_tuple_factory(["[applied]", "id"], [(False, "x")])
+    assert applied[0].applied is False
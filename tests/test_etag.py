@@ -0,0 +1,153 @@
+from collections import namedtuple
+
+from starlette.requests import Request
+
+from app.entities.project import Project
+from app.etag import entity_etag, if_match_versions, list_etag, not_modified
+from app.exceptions import PreconditionFailedError
+from app.repositories.project_repository import ProjectRepository
+
+
+def make_request(headers=None, query=b""):
+    raw = [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw, "query_string": query})
+
+
+def test_matching_if_none_match_returns_304():
+    etag = entity_etag(0x1F)
+    assert not_modified(make_request(), etag) is None
+    assert not_modified(make_request({"If-None-Match": '"20"'}), etag) is None
+    response = not_modified(make_request({"If-None-Match": 'W/"20", W/"1f"'}), etag)
+    assert response.status_code == 304
+    assert response.headers["etag"] == '"1f"'
+
+
+def test_list_etag_depends_on_version_and_query():
+    first = list_etag("students", 3, make_request(query=b"page=1"))
+    assert first.startswith('W/"students-3-')
+    assert first != list_etag("students", 4, make_request(query=b"page=1"))
+    assert first != list_etag("students", 3, make_request(query=b"page=2"))
+    assert not_modified(make_request({"If-None-Match": first}, b"page=1"), first).status_code == 304
+
+
+def test_if_match_versions():
+    assert if_match_versions(make_request()) is None
+    assert if_match_versions(make_request({"If-Match": "*"})) is None
+    assert if_match_versions(make_request({"If-Match": '"1f", W/"20", "zz"'})) == {0x1F}
+
+
+def test_row_version_is_latest_column_writetime():
+    repo = ProjectRepository(db=None)
+    Row = namedtuple("Row", ["p_id", "p_name", "p_head", "p_name_written", "p_head_written"])
+    assert repo._row_version(Row("p-1", "Apollo", "Ada", 10, 12)) == 12
+    assert repo._row_version(Row("p-1", "Apollo", None, 10, None)) == 10
+
+
+def test_check_version_rejects_other_versions():
+    project = Project(p_id="p-1", p_name="Apollo", p_head="Ada", version=12)
+    ProjectRepository._check_version(project, None)
+    ProjectRepository._check_version(project, {12})
+    try:
+        ProjectRepository._check_version(project, {10})
+    except PreconditionFailedError:
+        pass
+    else:
+        assert False, "Expected PreconditionFailedError"
+    assert "version" not in project.model_dump()
+
+
+
+StudentRow = namedtuple("StudentRow", ["s_id", "s_name", "s_course", "s_branch", "s_project_id", "s_name_written", "s_course_written", "s_branch_written", "s_project_id_written"])
+
+
+class Bound:
+    def __init__(self, cql, params):
+        self.cql = cql
+        self.params = tuple(params)
+
+
+class Prepared:
+    def __init__(self, cql):
+        self.cql = cql
+
+    def bind(self, params):
+        return Bound(self.cql, params)
+
+
+class Result:
+    def __init__(self, rows=(), was_applied=True):
+        self.current_rows = list(rows)
+        self.paging_state = None
+        self.was_applied = was_applied
+
+    def one(self):
+        return self.current_rows[0] if self.current_rows else None
+
+
+class ConditionalSession:
+    """Serve one student row and apply `IF` conditions against it.
+
+    `change` is applied to the row right after it is read, like a
+    concurrent writer would.
+    """
+
+    def __init__(self, row, change=None):
+        self.row = row
+        self.change = change or {}
+        self.sent = []
+
+    def prepare(self, cql):
+        return Prepared(cql)
+
+    def execute(self, statement, execution_profile=None, **kwargs):
+        cql = statement.cql
+        self.sent.append((cql.split(" WHERE")[0], execution_profile))
+        if cql.startswith("SELECT"):
+            row, self.row = self.row, self.row._replace(**self.change)
+            return Result([row])
+        if " IF " in cql:
+            return Result(was_applied=statement.params[-4:] == tuple(self.row[1:5]))
+        return Result()
+
+
+def make_student_repo(session):
+    from app.config.statements import StatementRegistry
+    from app.repositories.student_repository import StudentRepository
+
+    db = type("DB", (), {"get_session": lambda self: session})()
+    db.statements = StatementRegistry()
+    db.statements.bind(session)
+    repo = StudentRepository(db)
+    repo._batch = lambda statements: Bound("BATCH " + ", ".join(name for name, _ in statements), ())
+    repo._record_write = lambda deltas=None: None
+    repo._adjust_counts = lambda delta, filters=None: None
+    return repo
+
+
+def test_conditional_update_is_a_lightweight_transaction():
+    from app.entities.student import StudentUpdate
+
+    session = ConditionalSession(StudentRow("s-1", "Alice", "CS", "A", "p-1", 10, 10, 10, 12))
+    repo = make_student_repo(session)
+
+    updated = repo.update_student("s-1", StudentUpdate(s_project_id="p-2"), if_match={12})
+
+    assert updated.s_project_id == "p-2"
+    assert [profile for _, profile in session.sent] == ["write"] * 3
+    assert session.sent[0][0].startswith("SELECT")
+    assert session.sent[1][0] == "UPDATE students SET s_name = ?, s_course = ?, s_branch = ?, s_project_id = ?"
+    # The query table follows in its own batch, once the condition held
+    assert session.sent[2][0] == "BATCH students_by_project.delete, students_by_project.insert"
+
+
+def test_concurrent_change_fails_the_conditional_write():
+    session = ConditionalSession(StudentRow("s-1", "Alice", "CS", "A", "p-1", 10, 10, 10, 12), change={"s_name": "Alicia"})
+    repo = make_student_repo(session)
+
+    try:
+        repo.delete_student("s-1", if_match={12})
+        assert False, "Expected PreconditionFailedError"
+    except PreconditionFailedError:
+        pass
+    assert [cql.split(" ")[0] for cql, _ in session.sent] == ["SELECT", "DELETE"]
+    assert all(not cql.startswith("BATCH") for cql, _ in session.sent)
@@ -0,0 +1,53 @@
+import asyncio
+
+from app.entities.project import Project
+from app.entities.student import Student
+from app.services.loaders import ProjectLoader, embed_projects
+
+
+class FakeProjectRepository:
+    def __init__(self):
+        self.calls = []
+
+    async def get_projects(self, ids):
+        self.calls.append(list(ids))
+        return {p_id: None if p_id == "gone" else Project(p_id=p_id, p_name=f"Project {p_id}", p_head="Lead") for p_id in ids}
+
+
+def student(s_id, project_id):
+    return Student(s_id=s_id, s_name=f"Student {s_id}", s_course="CS", s_branch="A", s_project_id=project_id)
+
+
+def test_page_of_students_loads_projects_in_one_batch():
+    repo = FakeProjectRepository()
+    students = [student(str(i), ["p-1", "p-2", None, "gone"][i % 4]) for i in range(100)]
+
+    async def run():
+        loader = ProjectLoader(repo)
+        expanded = await embed_projects(students, loader)
+        again = await loader.load("p-1")
+        return loader, expanded, again
+
+    loader, expanded, again = asyncio.run(run())
+
+    assert loader.batches == 1
+    assert repo.calls == [["p-1", "p-2", "gone"]]
+    assert expanded[0].project.p_name == "Project p-1"
+    assert expanded[1].project.p_id == "p-2"
+    assert expanded[2].project is None and expanded[3].project is None
+    assert again.p_id == "p-1"
+    assert students[0].project is None
+    assert "project" not in students[0].model_dump()
+    assert expanded[0].model_dump()["project"] == {"p_id": "p-1", "p_name": "Project p-1", "p_head": "Lead"}
+
+
+def test_loads_in_the_same_iteration_share_a_batch():
+    repo = FakeProjectRepository()
+
+    async def run():
+        loader = ProjectLoader(repo)
+        return await asyncio.gather(loader.load("a"), loader.load("b"), loader.load("a"))
+
+    a, b, a_again = asyncio.run(run())
+    assert repo.calls == [["a", "b"]]
+    assert a is a_again
@@ -0,0 +1,146 @@
+import asyncio
+from collections import namedtuple
+
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY, CollectorRegistry
+
+from app.config.breaker import CircuitBreaker
+from app.config.database import Database
+from app.config.statements import StatementRegistry
+from app.dependencies import app_scoped
+from app.main import app
+from app.metrics import StatsCollector
+from app.repositories.project_repository import AsyncProjectRepository, ProjectRepository
+from app.singleflight import read_flights
+from tests.test_base_repository import FakeResponseFuture
+
+Row = namedtuple("Row", ["p_id", "p_name", "p_head"])
+CountRow = namedtuple("CountRow", ["count"])
+
+
+class FakePrepared:
+    def __init__(self, cql):
+        self.cql = cql
+
+    def bind(self, params):
+        return self
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.current_rows = rows
+        self.paging_state = None
+
+    def one(self):
+        return self.current_rows[0] if self.current_rows else None
+
+
+class FakeSession:
+    def prepare(self, cql):
+        return FakePrepared(cql)
+
+    def execute(self, statement, **kwargs):
+        if "COUNT" in statement.cql:
+            return FakeResult([CountRow(2)])
+        return FakeResult([Row("p-1", "One", "Lead"), Row("p-2", "Two", "Lead")])
+
+
+class FakeDB:
+    def __init__(self):
+        self.session = FakeSession()
+        self.statements = StatementRegistry()
+        self.statements.bind(self.session)
+        self.name_search = None
+
+    def get_session(self):
+        return self.session
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_repository_methods_are_timed_under_the_concrete_class():
+    repo = ProjectRepository(FakeDB())
+    before = sample("repository_method_duration_seconds_count", method="ProjectRepository.list_projects")
+    rows_before = sample("repository_rows_total", method="ProjectRepository.list_projects")
+
+    result = repo.list_projects(page=1, size=10, q="One")
+
+    assert [p.p_id for p in result.items] == ["p-1", "p-2"]
+    assert sample("repository_method_duration_seconds_count", method="ProjectRepository.list_projects") == before + 1
+    # list_with_search is timed too, but rows go to the outermost method
+    assert sample("repository_method_duration_seconds_count", method="ProjectRepository.list_with_search") >= 1
+    # The two projects and the row of the total count
+    assert sample("repository_rows_total", method="ProjectRepository.list_projects") == rows_before + 3
+    assert ProjectRepository.list_projects.__name__ == "list_projects"
+    assert not hasattr(ProjectRepository.register_statements, "__wrapped__")
+
+
+def test_async_repository_methods_are_timed():
+    class AsyncFakeSession(FakeSession):
+        def execute_async(self, statement, **kwargs):
+            return FakeResponseFuture([Row("p-9", "Nine", "Lead")])
+
+    db = FakeDB()
+    db.session = AsyncFakeSession()
+    repo = AsyncProjectRepository(db)
+    before = sample("repository_method_duration_seconds_count", method="AsyncProjectRepository.get_project")
+    rows_before = sample("repository_rows_total", method="AsyncProjectRepository.get_project")
+
+    assert asyncio.run(repo.get_project("p-9")).p_name == "Nine"
+    assert sample("repository_method_duration_seconds_count", method="AsyncProjectRepository.get_project") == before + 1
+    assert sample("repository_rows_total", method="AsyncProjectRepository.get_project") == rows_before + 1
+
+
+def test_requests_are_labelled_with_the_route_template():
+    client = TestClient(app)
+    client.get("/")
+    client.get("/does-not-exist")
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{method="GET",route="/",status="200"}' in resp.text
+    assert 'route="unmatched",status="404"' in resp.text
+    assert 'http_requests_in_flight{method="GET",route="/metrics"} 1.0' in resp.text
+
+
+class FakeDriverMetrics:
+    def get_stats(self):
+        stats = {name: 0 for name in ("connection_errors", "write_timeouts", "read_timeouts", "unavailables", "other_errors", "ignores")}
+        stats.update(retries=3, known_hosts=lambda: 2, connected_to=lambda: 2, open_connections=lambda: 4)
+        stats["request_timer"] = {"count": 10, "median": 0.002, "99percentile": 0.05}
+        return stats
+
+
+def test_stats_collector_exposes_app_and_driver_stats():
+    db = Database.__new__(Database)
+    db.breaker = CircuitBreaker(2)
+    db.cluster = None
+    registry = CollectorRegistry()
+    collector = StatsCollector(lambda: db)
+    registry.register(collector)
+
+    assert registry.get_sample_value("cassandra_breaker_state", {"cassandra_breaker_state": "closed"}) == 1
+    assert registry.get_sample_value("read_flights_executed_total") is None
+
+    db.breaker.trip()
+    flights = app_scoped(db, read_flights)
+    flights.do("k", lambda: None)
+    db.cluster = type("FakeCluster", (), {"metrics": FakeDriverMetrics()})()
+
+    assert registry.get_sample_value("cassandra_breaker_state", {"cassandra_breaker_state": "open"}) == 1
+    assert registry.get_sample_value("cassandra_breaker_opens_total") == 1
+    assert registry.get_sample_value("read_flights_executed_total") == 1
+    assert registry.get_sample_value("cassandra_driver_retries_total") == 3
+    assert registry.get_sample_value("cassandra_driver_open_connections") == 4
+    assert registry.get_sample_value("cassandra_driver_requests_total") == 10
+    assert registry.get_sample_value("cassandra_driver_request_latency_seconds", {"quantile": "0.99"}) == 0.05
+    assert registry.get_sample_value("cassandra_driver_request_latency_seconds", {"quantile": "0.75"}) == 0.0
+
+
+def test_stats_collector_is_empty_before_startup():
+    registry = CollectorRegistry()
+    registry.register(StatsCollector(lambda: None))
+    assert list(registry.collect()) == []
@@ -0,0 +1,137 @@
+import os
+from collections import namedtuple
+
+from app.config.breaker import CircuitBreaker
+from app.config.database import Database
+from app.config.statements import StatementRegistry
+from app.migrations import LATEST_VERSION, MIGRATIONS, current_version, migrate
+
+VersionRow = namedtuple("VersionRow", ["version"])
+
+
+class FakeResult:
+    def __init__(self, rows=()):
+        self.current_rows = list(rows)
+        self.paging_state = None
+
+    def one(self):
+        return self.current_rows[0] if self.current_rows else None
+
+
+class FakePrepared:
+    def __init__(self, cql):
+        self.cql = cql
+
+    def bind(self, params):
+        return self
+
+
+class SchemaSession:
+    """Record DDL and keep `schema_version` rows in memory; tables are empty."""
+
+    def __init__(self, versions=()):
+        self.versions = list(versions)
+        self.ddl = []
+        self.keyspace = None
+
+    def prepare(self, cql):
+        return FakePrepared(cql)
+
+    def set_keyspace(self, keyspace):
+        self.keyspace = keyspace
+
+    def execute(self, statement, params=None, **kwargs):
+        cql = statement if isinstance(statement, str) else statement.cql
+        if "FROM dawan.schema_version" in cql:
+            return FakeResult([VersionRow(max(self.versions))] if self.versions else [])
+        if cql.startswith("INSERT INTO schema_version"):
+            self.versions.append(params[1])
+        elif not cql.startswith("SELECT"):
+            self.ddl.append(" ".join(cql.split()))
+        return FakeResult()
+
+
+class FakeConfig:
+    keyspace = "dawan"
+    contact_points = ["cassandra"]
+    schema_auto_migrate = True
+
+
+def make_db(session, auto_migrate=True):
+    db = Database.__new__(Database)
+    db.config = FakeConfig()
+    db.config.schema_auto_migrate = auto_migrate
+    db.keyspace = "dawan"
+    db.session = session
+    db.pid = os.getpid()
+    db.breaker = CircuitBreaker(2)
+    db.name_search = None
+    db.statements = StatementRegistry()
+    return db
+
+
+def test_migrate_applies_every_step_in_order_once():
+    session = SchemaSession()
+    db = make_db(session)
+
+    applied = migrate(db)
+
+    assert [m.version for m in applied] == [m.version for m in MIGRATIONS]
+    assert session.versions == [m.version for m in MIGRATIONS]
+    assert current_version(db) == LATEST_VERSION
+    assert any(cql.startswith("CREATE TABLE IF NOT EXISTS table_versions") for cql in session.ddl)
+    assert migrate(db) == []
+
+
+def test_migrate_stops_at_target():
+    session = SchemaSession([1, 2])
+    applied = migrate(make_db(session), target=4)
+    assert [m.version for m in applied] == [3, 4]
+
+
+def test_current_schema_skips_ddl():
+    session = SchemaSession([LATEST_VERSION])
+    db = make_db(session)
+    db.ensure_schema()
+    assert session.ddl == []
+    assert session.keyspace == "dawan"
+
+
+def test_outdated_schema_without_auto_migrate_refuses_to_start():
+    session = SchemaSession([1])
+    try:
+        make_db(session, auto_migrate=False).ensure_schema()
+    except RuntimeError as e:
+        assert "app.migrations upgrade" in str(e)
+    else:
+        assert False, "Expected RuntimeError"
+    assert session.ddl == []
+
+
+def test_concurrent_migrations_do_not_touch_row_counts():
+    import threading
+
+    StudentRow = namedtuple("StudentRow", ["s_id", "s_name", "s_course", "s_branch", "s_project_id"])
+
+    class ExistingRowsSession(SchemaSession):
+        """Tables already hold students, and `row_counts` is empty."""
+
+        def execute(self, statement, params=None, **kwargs):
+            cql = statement if isinstance(statement, str) else getattr(statement, "cql", type(statement).__name__)
+            if cql.startswith("SELECT") and "FROM students " in cql + " ":
+                return FakeResult([StudentRow(f"s-{i}", "Alice", "CS", "A", "p-1") for i in range(3)])
+            if not isinstance(statement, str) and not hasattr(statement, "cql"):
+                self.ddl.append(cql)
+                return FakeResult()
+            return super().execute(statement, params, **kwargs)
+
+    session = ExistingRowsSession()
+    threads = [threading.Thread(target=migrate, args=(make_db(session),)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(session.versions) == LATEST_VERSION
+    assert [cql for cql in session.ddl if "row_counts" in cql and not cql.startswith("CREATE")] == []
+    assert "BatchStatement" not in session.ddl
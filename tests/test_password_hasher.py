@@ -0,0 +1,74 @@
+from app.exceptions import ServiceUnavailableError
+from app.services.password_hasher import PasswordHasher
+
+
+def test_hash_and_verify_in_process_pool():
+    hasher = PasswordHasher(workers=1, queue_depth=1)
+    try:
+        hashed = hasher.hash("s3cret")
+        assert hasher.verify("s3cret", hashed)
+        assert not hasher.verify("wrong", hashed)
+    finally:
+        hasher.shutdown()
+    assert hasher.hash_time.count == 3
+    assert hasher.queue_wait.count == 3
+
+
+def test_full_queue_is_rejected_without_waiting():
+    hasher = PasswordHasher(workers=1, queue_depth=0)
+    hasher._slots.acquire()
+    try:
+        hasher.hash("s3cret")
+        assert False, "Expected ServiceUnavailableError"
+    except ServiceUnavailableError:
+        pass
+    assert hasher.rejected == 1
+    assert hasher._executor is None
+
+
+def test_zero_workers_hashes_inline():
+    hasher = PasswordHasher(workers=0, queue_depth=0)
+    assert hasher.verify("s3cret", hasher.hash("s3cret"))
+    assert hasher._executor is None
+
+
+def test_calibration_picks_costs_within_bounds():
+    from app.services.password_hasher import calibrate_argon2
+
+    time_cost, memory_cost = calibrate_argon2(0.0001, max_memory_kib=4096, min_memory_kib=1024)
+    assert time_cost == 1
+    assert memory_cost == 1024
+
+
+def test_hash_with_other_costs_needs_update():
+    old = PasswordHasher(workers=0, queue_depth=0, time_cost=1, memory_cost=1024)
+    new = PasswordHasher(workers=0, queue_depth=0, time_cost=2, memory_cost=1024)
+    hashed = old.hash("s3cret")
+
+    assert new.needs_update(hashed)
+    valid, new_hash = new.verify_and_update("s3cret", hashed)
+    assert valid and new_hash is not None
+    assert not new.needs_update(new_hash)
+    assert new.verify_and_update("s3cret", new_hash) == (True, None)
+
+
+def test_pinned_costs_are_not_calibrated():
+    hasher = PasswordHasher(workers=0, queue_depth=0, time_cost=3, memory_cost=2048)
+    assert hasher.calibrate(0.05) == (3, 2048)
+
+
+def test_hash_with_higher_costs_is_kept():
+    strong = PasswordHasher(workers=0, queue_depth=0, time_cost=2, memory_cost=2048)
+    weak = PasswordHasher(workers=0, queue_depth=0, time_cost=1, memory_cost=1024)
+    hashed = strong.hash("s3cret")
+
+    assert not weak.needs_update(hashed)
+    assert weak.verify_and_update("s3cret", hashed) == (True, None)
+    assert weak.verify_and_update("wrong", hashed) == (False, None)
+
+
+def test_cli_prints_the_costs_to_pin(capsys):
+    from app.services.password_hasher import main
+
+    assert main(["--target-ms", "0.1", "--max-memory-kib", "1024"]) == 0
+    assert capsys.readouterr().out == "ARGON2_TIME_COST=1\nARGON2_MEMORY_COST=1024\n"
@@ -1,4 +1,5 @@
 from app.services.project_service import ProjectService
+from app.repositories.base import PageResult
 from app.entities.project import ProjectCreate, Project, ProjectUpdate
 
 class InMemoryProjectRepo:
@@ -14,7 +15,7 @@ class InMemoryProjectRepo:
     def get_project(self, p_id: str):
         return self.store.get(p_id)
 
-    def update_project(self, p_id: str, project: ProjectUpdate):
+    def update_project(self, p_id: str, project: ProjectUpdate, if_match=None):
         p = self.store.get(p_id)
         if not p:
             return None
@@ -26,15 +27,15 @@ class InMemoryProjectRepo:
         self.store[p_id] = updated
         return updated
 
-    def delete_project(self, p_id: str):
+    def delete_project(self, p_id: str, if_match=None):
         if p_id in self.store:
             del self.store[p_id]
             return True
         return False
 
-    def list_projects(self, page=1, size=10, q=None):
+    def list_projects(self, page=1, size=10, q=None, cursor=None, estimate_total=False, match="exact"):
         items = list(self.store.values())
-        return items, len(items)
+        return PageResult(items, len(items))
 
 
 class FakeProjectService(ProjectService):
@@ -63,3 +64,14 @@ def test_project_create_get_update_delete():
         assert False
     except Exception:
         pass
+
+
+def test_list_projects_returns_page_result():
+    repo = InMemoryProjectRepo()
+    svc = FakeProjectService(repo)
+    svc.create_project(ProjectCreate(p_name="Proj", p_head="Lead"))
+
+    result = svc.list_projects()
+    assert result.total == 1
+    assert result.items[0].p_name == "Proj"
+    assert result.next_cursor is None
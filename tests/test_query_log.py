@@ -0,0 +1,135 @@
+import json
+import logging
+import uuid
+from collections import namedtuple
+from datetime import timedelta
+
+from app.config.cluster import cluster_settings
+from app.query_log import QueryLog, param_shape
+from app.repositories.project_repository import ProjectRepository
+from tests.test_metrics import FakeDB, FakeSession
+
+Event = namedtuple("Event", ["description", "source", "source_elapsed", "thread_name"])
+
+
+class FakeStatement:
+    query_string = "SELECT * FROM students WHERE s_name = ? ALLOW FILTERING"
+
+
+class FakeTrace:
+    trace_id = uuid.UUID(int=1)
+    coordinator = "10.0.0.1"
+    duration = timedelta(milliseconds=12)
+    events = [Event("Executing single-partition query on students", "10.0.0.2", timedelta(microseconds=350), "ReadStage-1")]
+
+
+class FakeResponseFuture:
+    coordinator_host = "10.0.0.1:9042"
+
+    def get_query_trace(self, max_wait):
+        return FakeTrace()
+
+
+def logged(caplog):
+    return [json.loads(record.getMessage().split(" query ", 1)[1]) for record in caplog.records if record.name == "app.queries"]
+
+
+def test_param_shapes_hide_values():
+    assert [param_shape(v) for v in ("secret", None, uuid.UUID(int=3), [1, 2, 3], {"a": 1}, 42)] == ["str", "null", "UUID", "list[3]", "dict[1]", "int"]
+
+
+def test_only_statements_over_the_threshold_are_logged(caplog):
+    log = QueryLog(slow_ms=100, trace_rate=0)
+    with caplog.at_level(logging.INFO, logger="app.queries"):
+        log.record("students.by_name", FakeStatement(), ("Alice",), 0.05, FakeResponseFuture(), 3)
+        log.record("students.by_name", FakeStatement(), ("Alice",), 0.25, FakeResponseFuture(), 3)
+
+    [entry] = logged(caplog)
+    assert entry == {
+        "statement": "students.by_name",
+        "cql": FakeStatement.query_string,
+        "allow_filtering": True,
+        "params": ["str"],
+        "latency_ms": 250.0,
+        "coordinator": "10.0.0.1:9042",
+        "rows": 3,
+    }
+    assert "Alice" not in caplog.text
+    assert caplog.records[0].levelno == logging.WARNING
+    assert not log.should_trace()
+
+
+def test_sampled_statements_are_logged_with_their_trace(caplog):
+    log = QueryLog(slow_ms=0, trace_rate=0.5, sample=iter([0.9, 0.1]).__next__)
+    assert not log.should_trace()
+    assert log.should_trace()
+
+    with caplog.at_level(logging.INFO, logger="app.queries"):
+        log.record("students.get", FakeStatement(), ("id",), 0.001, FakeResponseFuture(), 1, traced=True)
+        log._tracer.shutdown(wait=True)
+
+    [entry] = logged(caplog)
+    assert entry["trace"] == {
+        "trace_id": str(FakeTrace.trace_id),
+        "coordinator": "10.0.0.1",
+        "duration_us": 12000,
+        "events": [{"source": "10.0.0.2", "elapsed_us": 350, "thread": "ReadStage-1", "description": "Executing single-partition query on students"}],
+    }
+    assert caplog.records[0].levelno == logging.INFO
+
+
+def test_traces_beyond_the_queue_depth_are_dropped(monkeypatch, caplog):
+    import threading
+
+    from app import query_log
+
+    monkeypatch.setattr(query_log, "TRACE_QUEUE_DEPTH", 2)
+    release = threading.Event()
+
+    class SlowTrace(FakeResponseFuture):
+        def get_query_trace(self, max_wait):
+            release.wait(5)
+            return FakeTrace()
+
+    log = QueryLog(slow_ms=0, trace_rate=1)
+    with caplog.at_level(logging.INFO, logger="app.queries"):
+        for _ in range(3):
+            log.record("students.get", FakeStatement(), ("id",), 0.001, SlowTrace(), 1, traced=True)
+        # The third statement is logged at once, without its trace
+        assert [entry.get("trace") for entry in logged(caplog)] == [None]
+        release.set()
+        log._tracer.shutdown(wait=True)
+
+    assert log.dropped_traces == 1
+    assert len([entry for entry in logged(caplog) if "trace" in entry]) == 2
+
+
+def test_repository_statements_go_through_the_query_log(monkeypatch, caplog):
+    class TracingSession(FakeSession):
+        def __init__(self):
+            self.kwargs = []
+
+        def execute(self, statement, **kwargs):
+            self.kwargs.append(kwargs)
+            return super().execute(statement, **kwargs)
+
+    monkeypatch.setattr(cluster_settings, "slow_query_ms", 1e-6)
+    db = FakeDB()
+    db.session = TracingSession()
+    repo = ProjectRepository(db)
+    repo.query_log._sample = lambda: 1.0
+
+    with caplog.at_level(logging.INFO, logger="app.queries"):
+        repo.get_project("p-1")
+
+    [entry] = logged(caplog)
+    assert entry["statement"] == "projects.get"
+    assert entry["params"] == ["str"]
+    assert entry["rows"] == 2
+    assert db.session.kwargs == [{"execution_profile": "read"}]
+
+    # Sampled statements are sent with tracing enabled
+    repo.query_log.trace_rate = 0.5
+    repo.query_log._sample = lambda: 0.0
+    repo.get_project("p-2")
+    assert db.session.kwargs[-1] == {"execution_profile": "read", "trace": True}
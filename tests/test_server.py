@@ -0,0 +1,68 @@
+import os
+
+from app.config.breaker import CircuitBreaker
+from app.config.database import Database
+from app.server import server_options
+
+
+class FakeSettings:
+    server_host = "0.0.0.0"
+    server_port = 8000
+    server_workers = 4
+    server_loop = "uvloop"
+    server_http = "httptools"
+    server_reload = False
+
+
+def test_server_options_from_settings():
+    options = server_options(FakeSettings())
+    assert options["workers"] == 4
+    assert options["loop"] == "uvloop"
+    assert options["http"] == "httptools"
+
+
+def test_unknown_implementations_fall_back_to_auto_and_reload_uses_one_worker():
+    settings = FakeSettings()
+    settings.server_loop = "trio"
+    settings.server_http = "h2"
+    settings.server_reload = True
+    options = server_options(settings)
+    assert options["loop"] == "auto"
+    assert options["http"] == "auto"
+    assert options["workers"] == 1
+
+
+class FakeHost:
+    def __init__(self, is_up):
+        self.is_up = is_up
+
+
+class FakeMetadata:
+    def __init__(self, hosts):
+        self.hosts = hosts
+
+    def all_hosts(self):
+        return self.hosts
+
+
+class FakeCluster:
+    def __init__(self, hosts):
+        self.metadata = FakeMetadata(hosts)
+
+
+def make_db(hosts, pid=None):
+    db = Database.__new__(Database)
+    db.cluster = FakeCluster(hosts)
+    db.session = object()
+    db.pid = os.getpid() if pid is None else pid
+    db.breaker = CircuitBreaker(2)
+    return db
+
+
+def test_available_when_a_host_is_up():
+    assert make_db([FakeHost(False), FakeHost(True)]).is_available()
+    assert not make_db([FakeHost(False)]).is_available()
+
+
+def test_session_inherited_from_another_process_is_unavailable():
+    assert not make_db([FakeHost(True)], pid=os.getpid() + 1).is_available()
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import time
+
+from app.singleflight import SingleFlight
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_identical_sync_reads_share_one_call():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def read():
+        calls.append(1)
+        release.wait(5)
+        return ["row"]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.do("k", read))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: flights.coalesced == 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [["row"]] * 5
+    assert flights.stats() == {"executed": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_errors_are_shared_and_not_cached():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise OSError("timeout")
+
+    errors = []
+
+    def call():
+        try:
+            flights.do("k", failing)
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: flights.coalesced == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 3
+    assert flights.do("k", lambda: "ok") == "ok"
+
+
+def test_reads_after_a_write_do_not_join_older_reads():
+    flights = SingleFlight()
+    release = threading.Event()
+    leader = threading.Thread(target=flights.do, args=("k", lambda: release.wait(5)))
+    leader.start()
+    wait_for(lambda: flights.stats()["in_flight"] == 1)
+
+    flights.invalidate()
+    assert flights.do("k", lambda: "fresh") == "fresh"
+    release.set()
+    leader.join()
+    assert flights.coalesced == 0
+
+
+def test_identical_async_reads_share_one_call():
+    flights = SingleFlight()
+    calls = []
+
+    async def read():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "row"
+
+    async def run():
+        return await asyncio.gather(*(flights.do_async("k", read) for _ in range(10)), flights.do_async("other", read))
+
+    assert asyncio.run(run()) == ["row"] * 11
+    assert len(calls) == 2
+    assert flights.stats() == {"executed": 2, "coalesced": 9, "in_flight": 0}
@@ -0,0 +1,74 @@
+from app.config.statements import StatementRegistry
+from app.dependencies import app_scoped
+
+
+class DummyPrepared:
+    def __init__(self, cql):
+        self.cql = cql
+        self.is_idempotent = False
+
+
+class DummySession:
+    def __init__(self):
+        self.prepared = []
+
+    def prepare(self, cql):
+        self.prepared.append(cql)
+        return DummyPrepared(cql)
+
+
+def test_registry_prepares_each_statement_once():
+    registry = StatementRegistry()
+    session = DummySession()
+    registry.bind(session)
+
+    registry.register("students.get", "SELECT * FROM students WHERE s_id = ?")
+    first = registry.get("students.get")
+    second = registry.get("students.get")
+
+    assert first is second
+    assert session.prepared == ["SELECT * FROM students WHERE s_id = ?"]
+
+
+def test_registry_reprepares_on_new_session():
+    registry = StatementRegistry()
+    registry.bind(DummySession())
+    registry.get("projects.get", "SELECT * FROM projects WHERE p_id = ?")
+
+    new_session = DummySession()
+    registry.bind(new_session)
+
+    assert new_session.prepared == ["SELECT * FROM projects WHERE p_id = ?"]
+
+
+def test_registry_marks_selects_idempotent():
+    registry = StatementRegistry()
+    registry.bind(DummySession())
+    read = registry.get("students.get", "SELECT * FROM students WHERE s_id = ?")
+    write = registry.get("students.delete", "DELETE FROM students WHERE s_id = ?")
+
+    assert read.is_idempotent and registry.is_read("students.get")
+    assert not write.is_idempotent and not registry.is_read("students.delete")
+
+
+def test_registry_rejects_conflicting_cql():
+    registry = StatementRegistry()
+    registry.register("users.get", "SELECT * FROM users WHERE id = ?")
+    try:
+        registry.register("users.get", "SELECT id FROM users WHERE id = ?")
+        assert False, "Expected ValueError"
+    except ValueError:
+        pass
+
+
+def test_app_scoped_returns_single_instance_per_db():
+    class DummyDB:
+        pass
+
+    class Service:
+        def __init__(self, db):
+            self.db = db
+
+    db = DummyDB()
+    assert app_scoped(db, Service) is app_scoped(db, Service)
+    assert app_scoped(DummyDB(), Service) is not app_scoped(db, Service)
@@ -40,3 +40,113 @@ def test_create_student_endpoint():
     resp = client.post('/students/', json=payload)
     # create uses the real service which expects a DB; since DB session is None some code paths may raise, accept 500 or 200
     assert resp.status_code in (200, 500)
+
+
+def test_bulk_endpoint_rejects_unknown_content_type():
+    resp = client.post('/students/bulk', content=b'{}', headers={"content-type": "application/xml"})
+    assert resp.status_code == 415
+
+
+class FakeListService:
+    async def list_version(self):
+        return 7
+
+    async def list_students(self, **kwargs):
+        from app.entities.student import Student
+        from app.repositories.base import PageResult
+
+        items = [Student(s_id="s-1", s_name="Ann", s_course="CS", s_branch="A", version=3)]
+        return PageResult(items=items, total=1, next_cursor=None, total_exact=True)
+
+
+def test_fast_json_list_matches_default_rendering(monkeypatch):
+    from app.config.settings import app_settings
+    from app.controllers.student_controller import get_student_service
+
+    app.dependency_overrides[get_student_service] = lambda: FakeListService()
+    try:
+        default = client.get('/students/?size=5')
+        monkeypatch.setattr(app_settings, "fast_json_responses", True)
+        fast = client.get('/students/?size=5')
+    finally:
+        del app.dependency_overrides[get_student_service]
+
+    assert fast.status_code == default.status_code == 200
+    assert fast.json() == default.json()
+    assert fast.json()["items"][0] == {"s_id": "s-1", "s_name": "Ann", "s_course": "CS", "s_branch": "A", "s_project_id": None}
+    assert fast.headers["etag"] == default.headers["etag"]
+    assert fast.headers["content-type"] == "application/json"
+
+
+def test_list_version_is_read_up_front_only_for_if_none_match():
+    from app.controllers.student_controller import get_student_service
+
+    class CountingService(FakeListService):
+        calls = []
+
+        async def list_version(self):
+            self.calls.append("version")
+            return await super().list_version()
+
+        async def list_students(self, **kwargs):
+            self.calls.append("list")
+            return await super().list_students(**kwargs)
+
+    service = CountingService()
+    app.dependency_overrides[get_student_service] = lambda: service
+    try:
+        first = client.get('/students/?size=5')
+        service.calls.clear()
+        cached = client.get('/students/?size=5', headers={"If-None-Match": first.headers["etag"]})
+    finally:
+        del app.dependency_overrides[get_student_service]
+
+    assert first.status_code == 200 and first.headers["etag"].startswith('W/"students-7-')
+    assert cached.status_code == 304
+    assert service.calls == ["version"]
+
+
+def test_lookup_ids_are_split_and_bounded():
+    from app.dependencies import lookup_ids
+    from fastapi import HTTPException
+
+    assert lookup_ids(["a, b", "c"]) == ["a", "b", "c"]
+    try:
+        lookup_ids([",".join(str(i) for i in range(101))])
+    except HTTPException as e:
+        assert e.status_code == 422
+    else:
+        assert False, "Expected HTTPException"
+
+
+def test_list_routes_keep_their_list_response_schema():
+    paths = app.openapi()["paths"]
+
+    def schema(path, method="get"):
+        return paths[path][method]["responses"]["200"]["content"]["application/json"]["schema"]
+
+    assert schema("/students/") == {"$ref": "#/components/schemas/StudentListResponse"}
+    assert schema("/projects/") == {"$ref": "#/components/schemas/ProjectListResponse"}
+    assert schema("/students/lookup") == {"$ref": "#/components/schemas/StudentLookupResponse"}
+    assert schema("/students/lookup", "post") == schema("/students/lookup")
+    assert not any(p["name"] == "ids" for p in paths["/students/"]["get"]["parameters"])
+
+
+def test_get_lookup_returns_the_students_in_order():
+    from app.controllers.student_controller import get_student_service
+
+    class LookupService(FakeListService):
+        async def lookup_students(self, ids):
+            from app.entities.student import Student
+
+            return [Student(s_id=i, s_name="Ann", s_course="CS", s_branch="A", version=3) for i in ids if i != "gone"], ["gone"]
+
+    app.dependency_overrides[get_student_service] = lambda: LookupService()
+    try:
+        resp = client.get('/students/lookup?ids=s-2,gone&ids=s-1')
+    finally:
+        del app.dependency_overrides[get_student_service]
+
+    assert resp.status_code == 200 and resp.headers["etag"].startswith('W/"students-7-')
+    assert [item["s_id"] for item in resp.json()["items"]] == ["s-2", "s-1"]
+    assert resp.json()["missing"] == ["gone"]
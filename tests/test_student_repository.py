@@ -0,0 +1,132 @@
+from collections import namedtuple
+
+from app.entities.student import Student, StudentResponse, StudentUpdate
+from app.repositories.student_repository import StudentRepository
+from cassandra.query import UNSET_VALUE as UNSET
+
+
+def make_student(project_id):
+    return Student(s_id="s-1", s_name="Alice", s_course="Math", s_branch="A", s_project_id=project_id)
+
+
+def statement_names(statements):
+    return [name for name, _ in statements]
+
+
+def test_create_writes_query_table_only_for_assigned_students():
+    repo = StudentRepository(db=None)
+    assert statement_names(repo._create_statements(make_student("p-1"))) == ["students.insert", "students_by_project.insert"]
+    assert statement_names(repo._create_statements(make_student(None))) == ["students.insert"]
+
+
+def test_update_moving_project_moves_query_table_row():
+    repo = StudentRepository(db=None)
+    current = make_student("p-1")
+    change = StudentUpdate(s_project_id="p-2")
+    updated = repo._merge(current, change)
+
+    statements = repo._update_statements(current, updated, repo._update_params("s-1", change))
+
+    assert statement_names(statements) == ["students.update", "students_by_project.delete", "students_by_project.insert"]
+    assert statements[1][1] == ("p-1", "s-1")
+    assert statements[2][1] == ("p-2", "s-1", "Alice", "Math", "A")
+
+
+def test_update_within_project_writes_only_the_updated_columns_to_the_query_table():
+    repo = StudentRepository(db=None)
+    current = make_student("p-1")
+    updated = repo._merge(current, StudentUpdate(s_name="Alicia"))
+
+    statements = repo._update_statements(current, updated, repo._update_params("s-1", StudentUpdate(s_name="Alicia")))
+
+    assert statement_names(statements) == ["students.update", "students_by_project.update"]
+    assert statements[1][1] == ("Alicia", UNSET, UNSET, "p-1", "s-1")
+
+
+def test_update_changing_project_deletes_the_old_partition_row():
+    from tests.test_etag import Bound, ConditionalSession, StudentRow, make_student_repo
+
+    session = ConditionalSession(StudentRow("s-1", "Alice", "CS", "A", "p-1", 10, 10, 10, 12))
+    repo = make_student_repo(session)
+    batches = []
+    repo._batch = lambda statements: batches.append(statements) or Bound("BATCH", ())
+
+    updated = repo.update_student("s-1", StudentUpdate(s_project_id="p-2"))
+
+    assert updated.s_project_id == "p-2"
+    # The current project is read at the write consistency
+    assert session.sent[0][1] == "write"
+    assert batches == [[
+        ("students.update", (UNSET, UNSET, UNSET, "p-2", "s-1")),
+        ("students_by_project.delete", ("p-1", "s-1")),
+        ("students_by_project.insert", ("p-2", "s-1", "Alice", "CS", "A")),
+    ]]
+
+
+def test_project_listing_reads_query_table_partition():
+    repo = StudentRepository(db=None)
+    plan = repo._plan_search(None, {"s_project_id": "p-1"}, False)
+    assert plan.name == "students_by_project.list"
+    assert plan.params == ("p-1",)
+    assert plan.total == ("stored", "s_project_id=p-1")
+
+
+def test_row_maps_to_a_student_usable_as_response():
+    Row = namedtuple("Row", ["s_id", "s_name", "s_course", "s_branch", "s_project_id", "s_name_written"])
+    student = StudentRepository._to_student(Row("s-1", "Alice", "Math", "A", None, 10))
+
+    assert isinstance(student, StudentResponse)
+    assert student.model_dump() == {"s_id": "s-1", "s_name": "Alice", "s_course": "Math", "s_branch": "A", "s_project_id": None}
+
+
+def test_recount_corrects_row_counts_from_a_scan():
+    from tests.test_base_repository import FakeDB, FakeResult, PagingSession
+
+    StudentRow = namedtuple("StudentRow", ["s_id", "s_name", "s_course", "s_branch", "s_project_id"])
+    ScopeRow = namedtuple("ScopeRow", ["scope", "row_count"])
+
+    class RecountSession(PagingSession):
+        def execute(self, statement, paging_state=None, **kwargs):
+            if "FROM row_counts" in statement.cql:
+                # Counters written since counting started, plus a stale scope
+                return FakeResult([ScopeRow("", 1), ScopeRow("s_project_id=p-1", 1), ScopeRow("s_project_id=p-9", 2)])
+            return super().execute(statement, paging_state, **kwargs)
+
+    rows = [StudentRow(f"s-{i}", "Name", "Math", "A", project) for i, project in enumerate(["p-1", "p-1", "p-2", None, None])]
+    repo = StudentRepository(FakeDB(RecountSession(rows)))
+    written = []
+    repo._record_write = written.append
+
+    deltas = repo.recount_rows(page_size=2)
+
+    assert deltas == {"": 4, "s_project_id=p-1": 1, "s_project_id=p-2": 1, "s_project_id=p-9": -2}
+    assert written == [deltas]
+
+
+def test_async_recount_awaits_its_pages():
+    import asyncio
+
+    from app.repositories.student_repository import AsyncStudentRepository
+
+    StudentRow = namedtuple("StudentRow", ["s_id", "s_name", "s_course", "s_branch", "s_project_id"])
+    ScopeRow = namedtuple("ScopeRow", ["scope", "row_count"])
+    pages = {
+        "students.all": [([StudentRow("s-1", "Ann", "Math", "A", "p-1")], b"next"), ([StudentRow("s-2", "Bob", "Math", "A", None)], None)],
+        "row_counts.scopes": [([ScopeRow("", 1)], None)],
+    }
+    repo = AsyncStudentRepository(None)
+    written = []
+
+    async def fetch_page(name, params, size, paging_state=None, cql=None, profile=None):
+        return pages[name].pop(0)
+
+    async def record_write(deltas):
+        written.append(deltas)
+
+    repo._fetch_page = fetch_page
+    repo._record_write = record_write
+
+    deltas = asyncio.run(repo.recount_rows(page_size=1))
+
+    assert deltas == {"": 1, "s_project_id=p-1": 1}
+    assert written == [deltas]
@@ -1,4 +1,5 @@
 from app.services.student_service import StudentService
+from app.repositories.base import PageResult
 from app.entities.student import StudentCreate, Student, StudentUpdate
 
 
@@ -32,7 +33,7 @@ class InMemoryRepo:
     def get_student(self, s_id: str):
         return self.store.get(s_id)
 
-    def update_student(self, s_id: str, student: StudentUpdate):
+    def update_student(self, s_id: str, student: StudentUpdate, if_match=None):
         s = self.store.get(s_id)
         if not s:
             return None
@@ -44,15 +45,15 @@ class InMemoryRepo:
         self.store[s_id] = updated
         return updated
 
-    def delete_student(self, s_id: str):
+    def delete_student(self, s_id: str, if_match=None):
         if s_id in self.store:
             del self.store[s_id]
             return True
         return False
 
-    def list_students(self, page=1, size=10, q=None, project_id=None):
+    def list_students(self, page=1, size=10, q=None, project_id=None, cursor=None, estimate_total=False, match="exact"):
         items = list(self.store.values())
-        return items, len(items)
+        return PageResult(items, len(items))
 
 
 class FakeService(StudentService):
@@ -0,0 +1,133 @@
+from collections import namedtuple
+
+from app.config.statements import StatementRegistry
+from app.entities.user import UserCreate
+from app.exceptions import ConflictError
+from app.repositories.user_repository import UserRepository
+
+UserRow = namedtuple("UserRow", ["id", "username", "email", "hashed_password", "is_active"])
+EmailRow = namedtuple("EmailRow", ["username"])
+
+
+class FakePrepared:
+    def __init__(self, cql):
+        self.cql = cql
+
+    def bind(self, params):
+        return (self.cql, params)
+
+
+class FakeResult:
+    def __init__(self, rows=(), was_applied=True):
+        self.current_rows = list(rows)
+        self.was_applied = was_applied
+        self.paging_state = None
+
+    def one(self):
+        return self.current_rows[0] if self.current_rows else None
+
+
+class LookupSession:
+    """In-memory `users_by_username`/`users_by_email` honouring `IF NOT EXISTS`."""
+
+    def __init__(self):
+        self.by_username = {}
+        self.by_email = {}
+        self.users = {}
+        self.profiles = {}
+        self.insert_error = None
+
+    def prepare(self, cql):
+        return FakePrepared(cql)
+
+    def execute(self, statement, execution_profile=None, **kwargs):
+        cql, params = statement
+        self.profiles[cql.split(" WHERE")[0]] = execution_profile
+        if cql.startswith("INSERT INTO users_by_username"):
+            if params[0] in self.by_username:
+                return FakeResult(was_applied=False)
+            self.by_username[params[0]] = UserRow(params[1], params[0], *params[2:])
+        elif cql.startswith("INSERT INTO users_by_email"):
+            if params[0] in self.by_email:
+                return FakeResult(was_applied=False)
+            self.by_email[params[0]] = EmailRow(params[1])
+        elif cql.startswith("DELETE FROM users_by_username"):
+            if self.by_username.get(params[0], UserRow(None, None, None, None, None)).id == params[1]:
+                del self.by_username[params[0]]
+        elif cql.startswith("DELETE FROM users_by_email"):
+            if params[0] in self.by_email:
+                del self.by_email[params[0]]
+        elif cql.startswith("INSERT INTO users "):
+            if self.insert_error:
+                raise self.insert_error
+            self.users[params[0]] = UserRow(*params)
+        elif "FROM users_by_username" in cql:
+            return FakeResult([self.by_username[params[0]]] if params[0] in self.by_username else [])
+        elif "FROM users_by_email" in cql:
+            return FakeResult([self.by_email[params[0]]] if params[0] in self.by_email else [])
+        return FakeResult()
+
+
+class FakeDB:
+    def __init__(self):
+        self.session = LookupSession()
+        self.statements = StatementRegistry()
+        self.statements.bind(self.session)
+
+    def get_session(self):
+        return self.session
+
+
+def test_create_user_fills_lookup_tables():
+    repo = UserRepository(FakeDB())
+    created = repo.create_user(UserCreate(username="alice", email="a@example.com", password="x"), "hash")
+
+    assert repo.get_user_by_username("alice").id == created.id
+    assert repo.get_user_by_email("a@example.com").username == "alice"
+    assert created.id in repo.db.session.users
+
+
+def test_duplicate_username_is_rejected():
+    repo = UserRepository(FakeDB())
+    repo.create_user(UserCreate(username="alice", email="a@example.com", password="x"), "hash")
+    try:
+        repo.create_user(UserCreate(username="alice", email="other@example.com", password="x"), "hash")
+        assert False, "Expected ConflictError"
+    except ConflictError:
+        pass
+    assert "other@example.com" not in repo.db.session.by_email
+
+
+def test_duplicate_email_releases_username_claim():
+    repo = UserRepository(FakeDB())
+    repo.create_user(UserCreate(username="alice", email="a@example.com", password="x"), "hash")
+    try:
+        repo.create_user(UserCreate(username="bob", email="a@example.com", password="x"), "hash")
+        assert False, "Expected ConflictError"
+    except ConflictError:
+        pass
+    assert repo.get_user_by_username("bob") is None
+    assert len(repo.db.session.users) == 1
+
+
+def test_claims_are_read_at_the_write_consistency():
+    repo = UserRepository(FakeDB())
+    repo.create_user(UserCreate(username="alice", email="a@example.com", password="x"), "hash")
+
+    assert repo.get_user_by_email("a@example.com").username == "alice"
+    assert repo.db.session.profiles["SELECT id, username, email, hashed_password, is_active FROM users_by_username"] == "write"
+    assert repo.db.session.profiles["SELECT username FROM users_by_email"] == "write"
+
+
+def test_failed_insert_releases_both_claims():
+    repo = UserRepository(FakeDB())
+    repo.db.session.insert_error = TimeoutError("users insert timed out")
+    try:
+        repo.create_user(UserCreate(username="alice", email="a@example.com", password="x"), "hash")
+        assert False, "Expected TimeoutError"
+    except TimeoutError:
+        pass
+    assert repo.db.session.by_username == {} and repo.db.session.by_email == {}
+
+    repo.db.session.insert_error = None
+    assert repo.create_user(UserCreate(username="alice", email="a@example.com", password="x"), "hash").username == "alice"